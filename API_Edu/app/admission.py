@@ -0,0 +1,170 @@
+"""
+Контроль допуска запросов: ограничение одновременных запросов по классам маршрутов
+и (по желанию) ограничение частоты запросов одного клиента.
+
+Запрос, который не дождался свободного места за время класса, сразу получает 503 с Retry-After,
+поэтому задержка допущенных запросов не растёт вместе с очередью.
+"""
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import anyio
+from prometheus_client import Counter, Histogram
+from starlette.responses import JSONResponse
+
+from app import config
+from app.metrics import registry, route_template, UNMATCHED_ROUTE
+
+# Служебные маршруты не ограничиваются: мониторинг должен отвечать и под перегрузкой
+EXEMPT_ROUTES = {"/metrics", "/cache/stats", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json", UNMATCHED_ROUTE}
+
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds",
+    "Ожидание места в классе маршрутов перед обработкой",
+    ["admission_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+    registry=registry,
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_total",
+    "Запросы, отклонённые контролем допуска",
+    ["admission_class", "reason"],
+    registry=registry,
+)
+
+
+@dataclass
+class AdmissionClass:
+    """Класс маршрутов со своим лимитом одновременных запросов и сроком ожидания в очереди"""
+    name: str
+    limit: int
+    timeout: float
+
+    def __post_init__(self):
+        # anyio.Semaphore не привязан к циклу событий, в отличие от asyncio.Semaphore
+        self.semaphore = anyio.Semaphore(self.limit)
+
+    async def acquire(self) -> bool:
+        with anyio.move_on_after(self.timeout):
+            await self.semaphore.acquire()
+            return True
+        return False
+
+    def release(self):
+        self.semaphore.release()
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.timeout))
+
+
+class TokenBuckets:
+    """
+    Маркерные корзины по клиентам: rate запросов в секунду, всплеск до burst.
+    Хранятся последние max_clients клиентов, самые давние вытесняются
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    def take(self, client: str) -> float:
+        """0, если запрос разрешён, иначе через сколько секунд появится маркер"""
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[client] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+def parse_route_classes(value: str) -> dict:
+    """'GET /users/export=write, POST /users/bulk=write' -> {("GET", "/users/export"): "write", ...}"""
+    routes = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, admission_class = item.rsplit("=", 1)
+        method, path = route.split(None, 1)
+        routes[(method.upper(), path.strip())] = admission_class.strip()
+    return routes
+
+
+def default_classes() -> dict:
+    return {
+        "read": AdmissionClass("read", config.ADMISSION_READ_LIMIT, config.ADMISSION_READ_TIMEOUT_MS / 1000),
+        "write": AdmissionClass("write", config.ADMISSION_WRITE_LIMIT, config.ADMISSION_WRITE_TIMEOUT_MS / 1000),
+    }
+
+
+def overloaded_response(detail: str, retry_after: int, status_code: int) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail, "error_type": "overloaded"},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI-middleware контроля допуска. По умолчанию GET относится к классу read, остальные
+    методы к write; ADMISSION_ROUTES переопределяет класс отдельных маршрутов (или none)
+    """
+
+    def __init__(self, app, classes: dict = None, route_classes: dict = None, buckets: TokenBuckets = None):
+        self.app = app
+        self.classes = classes or default_classes()
+        self.route_classes = route_classes if route_classes is not None else parse_route_classes(config.ADMISSION_ROUTES)
+        if buckets is None and config.ADMISSION_CLIENT_RATE > 0:
+            buckets = TokenBuckets(config.ADMISSION_CLIENT_RATE, config.ADMISSION_CLIENT_BURST)
+        self.buckets = buckets
+        self._resolved = {}
+
+    def admission_class(self, scope):
+        method = scope["method"]
+        route = route_template(scope)
+        key = (method, route)
+        if key not in self._resolved:
+            name = self.route_classes.get(key)
+            if name is None:
+                name = "none" if route in EXEMPT_ROUTES else ("read" if method in ("GET", "HEAD") else "write")
+            self._resolved[key] = self.classes.get(name)
+        return self._resolved[key]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        admission_class = self.admission_class(scope)
+        if admission_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.buckets is not None:
+            client = scope["client"][0] if scope.get("client") else "unknown"
+            wait = self.buckets.take(client)
+            if wait > 0:
+                ADMISSION_REJECTED.labels(admission_class.name, "rate_limited").inc()
+                response = overloaded_response("Слишком много запросов от клиента", math.ceil(wait), 429)
+                await response(scope, receive, send)
+                return
+
+        started = time.perf_counter()
+        if not await admission_class.acquire():
+            ADMISSION_REJECTED.labels(admission_class.name, "overloaded").inc()
+            response = overloaded_response("Сервис перегружен, повторите запрос позже", admission_class.retry_after, 503)
+            await response(scope, receive, send)
+            return
+        ADMISSION_WAIT.labels(admission_class.name).observe(time.perf_counter() - started)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_class.release()
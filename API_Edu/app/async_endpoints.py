@@ -0,0 +1,186 @@
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Header, Query, Request, Response, status
+from fastapi.responses import RedirectResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app import config
+from app.cache import user_cache
+from app.email_filter import email_filter
+from app.group_commit import group_committer, AsyncGroupCommitUserRepository
+from app.database import get_async_db, AsyncSessionLocal
+from app.etag import user_etag, list_etag, etag_matches, not_modified
+from app.pagination import decode_cursor, parse_user_ids
+from app.responses import users_json_response
+from app.repositories import AsyncUserRepository, AsyncCachedUserRepository
+from app.schemas import UserCreate
+from app.services import AsyncUserService, async_user_lookups
+
+# Асинхронные версии эндпоинтов из main.py для режима DB_MODE=async.
+# Путь, модель ответа, коды и документация берутся у синхронного маршрута с тем же именем,
+# поэтому OpenAPI-схема в обоих режимах одинакова.
+
+
+def build_async_user_repository(db: AsyncSession) -> AsyncUserRepository:
+    repository = AsyncUserRepository(db, email_filter)
+    if group_committer is not None:
+        repository = AsyncGroupCommitUserRepository(repository, group_committer)
+    if user_cache is not None:
+        return AsyncCachedUserRepository(repository, user_cache)
+    return repository
+
+
+def get_async_user_repository(db: AsyncSession = Depends(get_async_db)) -> AsyncUserRepository:
+    return build_async_user_repository(db)
+
+
+@asynccontextmanager
+async def open_async_user_repository():
+    """Репозиторий на собственной сессии, не связанной с запросом"""
+    async with AsyncSessionLocal() as db:
+        yield build_async_user_repository(db)
+
+def get_async_user_service(
+    user_repository: AsyncUserRepository = Depends(get_async_user_repository)
+) -> AsyncUserService:
+    return AsyncUserService(user_repository, async_user_lookups, open_async_user_repository)
+
+
+async def create_user(
+    user: UserCreate, 
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    return await user_service.create_user(user)
+
+async def read_users(
+    response: Response,
+    skip: int = 0, 
+    limit: int = 100, 
+    after_id: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    limit = min(limit, 1000)
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+    # Быстрый путь: строки-кортежи сразу кодируются в JSON, минуя ORM и UserResponse
+    fast = config.FAST_LIST_RESPONSES
+    headers = {}
+
+    if after_id is None:
+        if if_none_match:
+            etag = await user_service.get_all_users_etag(skip, limit)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        users = await user_service.get_all_users(skip, limit, as_rows=fast)
+    else:
+        limit = max(limit, 1)
+        if if_none_match:
+            etag, next_cursor = await user_service.get_users_after_etag(after_id, limit)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+        users, next_cursor = await user_service.get_users_after(after_id, limit, as_rows=fast)
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = next_cursor
+
+    headers["ETag"] = list_etag((user.id, user.version) for user in users)
+    headers["X-Total-Count"] = str(await user_service.count_users())
+    if fast:
+        return users_json_response(users, headers)
+    response.headers.update(headers)
+    return users
+
+async def read_user(
+    user_id: int, 
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    if if_none_match:
+        etag = await user_service.get_user_etag(user_id)
+        if etag is not None and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    user = await user_service.get_user(user_id)
+    response.headers["ETag"] = user_etag(user.id, user.version)
+    return user
+
+async def read_users_by_ids(
+    request: Request,
+    ids: Optional[str] = Query(None, pattern=r"^\d+(,\d+)*$", description="Comma-separated user IDs"),
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    if ids is None:
+        return RedirectResponse(request.url.replace(path="/users/"), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    users, missing = await user_service.get_users_by_ids(parse_user_ids(ids))
+    return {"users": users, "missing": missing}
+
+async def count_users(user_service: AsyncUserService = Depends(get_async_user_service)):
+    return {"total": await user_service.count_users()}
+
+async def read_user_stats(
+    bucket: int = Query(10, ge=1, le=120, description="Width of a histogram bucket in years"),
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    return await user_service.get_user_stats(bucket)
+
+async def read_user_changes(
+    since: int = Query(0, ge=0, description="Sequence number of the last change the client has applied"),
+    limit: int = Query(100, ge=1, le=1000),
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    return await user_service.get_changes(since, limit)
+
+async def update_user(
+    user_id: int, 
+    user: UserCreate, 
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    return await user_service.update_user(user_id, user)
+
+async def delete_user(
+    user_id: int, 
+    user_service: AsyncUserService = Depends(get_async_user_service)
+):
+    await user_service.delete_user(user_id)
+    return {"message": "Пользователь успешно удален"}
+
+
+ASYNC_ENDPOINTS = {
+    "create_user": create_user,
+    "read_users": read_users,
+    "read_users_by_ids": read_users_by_ids,
+    "count_users": count_users,
+    "read_user_stats": read_user_stats,
+    "read_user_changes": read_user_changes,
+    "read_user": read_user,
+    "update_user": update_user,
+    "delete_user": delete_user,
+}
+
+
+def use_async_endpoints(app: FastAPI) -> None:
+    """Заменяет синхронные маршруты асинхронными, сохраняя их порядок и метаданные"""
+    routes = app.router.routes
+    for index, route in enumerate(routes):
+        if not isinstance(route, APIRoute) or route.name not in ASYNC_ENDPOINTS:
+            continue
+        routes[index] = APIRoute(
+            route.path,
+            ASYNC_ENDPOINTS[route.name],
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            response_description=route.response_description,
+            responses=route.responses,
+            methods=route.methods,
+            operation_id=route.operation_id,
+            include_in_schema=route.include_in_schema,
+            response_class=route.response_class,
+            name=route.name,
+        )
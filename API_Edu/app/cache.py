@@ -0,0 +1,173 @@
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """Базовый интерфейс кэша. Счётчики попаданий, промахов и вытеснений общие для всех реализаций"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    # Пакетные операции для выборки многих пользователей; бэкенды с сетевым доступом переопределяют их
+    def get_many(self, keys: list[str]) -> dict:
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set_many(self, items: dict) -> None:
+        for key, value in items.items():
+            self.set(key, value)
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self).__name__,
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class LRUCache(CacheBackend):
+    """Кэш в памяти процесса: ограничен по числу записей (LRU) и по времени жизни (TTL)"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache(CacheBackend):
+    """Общий кэш для нескольких процессов. Вытеснением по TTL и памяти управляет сам Redis"""
+
+    def __init__(self, url: str, ttl: float, prefix: str = "api_edu:"):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Для USER_CACHE_BACKEND=redis установите пакет redis")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), px=int(self.ttl * 1000))
+
+    def get_many(self, keys: list[str]) -> dict:
+        # Один MGET вместо запроса на каждый ключ
+        found = {}
+        for key, raw in zip(keys, self.client.mget([self.prefix + key for key in keys])):
+            if raw is not None:
+                found[key] = json.loads(raw)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: dict) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(self.prefix + key, json.dumps(value), px=int(self.ttl * 1000))
+        pipeline.execute()
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(self.prefix + "*"))
+
+
+def build_user_cache() -> Optional[CacheBackend]:
+    if not config.USER_CACHE_ENABLED:
+        return None
+    if config.USER_CACHE_BACKEND == "redis":
+        return RedisCache(config.USER_CACHE_REDIS_URL, config.USER_CACHE_TTL)
+    if config.USER_CACHE_BACKEND != "memory":
+        raise ValueError(f"Неизвестный USER_CACHE_BACKEND: {config.USER_CACHE_BACKEND}")
+    return LRUCache(config.USER_CACHE_SIZE, config.USER_CACHE_TTL)
+
+
+# Общий кэш пользователей процесса (None, если кэш выключен)
+user_cache = build_user_cache()
@@ -0,0 +1,225 @@
+"""
+Сжатие ответов (COMPRESSION_ENABLED): gzip, а если установлен пакет brotli — br.
+
+Кодировка выбирается по Accept-Encoding клиента (br предпочтительнее при равном q).
+Сжимаются только ответы от COMPRESSION_MIN_SIZE байт: у ответа с одним пользователем
+сжатие не сокращает число пакетов, а процессорное время тратит. Потоковые ответы
+(GET /users/export) накапливаются до порога и дальше сжимаются по мере отправки фрагментов.
+"""
+import gzip
+import zlib
+from typing import Optional
+
+from prometheus_client import Counter
+
+from app import config
+from app.metrics import registry
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_RESPONSES = Counter(
+    "http_compressed_responses_total",
+    "Ответов, сжатых middleware",
+    ["encoding"],
+    registry=registry,
+)
+COMPRESSION_BYTES = Counter(
+    "http_compression_bytes_total",
+    "Байт тела сжатых ответов до (stage=in) и после (stage=out) сжатия",
+    ["encoding", "stage"],
+    registry=registry,
+)
+
+# Форматы, которые уже сжаты или почти не сжимаются
+INCOMPRESSIBLE_TYPES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/octet-stream")
+
+
+def supported_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str, encodings: tuple) -> Optional[str]:
+    """Кодировка из encodings с наибольшим q в Accept-Encoding (при равенстве — по порядку encodings)"""
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+    best = None
+    for encoding in encodings:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31: заголовок и контрольная сумма gzip
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def compress_body(encoding: str, body: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def stream_compressor(encoding: str):
+    if encoding == "br":
+        return _BrotliCompressor(config.COMPRESSION_BROTLI_QUALITY)
+    return _GzipCompressor(config.COMPRESSION_GZIP_LEVEL)
+
+
+class CompressionMiddleware:
+    """ASGI-middleware сжатия тел ответов не меньше min_size байт"""
+
+    def __init__(self, app, min_size: int = None, encodings: tuple = None):
+        self.app = app
+        self.min_size = config.COMPRESSION_MIN_SIZE if min_size is None else min_size
+        self.encodings = encodings or supported_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+        encoding = choose_encoding(accept_encoding, self.encodings) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self.app, encoding, self.min_size)(scope, receive, send)
+
+
+class _CompressedResponder:
+    """Состояние одного ответа: заголовки придерживаются, пока не ясно, сжимать ли тело"""
+
+    def __init__(self, app, encoding: str, min_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.min_size = min_size
+        self.send = None
+        self.start = None
+        self.passthrough = False
+        self.pending = []
+        self.pending_size = 0
+        self.compressor = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _eligible(self, message) -> bool:
+        headers = {name.lower(): value for name, value in message.get("headers", [])}
+        if b"content-encoding" in headers or message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        return not content_type.startswith(INCOMPRESSIBLE_TYPES)
+
+    def _headers(self, content_length: int = None) -> list:
+        headers = []
+        for name, value in self.start.get("headers", []):
+            lowered = name.lower()
+            if lowered == b"content-length" or lowered == b"vary":
+                continue
+            if lowered == b"etag" and not value.startswith(b"W/"):
+                # Сжатое представление не совпадает побайтно с исходным: строгий ETag становится слабым
+                value = b"W/" + value
+            headers.append((name, value))
+        vary = [value for name, value in self.start.get("headers", []) if name.lower() == b"vary"]
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        headers.append((b"content-encoding", self.encoding.encode()))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        return headers
+
+    async def send_compressed(self, message):
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] == "http.response.start":
+            self.start = message
+            if not self._eligible(message):
+                self.passthrough = True
+                await self.send(message)
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        self.bytes_in += len(body)
+
+        if self.compressor is not None:
+            await self._send_chunk(self.compressor.compress(body), more_body)
+            return
+
+        self.pending.append(body)
+        self.pending_size += len(body)
+        if self.pending_size < self.min_size:
+            if not more_body:
+                # Весь ответ меньше порога: отдаём как есть
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": b"".join(self.pending), "more_body": False})
+            return
+
+        data = b"".join(self.pending)
+        self.pending = []
+        if not more_body:
+            compressed = compress_body(self.encoding, data)
+            self.bytes_out += len(compressed)
+            await self.send({**self.start, "headers": self._headers(len(compressed))})
+            await self.send({"type": "http.response.body", "body": compressed, "more_body": False})
+            self._observe()
+            return
+        # Каждый фрагмент потока сжимается со сбросом буфера компрессора: клиент получает данные
+        # по мере выгрузки, а не после того, как компрессор накопит свой буфер
+        self.compressor = stream_compressor(self.encoding)
+        await self.send({**self.start, "headers": self._headers()})
+        await self._send_chunk(self.compressor.compress(data), more_body=True)
+
+    async def _send_chunk(self, data: bytes, more_body: bool):
+        if not more_body:
+            data += self.compressor.finish()
+        self.bytes_out += len(data)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+        if not more_body:
+            self._observe()
+
+    def _observe(self):
+        COMPRESSED_RESPONSES.labels(self.encoding).inc()
+        COMPRESSION_BYTES.labels(self.encoding, "in").inc(self.bytes_in)
+        COMPRESSION_BYTES.labels(self.encoding, "out").inc(self.bytes_out)
@@ -0,0 +1,144 @@
+import os
+
+# Настройки приложения читаются из переменных окружения
+
+# Строка подключения к базе данных
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
+
+# Асинхронный драйвер для той же базы (по умолчанию aiosqlite)
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# Режим работы эндпоинтов с БД: "sync" (Session в пуле потоков) или "async" (AsyncSession)
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# Пул соединений. Синхронные эндпоинты выполняются в пуле потоков anyio, и ответ сериализуется
+# тоже в нём, а соединение сессии освобождается только после этого. При ограниченном пуле потоки
+# ждут соединений, удерживаемых запросами, которым не достаётся потока на сериализацию, и под
+# нагрузкой всё висит до таймаута пула. Поэтому переполнение по умолчанию не ограничено (-1),
+# а DB_POOL_SIZE задаёт число соединений, которые держатся открытыми между запросами
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "-1"))
+
+# Максимальное число пользователей в одном запросе POST /users/bulk
+BULK_CREATE_MAX_ITEMS = int(os.getenv("BULK_CREATE_MAX_ITEMS", "1000"))
+
+# Максимальное число id в одном запросе GET /users?ids=...
+BATCH_GET_MAX_IDS = int(os.getenv("BATCH_GET_MAX_IDS", "500"))
+
+# Кэш пользователей для GET /users/{id}: memory (LRU в процессе) или redis (общий для процессов)
+USER_CACHE_ENABLED = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+USER_CACHE_BACKEND = os.getenv("USER_CACHE_BACKEND", "memory")
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_REDIS_URL = os.getenv("USER_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Число строк, которое выгрузка GET /users/export читает из курсора и отдаёт клиенту за раз
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Разделение чтения и записи: GET-эндпоинты работают через пул читателей,
+# изменения идут через единственное соединение писателя
+DB_READ_WRITE_SPLIT = os.getenv("DB_READ_WRITE_SPLIT", "true").lower() == "true"
+# Сколько секунд запрос на запись ждёт освобождения соединения писателя
+DB_WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "30"))
+
+# PRAGMA для SQLite: WAL позволяет читать во время записи, остальные ускоряют чтение
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Отрицательное значение — размер страничного кэша в КиБ на соединение
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Файловая блокировка <база>.write-lock: писатели нескольких процессов ждут друг друга по очереди
+SQLITE_WRITE_LOCK = os.getenv("SQLITE_WRITE_LOCK", "true").lower() == "true"
+
+# Сжатие ответов (app/compression.py): gzip, а при установленном пакете brotli — br по Accept-Encoding.
+# Ответы меньше COMPRESSION_MIN_SIZE байт (один пользователь, счётчик) отдаются без сжатия:
+# они и так помещаются в один TCP-сегмент. Уровни подобраны для динамических ответов —
+# выше них размер почти не уменьшается, а время сжатия растёт (benchmarks/compression.py)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1400"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Быстрые ответы GET /users/: столбцы без ORM-объектов, кодирование через orjson (если установлен)
+FAST_LIST_RESPONSES = os.getenv("FAST_LIST_RESPONSES", "true").lower() == "true"
+
+
+# Метрики Prometheus на /metrics: задержки по маршрутам и число/время SQL-запросов на HTTP-запрос
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Диагностика SQL (работает вместе с METRICS_ENABLED, который задаёт контекст HTTP-запроса).
+# Запросы дольше SQL_SLOW_QUERY_MS логируются с параметрами и планом (0 — выключено)
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+# Сохранять текст, параметры и время каждого запроса в рамках HTTP-запроса (для отчёта о бюджете)
+SQL_RECORD_STATEMENTS = os.getenv("SQL_RECORD_STATEMENTS", "false").lower() == "true"
+# Бюджет SQL-запросов на HTTP-запрос (0 — без ограничения): warn пишет предупреждение,
+# raise прерывает запрос на лишнем SQL-запросе (для тестов, чтобы N+1 не прошёл незамеченным)
+SQL_STATEMENT_BUDGET = int(os.getenv("SQL_STATEMENT_BUDGET", "0"))
+SQL_BUDGET_MODE = os.getenv("SQL_BUDGET_MODE", "warn")
+
+# Объединение одновременных запросов GET /users/{id} к одному пользователю в один SQL-запрос.
+# Ожидающие запросы получают 504, если общий запрос не завершился за SINGLE_FLIGHT_TIMEOUT секунд
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "10"))
+
+# Фильтр Блума по email (app/email_filter.py): ответ "точно нет" избавляет создание пользователя
+# от SELECT по email. Размер рассчитывается на EMAIL_FILTER_CAPACITY адресов (или больше, если
+# пользователей в базе уже больше) при доле ложных срабатываний EMAIL_FILTER_ERROR_RATE
+EMAIL_FILTER_ENABLED = os.getenv("EMAIL_FILTER_ENABLED", "true").lower() == "true"
+EMAIL_FILTER_CAPACITY = int(os.getenv("EMAIL_FILTER_CAPACITY", "1000000"))
+EMAIL_FILTER_ERROR_RATE = float(os.getenv("EMAIL_FILTER_ERROR_RATE", "0.01"))
+
+# Шардирование (app/sharding.py): пользователи хранятся в DB_SHARDS файлах SQLite по хешу id,
+# а уникальность email и выдачу id обеспечивает общий справочник email (0 — одна база DATABASE_URL).
+# Шаблон адреса шарда с {shard}; по умолчанию рядом с DATABASE_URL: test.shard0.db, test.directory.db
+DB_SHARDS = int(os.getenv("DB_SHARDS", "0"))
+DB_SHARD_URL_TEMPLATE = os.getenv("DB_SHARD_URL_TEMPLATE", "")
+DB_SHARD_DIRECTORY_URL = os.getenv("DB_SHARD_DIRECTORY_URL", "")
+# Наибольший skip для списков при шардировании: каждый шард читает skip + limit строк,
+# поэтому глубже отвечаем 400 и предлагаем курсор after_id
+DB_SHARD_MAX_SKIP = int(os.getenv("DB_SHARD_MAX_SKIP", "10000"))
+
+# Групповой коммит (app/group_commit.py): создания и изменения пользователей из одновременных
+# запросов фиксируются одной транзакцией раз в GROUP_COMMIT_WINDOW_MS миллисекунд или по
+# набору GROUP_COMMIT_MAX_OPS операций. Требует DB_READ_WRITE_SPLIT=true
+GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "false").lower() == "true"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "5"))
+GROUP_COMMIT_MAX_OPS = int(os.getenv("GROUP_COMMIT_MAX_OPS", "64"))
+
+# Контроль допуска (app/admission.py): сколько запросов класса обрабатывается одновременно
+# и сколько миллисекунд запрос ждёт места, прежде чем получить 503 с Retry-After.
+# Чтения ограничены размером пула читателей; записи идут через одно соединение писателя,
+# второе место даёт следующей записи начаться, пока предыдущая сериализует ответ.
+# У записей срок ожидания короче: под перегрузкой они отклоняются раньше чтений.
+# С групповым коммитом записи ждут в его очереди, и лимит равен размеру пачки
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_READ_LIMIT = int(os.getenv("ADMISSION_READ_LIMIT", str(DB_POOL_SIZE)))
+ADMISSION_READ_TIMEOUT_MS = float(os.getenv("ADMISSION_READ_TIMEOUT_MS", "500"))
+if GROUP_COMMIT_ENABLED:
+    _default_write_limit = GROUP_COMMIT_MAX_OPS
+elif DB_READ_WRITE_SPLIT:
+    _default_write_limit = 2
+else:
+    _default_write_limit = max(1, DB_POOL_SIZE // 4)
+ADMISSION_WRITE_LIMIT = int(os.getenv("ADMISSION_WRITE_LIMIT", str(_default_write_limit)))
+ADMISSION_WRITE_TIMEOUT_MS = float(os.getenv("ADMISSION_WRITE_TIMEOUT_MS", "250"))
+# Класс отдельных маршрутов: "METHOD /path=read|write|none" через запятую,
+# например "GET /users/export=write" (выгрузка не занимает места быстрых чтений)
+ADMISSION_ROUTES = os.getenv("ADMISSION_ROUTES", "")
+# Ограничение частоты по IP клиента (маркерная корзина): запросов в секунду и всплеск; 0 — выключено
+ADMISSION_CLIENT_RATE = float(os.getenv("ADMISSION_CLIENT_RATE", "0"))
+ADMISSION_CLIENT_BURST = int(os.getenv("ADMISSION_CLIENT_BURST", "20"))
+
+# Запуск через run.py: число процессов (больше 1 — gunicorn с воркерами uvicorn),
+# перезапуск воркера после WEB_MAX_REQUESTS запросов (± jitter, чтобы воркеры не уходили разом)
+# и время на завершение текущих запросов при перезапуске
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", "8000"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+WEB_MAX_REQUESTS = int(os.getenv("WEB_MAX_REQUESTS", "10000"))
+WEB_MAX_REQUESTS_JITTER = int(os.getenv("WEB_MAX_REQUESTS_JITTER", "1000"))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
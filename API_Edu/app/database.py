@@ -1,14 +1,108 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from app.models import Base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import (
+    DATABASE_URL,
+    ASYNC_DATABASE_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_READ_WRITE_SPLIT,
+    DB_WRITE_TIMEOUT,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_WRITE_LOCK
+)
+from app.metrics import track_statements
+from app.write_lock import coordinate_writes
+from app.migrations import ensure_schema
 import logging
 
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = "sqlite:///./test.db"
+WRITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+}
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+READ_PRAGMAS = {
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "temp_store": "MEMORY",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    # Защита от случайной записи через соединение читателя
+    "query_only": "ON",
+}
+
+def set_sqlite_pragmas(engine, pragmas: dict):
+    """Выполняет PRAGMA на каждом новом соединении SQLite-движка"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+# Писатель: одно соединение на процесс, запросы на запись выстраиваются в очередь пула.
+# Сессии писателя не истекают при commit, поэтому после commit не нужен refresh,
+# и соединение возвращается в пул сразу, а не после сериализации ответа.
+# Без разделения чтения и записи движок общий, и пул остаётся прежним
+if DB_READ_WRITE_SPLIT:
+    write_pool_options = {"pool_size": 1, "max_overflow": 0, "pool_timeout": DB_WRITE_TIMEOUT}
+else:
+    write_pool_options = {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    **write_pool_options
+)
+set_sqlite_pragmas(engine, WRITE_PRAGMAS)
+# Один писатель и между процессами (run.py --workers N): BEGIN IMMEDIATE и файловая блокировка.
+# Без разделения движок обслуживает и чтения, их сериализовать нельзя
+if DB_READ_WRITE_SPLIT:
+    coordinate_writes(engine, SQLITE_WRITE_LOCK)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Читатели: пул соединений только для чтения. В режиме WAL они не ждут commit писателя
+if DB_READ_WRITE_SPLIT:
+    read_engine = create_engine(
+        DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW
+    )
+    set_sqlite_pragmas(read_engine, READ_PRAGMAS)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine = engine
+    ReadSessionLocal = SessionLocal
+
+# Асинхронный движок для режима DB_MODE=async. Для aiosqlite по умолчанию NullPool,
+# который открывает файл и поток драйвера на каждый запрос, поэтому пул задаём явно.
+# Ожидание соединения здесь не занимает потоков, так что пул можно жёстко ограничить.
+# expire_on_commit=False: после commit атрибуты нельзя лениво догружать в async-коде
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=0
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Журнал медленных запросов, бюджет SQL-запросов и (при METRICS_ENABLED) счётчики для /metrics.
+# Хуки async-движка вешаются на его sync_engine
+track_statements(engine, "write")
+if read_engine is not engine:
+    track_statements(read_engine, "read")
+track_statements(async_engine.sync_engine, "async")
 
 def get_db():
     db = SessionLocal()
@@ -17,13 +111,29 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine():
+    # Закрываем соединения пула, чтобы потоки aiosqlite не пережили приложение
+    await async_engine.dispose()
+
 def init_db():
     try:
-        # Удаляем все таблицы (если есть)
-        Base.metadata.drop_all(bind=engine)
-        # Создаём таблицы заново
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
+        # Применяем только недостающие миграции; данные сохраняются между перезапусками
+        applied = ensure_schema(engine)
+        if applied:
+            logger.info(f"Database migrated to version {applied[-1]}")
+        else:
+            logger.info("Database schema is up to date")
     except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
-        raise
\ No newline at end of file
+        logger.error(f"Error migrating database schema: {e}")
+        raise
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import math
+import threading
+import time
+from typing import Iterable, Optional
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+class CountingBloomFilter:
+    """
+    Фильтр Блума со счётчиками вместо битов: кроме добавления поддерживает удаление.
+    might_contain() == False означает, что элемент точно не добавлялся (если удалялись
+    только добавленные элементы); True — "возможно есть" с долей ошибок около error_rate
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.counters = bytearray(self.size)
+        self.items = 0
+
+    def _positions(self, item: str) -> list[int]:
+        # Двойное хеширование: k позиций из двух 64-битных половин одного blake2b
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        counters = self.counters
+        for position in self._positions(item):
+            # Счётчик на 255 "залипает": уменьшать его уже нельзя, иначе возможен ложный ответ "нет"
+            if counters[position] < 255:
+                counters[position] += 1
+        self.items += 1
+
+    def remove(self, item: str) -> None:
+        positions = self._positions(item)
+        counters = self.counters
+        if not all(counters[position] for position in positions):
+            return
+        for position in positions:
+            if counters[position] < 255:
+                counters[position] -= 1
+        self.items = max(0, self.items - 1)
+
+    def might_contain(self, item: str) -> bool:
+        counters = self.counters
+        return all(counters[position] for position in self._positions(item))
+
+    def estimated_error_rate(self) -> float:
+        """Ожидаемая доля ложных срабатываний при текущем числе элементов"""
+        return (1 - math.exp(-self.hashes * self.items / self.size)) ** self.hashes
+
+
+class EmailFilter:
+    """
+    Фильтр существующих email для проверки уникальности при создании пользователя.
+
+    Пока фильтр не построен (rebuild), might_exist всегда отвечает "возможно", и проверка идёт
+    через SELECT. Фильтр свой у каждого процесса и не видит изменений из других воркеров, поэтому
+    окончательную уникальность по-прежнему гарантирует уникальный индекс users.email
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.absent = 0
+        self.maybe = 0
+        self.false_positives = 0
+        self.rebuild_seconds = None
+        self._filter: Optional[CountingBloomFilter] = None
+        self._pending: Optional[list] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def might_exist(self, email: str) -> bool:
+        bloom = self._filter
+        if bloom is None:
+            return True
+        with self._lock:
+            if bloom.might_contain(email):
+                self.maybe += 1
+                return True
+            self.absent += 1
+            return False
+
+    def record_false_positive(self, count: int = 1) -> None:
+        """Фильтр ответил "возможно", а SELECT адрес не нашёл"""
+        if self._filter is None:
+            return
+        with self._lock:
+            self.false_positives += count
+
+    def add(self, email: str) -> None:
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(email)
+            if self._filter is not None:
+                self._filter.add(email)
+
+    def remove(self, email: str) -> None:
+        with self._lock:
+            if self._filter is not None:
+                self._filter.remove(email)
+
+    def rebuild(self, emails: Iterable[str], expected: int = 0) -> None:
+        """
+        Строит фильтр заново и подменяет им текущий. Адреса, добавленные во время построения,
+        переносятся в новый фильтр; удалённые за это время остаются в нём ложным "возможно"
+        """
+        started = time.perf_counter()
+        with self._lock:
+            self._pending = []
+        try:
+            bloom = CountingBloomFilter(max(self.capacity, int(expected * 1.25)), self.error_rate)
+            for email in emails:
+                bloom.add(email)
+            with self._lock:
+                for email in self._pending:
+                    bloom.add(email)
+                self._filter = bloom
+        finally:
+            with self._lock:
+                self._pending = None
+        self.rebuild_seconds = time.perf_counter() - started
+        logger.info(f"Email filter built: {bloom.items} emails in {self.rebuild_seconds:.2f} s")
+
+    def stats(self) -> dict:
+        bloom = self._filter
+        checked_absent = self.absent + self.false_positives
+        return {
+            "ready": bloom is not None,
+            "items": bloom.items if bloom else 0,
+            "capacity": bloom.capacity if bloom else self.capacity,
+            "memory_bytes": bloom.size if bloom else 0,
+            "absent": self.absent,
+            "maybe": self.maybe,
+            "false_positives": self.false_positives,
+            # Доля новых адресов, для которых фильтр всё равно потребовал SELECT
+            "false_positive_rate": self.false_positives / checked_absent if checked_absent else 0.0,
+            "estimated_false_positive_rate": bloom.estimated_error_rate() if bloom else 0.0,
+            "rebuild_seconds": self.rebuild_seconds,
+        }
+
+
+def warm_email_filter(session_factory) -> None:
+    """Построение фильтра по всем email в базе (вызывается при старте в отдельном потоке)"""
+    from app.repositories import UserRepository
+
+    try:
+        with session_factory() as db:
+            repository = UserRepository(db)
+            email_filter.rebuild(repository.iter_emails(), repository.count_users())
+    except Exception as e:
+        # Без фильтра всё работает как раньше, через SELECT
+        logger.error(f"Error building email filter: {e}")
+
+
+# Общий фильтр процесса (None, если выключен). С шардами уникальность проверяет
+# вставка в справочник email (app.sharding), отдельный SELECT там не выполняется
+email_filter = (
+    EmailFilter(config.EMAIL_FILTER_CAPACITY, config.EMAIL_FILTER_ERROR_RATE)
+    if config.EMAIL_FILTER_ENABLED and config.DB_SHARDS <= 0 else None
+)
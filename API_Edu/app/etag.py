@@ -0,0 +1,32 @@
+import hashlib
+from typing import Iterable, Optional
+
+from fastapi import Response, status
+
+
+# Пара (id, версия) уникальна, потому что id не переиспользуются: таблица users создаётся
+# с AUTOINCREMENT, а старые базы пересоздаёт миграция 7 (проверка: benchmarks/etag_reuse.py)
+def user_etag(user_id: int, version: int) -> str:
+    return f'"{user_id}-{version}"'
+
+
+def list_etag(rows: Iterable[tuple]) -> str:
+    """ETag страницы списка по парам (id, version) в порядке выдачи"""
+    digest = hashlib.blake2b(digest_size=16)
+    for user_id, version in rows:
+        digest.update(f"{user_id}:{version};".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Для If-None-Match по RFC 9110 используется слабое сравнение: префикс W/ игнорируется
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip() for candidate in if_none_match.split(","))
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def not_modified(etag: str, headers: Optional[dict] = None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, **(headers or {})})
@@ -29,4 +29,32 @@ class ValidationException(HTTPException):
             detail="Ошибка валидации данных",
             headers={"X-Error": "Validation"}
         )
-        self.errors = errors
\ No newline at end of file
+        self.errors = errors
+
+class InvalidCursorException(HTTPException):
+    def __init__(self, cursor: str):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Некорректный курсор пагинации: {cursor}"
+        )
+
+class LookupTimeoutException(HTTPException):
+    def __init__(self, timeout: float):
+        super().__init__(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=f"Запрос к базе данных не завершился за {timeout:g} с"
+        )
+
+class FeatureUnavailableException(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=detail
+        )
+
+class PageTooDeepException(HTTPException):
+    def __init__(self, skip: int, max_skip: int):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"skip={skip} больше допустимого {max_skip}; для глубоких страниц используйте after_id или cursor"
+        )
@@ -0,0 +1,51 @@
+import csv
+import io
+import json
+
+from app import config
+from app.database import ReadSessionLocal
+from app.repositories import UserRepository
+from app.sharding import sharded_store, ShardedUserRepository
+from app.schemas import ExportFormat
+
+EXPORT_FIELDS = ("id", "name", "email", "age")
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+def encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n" for row in rows
+    )
+
+
+def encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def stream_users(
+    format: ExportFormat,
+    batch_size: int = config.EXPORT_BATCH_SIZE,
+    session_factory=ReadSessionLocal
+):
+    """
+    Генератор выгрузки всех пользователей. Сессия своя, а не из get_db: она должна жить,
+    пока клиент читает ответ, а не пока работает эндпоинт. В памяти держится одна пачка строк
+    """
+    db = session_factory()
+    try:
+        if format == ExportFormat.csv:
+            yield encode_csv([EXPORT_FIELDS])
+            encode = encode_csv
+        else:
+            encode = encode_ndjson
+        repository = ShardedUserRepository(sharded_store) if sharded_store is not None else UserRepository(db)
+        for rows in repository.iter_user_rows(batch_size):
+            yield encode(rows)
+    finally:
+        db.close()
@@ -0,0 +1,235 @@
+"""
+Групповой коммит записей (GROUP_COMMIT_ENABLED=true).
+
+В SQLite каждый commit — это запись журнала на диск, и по одному commit на запрос
+POST /users/ упирается в несколько сотен записей в секунду. Здесь создания и изменения
+пользователей из одновременных запросов попадают в очередь; отдельный поток писателя
+собирает их не дольше GROUP_COMMIT_WINDOW_MS (или до GROUP_COMMIT_MAX_OPS операций)
+и фиксирует одной транзакцией.
+
+Каждая операция выполняется в своём SAVEPOINT: ошибка одной (email занят, пользователь
+не найден) откатывает только её, и запрос получает своё исключение, а остальные операции
+пачки фиксируются. Ответ запрос получает только после общего commit.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from prometheus_client import Histogram
+
+from app import config
+from app.email_filter import email_filter
+from app.exceptions import DatabaseException, EmailAlreadyExistsException, UserNotFoundException
+from app.metrics import registry
+from app.repositories import UserRepository
+from app.schemas import UserCreate, UserRecord
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT_BATCH = Histogram(
+    "group_commit_batch_size",
+    "Операций записи в одном групповом commit",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+    registry=registry,
+)
+
+# Ошибки, которые относятся к самой операции и передаются запросу как есть
+OPERATION_ERRORS = (EmailAlreadyExistsException, UserNotFoundException)
+
+
+class _Operation:
+    def __init__(self, fn: Callable):
+        self.fn = fn
+        self.future = Future()
+        self.after_commit = None
+
+
+class GroupCommitter:
+    """
+    Очередь операций записи с общим commit. Операция — функция от UserRepository,
+    которая возвращает (результат, действие после commit или None) и сама не вызывает commit
+    """
+
+    def __init__(self, session_factory, window_ms: float, max_ops: int, timeout: float):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_ops = max_ops
+        self.timeout = timeout
+        self.batches = 0
+        self.operations = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._guard = threading.Lock()
+
+    def _ensure_thread(self):
+        # Поток запускается лениво и заново после fork: в воркер gunicorn потоки не переходят
+        with self._guard:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._loop, name="group-commit", daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, fn: Callable) -> Future:
+        self._ensure_thread()
+        operation = _Operation(fn)
+        self._queue.put(operation)
+        return operation.future
+
+    def run(self, fn: Callable) -> Any:
+        future = self.submit(fn)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # Операцию, которую ещё не начали, можно отменить; начатую дожидаемся,
+            # иначе клиент получил бы ошибку на запись, которая всё-таки зафиксирована
+            if future.cancel():
+                raise DatabaseException("Запись не дождалась очереди группового коммита")
+            return future.result()
+
+    async def run_async(self, fn: Callable) -> Any:
+        future = self.submit(fn)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            if future.cancel():
+                raise DatabaseException("Запись не дождалась очереди группового коммита")
+            return await asyncio.wrap_future(future)
+
+    def _collect(self) -> list[_Operation]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_ops:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Отменённые по таймауту операции не выполняются
+        return [operation for operation in batch if operation.future.set_running_or_notify_cancel()]
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    logger.error(f"Group commit failed: {e}")
+                    for operation in batch:
+                        if not operation.future.done():
+                            operation.future.set_exception(DatabaseException("Ошибка при сохранении изменений"))
+
+    def _commit_batch(self, batch: list[_Operation]):
+        succeeded = []
+        with self.session_factory() as db:
+            repository = UserRepository(db, email_filter)
+            for operation in batch:
+                try:
+                    with db.begin_nested():
+                        result, operation.after_commit = operation.fn(repository)
+                    succeeded.append((operation, result))
+                except OPERATION_ERRORS as e:
+                    operation.future.set_exception(e)
+                except Exception as e:
+                    logger.error(f"Database error in group commit operation: {e}")
+                    operation.future.set_exception(DatabaseException("Ошибка при сохранении изменений"))
+            try:
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+        self.batches += 1
+        self.operations += len(batch)
+        GROUP_COMMIT_BATCH.observe(len(batch))
+        for operation, result in succeeded:
+            if operation.after_commit is not None:
+                operation.after_commit()
+            operation.future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "queued": self._queue.qsize(),
+            "average_batch": self.operations / self.batches if self.batches else 0.0,
+        }
+
+
+# Операции записи для очереди. Результат — снимок UserRecord: в одной пачке несколько операций
+# могут менять один и тот же объект сессии, а ответ должен отражать именно свою операцию
+def create_user_operation(user: UserCreate) -> Callable:
+    def operation(repository: UserRepository):
+        db_user = repository.stage_create_user(user)
+        return UserRecord.model_validate(db_user), lambda: repository.remember_email(user.email)
+    return operation
+
+
+def update_user_operation(user_id: int, user: UserCreate) -> Callable:
+    def operation(repository: UserRepository):
+        db_user, old_email = repository.stage_update_user(user_id, user)
+        return UserRecord.model_validate(db_user), lambda: repository.replace_email(old_email, user.email)
+    return operation
+
+
+class GroupCommitUserRepository:
+    """Создание и изменение пользователя через групповой коммит; остальное — как у обёрнутого репозитория"""
+
+    def __init__(self, repository, committer: GroupCommitter):
+        self.repository = repository
+        self.committer = committer
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def create_user(self, user: UserCreate) -> UserRecord:
+        return self.committer.run(create_user_operation(user))
+
+    def update_user(self, user_id: int, user: UserCreate) -> UserRecord:
+        return self.committer.run(update_user_operation(user_id, user))
+
+
+class AsyncGroupCommitUserRepository:
+    """То же для AsyncUserRepository: запрос ждёт результата очереди, не занимая поток"""
+
+    def __init__(self, repository, committer: GroupCommitter):
+        self.repository = repository
+        self.committer = committer
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    async def create_user(self, user: UserCreate) -> UserRecord:
+        return await self.committer.run_async(create_user_operation(user))
+
+    async def update_user(self, user_id: int, user: UserCreate) -> UserRecord:
+        return await self.committer.run_async(update_user_operation(user_id, user))
+
+
+def build_group_committer():
+    if not config.GROUP_COMMIT_ENABLED:
+        return None
+    if config.DB_SHARDS > 0:
+        logger.warning("GROUP_COMMIT_ENABLED is not supported with DB_SHARDS, group commit is disabled")
+        return None
+    if not config.DB_READ_WRITE_SPLIT:
+        # SAVEPOINT в pysqlite работает только с явным BEGIN, который ставится на движок писателя
+        logger.warning("GROUP_COMMIT_ENABLED requires DB_READ_WRITE_SPLIT=true, group commit is disabled")
+        return None
+    from app.database import SessionLocal
+    return GroupCommitter(
+        SessionLocal, config.GROUP_COMMIT_WINDOW_MS, config.GROUP_COMMIT_MAX_OPS, config.DB_WRITE_TIMEOUT
+    )
+
+
+# Общая очередь процесса (None, если групповой коммит выключен)
+group_committer = build_group_committer()
@@ -1,18 +1,48 @@
-from fastapi import FastAPI, Depends, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Body, Depends, Header, Query, Request, Response, status
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import ValidationError
+from typing import Optional
 import logging
+import threading
 
-from app.database import get_db, init_db
-from app.repositories import UserRepository
-from app.services import UserService
-from app.schemas import UserCreate, UserResponse, ErrorResponse, ValidationErrorResponse
+from app import config
+from app.database import get_db, get_read_db, init_db, ReadSessionLocal
+from app.cache import user_cache
+from app.email_filter import email_filter, warm_email_filter
+from app.group_commit import group_committer, GroupCommitUserRepository
+from app.repositories import UserRepository, CachedUserRepository
+from app.sharding import sharded_store, ShardedUserRepository
+from app.services import UserService, user_lookups, async_user_lookups
+from app.export import stream_users, MEDIA_TYPES
+from app.etag import user_etag, list_etag, etag_matches, not_modified
+from app.pagination import decode_cursor, parse_user_ids
+from app.responses import users_json_response
+from app.admission import AdmissionMiddleware
+from app.compression import CompressionMiddleware
+from app.metrics import (
+    MetricsMiddleware, QueryStatsMiddleware, CacheCollector, SingleFlightCollector, EmailFilterCollector, registry, render_metrics
+)
+from app.schemas import (
+    UserCreate,
+    UserResponse,
+    UserBulkResponse,
+    UserBatchResponse,
+    UserChangesResponse,
+    UserStatsResponse,
+    ExportFormat,
+    ErrorResponse,
+    ValidationErrorResponse
+)
 from app.exceptions import (
     UserNotFoundException, 
     EmailAlreadyExistsException, 
     DatabaseException,
-    ValidationException
+    ValidationException,
+    InvalidCursorException,
+    FeatureUnavailableException,
+    PageTooDeepException,
+    LookupTimeoutException
 )
 from app.database import init_db
 
@@ -31,14 +61,44 @@ app = FastAPI(
         {
             "name": "Users",
             "description": "Операции с пользователями"
+        },
+        {
+            "name": "Monitoring",
+            "description": "Служебные эндпоинты для мониторинга"
         }
     ]
 )
 
+# Порядок важен: добавленное последним middleware выполняется первым,
+# поэтому метрики учитывают и запросы, отклонённые контролем допуска, а сжатие
+# выполняется внутри места, выданного контролем допуска
+if config.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+if config.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
+
+if config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    if user_cache is not None:
+        registry.register(CacheCollector(user_cache))
+    if user_lookups is not None:
+        registry.register(SingleFlightCollector(user_lookups, async_user_lookups))
+    if email_filter is not None:
+        registry.register(EmailFilterCollector(email_filter))
+else:
+    # Бюджет SQL-запросов работает и без метрик
+    app.add_middleware(QueryStatsMiddleware)
+
 # Инициализация базы данных
 @app.on_event("startup")
 def on_startup():
     init_db()
+    if sharded_store is not None:
+        sharded_store.migrate()
+    if email_filter is not None:
+        # Фильтр email строится в фоне: до готовности уникальность проверяется через SELECT
+        threading.Thread(target=warm_email_filter, args=(ReadSessionLocal,), daemon=True).start()
     logger.info("Application started and database initialized")
 
 # Глобальные обработчики исключений
@@ -56,6 +116,34 @@ async def email_exists_exception_handler(request, exc):
         content={"detail": exc.detail, "error_type": "conflict"}
     )
 
+@app.exception_handler(InvalidCursorException)
+async def invalid_cursor_exception_handler(request, exc):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "error_type": "bad_request"}
+    )
+
+@app.exception_handler(PageTooDeepException)
+async def page_too_deep_exception_handler(request, exc):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "error_type": "bad_request"}
+    )
+
+@app.exception_handler(FeatureUnavailableException)
+async def feature_unavailable_exception_handler(request, exc):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "error_type": "not_implemented"}
+    )
+
+@app.exception_handler(LookupTimeoutException)
+async def lookup_timeout_exception_handler(request, exc):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "error_type": "timeout"}
+    )
+
 @app.exception_handler(DatabaseException)
 async def database_exception_handler(request, exc):
     return JSONResponse(
@@ -76,12 +164,65 @@ async def validation_exception_handler(request, exc):
 
 # Зависимости
 def get_user_repository(db: Session = Depends(get_db)) -> UserRepository:
-    return UserRepository(db)
+    if sharded_store is not None:
+        repository = ShardedUserRepository(sharded_store)
+    else:
+        repository = UserRepository(db, email_filter)
+    if group_committer is not None:
+        repository = GroupCommitUserRepository(repository, group_committer)
+    if user_cache is not None:
+        return CachedUserRepository(repository, user_cache)
+    return repository
 
+def get_read_user_repository(db: Session = Depends(get_read_db)) -> UserRepository:
+    # С шардами сессии открываются в каждом нужном шарде, общая сессия не используется
+    repository = ShardedUserRepository(sharded_store) if sharded_store is not None else UserRepository(db)
+    if user_cache is not None:
+        return CachedUserRepository(repository, user_cache)
+    return repository
+
+# Сервис для изменений работает через сессию писателя
 def get_user_service(user_repository: UserRepository = Depends(get_user_repository)) -> UserService:
     return UserService(user_repository)
 
+# Сервис для GET-эндпоинтов работает через пул читателей
+# и объединяет одновременные запросы одного пользователя
+def get_read_user_service(user_repository: UserRepository = Depends(get_read_user_repository)) -> UserService:
+    return UserService(user_repository, user_lookups)
+
 # Эндпоинты
+@app.get(
+    "/cache/stats",
+    responses={
+        200: {"description": "User cache counters"}
+    },
+    tags=["Monitoring"]
+)
+def read_cache_stats():
+    """
+    Hit, miss and eviction counters of the user cache (for sizing USER_CACHE_SIZE / USER_CACHE_TTL)
+    and the email Bloom filter: false-positive rate, size and last rebuild time
+    """
+    filter_stats = email_filter.stats() if email_filter is not None else None
+    if user_cache is None:
+        return {"enabled": False, "email_filter": filter_stats}
+    return {"enabled": True, **user_cache.stats(), "email_filter": filter_stats}
+
+@app.get(
+    "/metrics",
+    response_class=Response,
+    responses={
+        200: {"description": "Prometheus metrics", "content": {"text/plain": {}}}
+    },
+    tags=["Monitoring"]
+)
+def read_metrics():
+    """
+    Request latency, in-flight requests and per-request SQL statement counts/time in Prometheus text format
+    """
+    body, content_type = render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
+
 @app.post(
     "/users/", 
     response_model=UserResponse, 
@@ -106,32 +247,268 @@ def create_user(
     """
     return user_service.create_user(user)
 
+@app.post(
+    "/users/bulk",
+    response_model=UserBulkResponse,
+    responses={
+        200: {"description": "Users processed, see per-item results"},
+        422: {"description": "Validation error - invalid input data", "model": ValidationErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse}
+    },
+    tags=["Users"]
+)
+def create_users_bulk(
+    users: list[UserCreate] = Body(..., min_length=1, max_length=config.BULK_CREATE_MAX_ITEMS),
+    user_service: UserService = Depends(get_user_service)
+):
+    """
+    Create many users in a single transaction.
+
+    Accepts a JSON array of users (same fields as `POST /users/`, up to 1000 items by default).
+    Every item gets its own result: **created** with the new user, or **conflict** when the email
+    is already taken (including duplicates inside the request).
+    """
+    results = user_service.create_users_bulk(users)
+    created = sum(1 for result in results if result.status == "created")
+    return UserBulkResponse(created=created, conflicts=len(results) - created, results=results)
+
 @app.get(
     "/users/", 
     response_model=list[UserResponse],
     responses={
-        200: {"description": "List of users retrieved successfully"},
+        200: {
+            "description": "List of users retrieved successfully",
+            "headers": {
+                "ETag": {
+                    "description": "Strong validator of the page, send it back in If-None-Match",
+                    "schema": {"type": "string"}
+                },
+                "X-Next-Cursor": {
+                    "description": "Cursor of the next page (cursor mode only, absent on the last page)",
+                    "schema": {"type": "string"}
+                },
+                "X-Total-Count": {
+                    "description": "Total number of users",
+                    "schema": {"type": "integer"}
+                }
+            }
+        },
+        304: {"description": "Not modified - the page matches If-None-Match"},
+        400: {"description": "Bad request - invalid cursor, or skip above DB_SHARD_MAX_SKIP with DB_SHARDS", "model": ErrorResponse},
         500: {"description": "Internal server error", "model": ErrorResponse}
     },
     tags=["Users"]
 )
 def read_users(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
-    user_service: UserService = Depends(get_user_service)
+    after_id: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    user_service: UserService = Depends(get_read_user_service)
 ):
     """
-    Retrieve a list of users with pagination:
+    Retrieve a list of users with pagination.
+
+    Offset mode (default):
     - **skip**: number of records to skip (default 0)
     - **limit**: maximum number of records to return (default 100, max 1000)
+
+    Cursor mode (constant cost regardless of page depth):
+    - **after_id**: return users with ID greater than this value (use 0 for the first page)
+    - **cursor**: opaque value from the `X-Next-Cursor` header of the previous page
+
+    Responses carry an `ETag`; repeat the request with `If-None-Match` to get 304 when nothing changed.
+    `X-Total-Count` holds the total number of users.
     """
-    return user_service.get_all_users(skip, min(limit, 1000))
+    limit = min(limit, 1000)
+    if cursor is not None:
+        after_id = decode_cursor(cursor)
+    # Быстрый путь: строки-кортежи сразу кодируются в JSON, минуя ORM и UserResponse
+    fast = config.FAST_LIST_RESPONSES
+    headers = {}
+
+    if after_id is None:
+        if if_none_match:
+            etag = user_service.get_all_users_etag(skip, limit)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        users = user_service.get_all_users(skip, limit, as_rows=fast)
+    else:
+        limit = max(limit, 1)
+        if if_none_match:
+            etag, next_cursor = user_service.get_users_after_etag(after_id, limit)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag, {"X-Next-Cursor": next_cursor} if next_cursor else None)
+        users, next_cursor = user_service.get_users_after(after_id, limit, as_rows=fast)
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = next_cursor
+
+    headers["ETag"] = list_etag((user.id, user.version) for user in users)
+    headers["X-Total-Count"] = str(user_service.count_users())
+    if fast:
+        return users_json_response(users, headers)
+    response.headers.update(headers)
+    return users
+
+@app.get(
+    "/users",
+    response_model=UserBatchResponse,
+    responses={
+        200: {"description": "Found users in the requested order and the IDs that do not exist"},
+        307: {"description": "Redirect to GET /users/ when ids is not given"},
+        422: {"description": "Validation error - malformed ids or too many of them"},
+        500: {"description": "Internal server error", "model": ErrorResponse}
+    },
+    tags=["Users"]
+)
+def read_users_by_ids(
+    request: Request,
+    ids: Optional[str] = Query(None, pattern=r"^\d+(,\d+)*$", description="Comma-separated user IDs"),
+    user_service: UserService = Depends(get_read_user_service)
+):
+    """
+    Retrieve many users by ID with a single query:
+    - **ids**: comma-separated user IDs, e.g. `ids=3,1,2` (at most BATCH_GET_MAX_IDS)
+
+    Users are returned in the order of the request (duplicates collapsed), IDs that do not exist
+    are listed in `missing`. Users already in the cache are not read from the database.
+    """
+    if ids is None:
+        # Без ids это обращение к списку без завершающего слэша, как было до пакетной выборки
+        return RedirectResponse(request.url.replace(path="/users/"), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+    users, missing = user_service.get_users_by_ids(parse_user_ids(ids))
+    return {"users": users, "missing": missing}
+
+@app.get(
+    "/users/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "All users streamed as NDJSON (one JSON object per line) or CSV with a header row",
+            "content": {"application/x-ndjson": {}, "text/csv": {}}
+        },
+        500: {"description": "Internal server error", "model": ErrorResponse}
+    },
+    tags=["Users"]
+)
+def export_users(format: ExportFormat = ExportFormat.ndjson):
+    """
+    Export all users ordered by ID:
+    - **format**: `ndjson` (default) or `csv`
+
+    Rows are streamed from a database cursor, so memory use does not depend on the table size.
+    """
+    return StreamingResponse(
+        stream_users(format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format.value}"'}
+    )
+
+@app.get(
+    "/users/search",
+    response_model=list[UserResponse],
+    responses={
+        200: {"description": "Matching users ordered by relevance"},
+        422: {"description": "Validation error - invalid input data", "model": ValidationErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse}
+    },
+    tags=["Users"]
+)
+def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    user_service: UserService = Depends(get_read_user_service)
+):
+    """
+    Search users by name fragment or email prefix:
+    - **q**: search text; every word is matched as a prefix of a word in the name or email
+      (e.g. `jo do` finds "John Doe", `john@exa` finds "john@example.com")
+    - **limit**: maximum number of results (default 20, max 100)
+
+    Results are ranked by relevance (BM25 over a full-text index).
+    """
+    return user_service.search_users(q, limit)
+
+@app.get(
+    "/users/count",
+    responses={
+        200: {"description": "Total number of users"},
+        500: {"description": "Internal server error", "model": ErrorResponse}
+    },
+    tags=["Users"]
+)
+def count_users(user_service: UserService = Depends(get_read_user_service)):
+    """
+    Total number of users from a counter maintained on insert and delete (no table scan).
+    """
+    return {"total": user_service.count_users()}
+
+@app.get(
+    "/users/stats",
+    response_model=UserStatsResponse,
+    responses={
+        200: {"description": "User count and age statistics"},
+        422: {"description": "Validation error - invalid input data", "model": ValidationErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse}
+    },
+    tags=["Users"]
+)
+def read_user_stats(
+    bucket: int = Query(10, ge=1, le=120, description="Width of a histogram bucket in years"),
+    user_service: UserService = Depends(get_read_user_service)
+):
+    """
+    Number of users and their age statistics: minimum, maximum, mean and a histogram.
+    - **bucket**: width of a histogram bucket in years (default 10)
+
+    Served from per-age counts maintained on insert, update and delete, so the cost
+    does not depend on the number of users. Empty buckets between the first and the last are included.
+    """
+    return user_service.get_user_stats(bucket)
+
+@app.get(
+    "/users/changes",
+    response_model=UserChangesResponse,
+    responses={
+        200: {"description": "Changes after `since` in order, with the cursor for the next request"},
+        422: {"description": "Validation error - invalid input data", "model": ValidationErrorResponse},
+        500: {"description": "Internal server error", "model": ErrorResponse},
+        501: {"description": "Not implemented - the change feed is unavailable with DB_SHARDS", "model": ErrorResponse}
+    },
+    tags=["Users"]
+)
+def read_user_changes(
+    since: int = Query(0, ge=0, description="Sequence number of the last change the client has applied"),
+    limit: int = Query(100, ge=1, le=1000),
+    user_service: UserService = Depends(get_read_user_service)
+):
+    """
+    Incremental sync: users created, updated or deleted after sequence number `since`.
+    - **since**: `next_since` of the previous response (0 for the first sync)
+    - **limit**: maximum number of changes (default 100, max 1000)
+
+    Every change is either `upsert` with the current user or `delete` with the ID only.
+    A user changed several times appears once, with the number of the latest change.
+    Repeat with `since=next_since` while `has_more` is true; no change is ever skipped.
+    """
+    return user_service.get_changes(since, limit)
 
 @app.get(
     "/users/{user_id}", 
     response_model=UserResponse,
     responses={
-        200: {"description": "User retrieved successfully"},
+        200: {
+            "description": "User retrieved successfully",
+            "headers": {
+                "ETag": {
+                    "description": "Strong validator of the user, send it back in If-None-Match",
+                    "schema": {"type": "string"}
+                }
+            }
+        },
+        304: {"description": "Not modified - the user matches If-None-Match"},
         404: {"description": "User not found", "model": ErrorResponse},
         500: {"description": "Internal server error", "model": ErrorResponse}
     },
@@ -139,12 +516,22 @@ def read_users(
 )
 def read_user(
     user_id: int, 
-    user_service: UserService = Depends(get_user_service)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    user_service: UserService = Depends(get_read_user_service)
 ):
     """
-    Retrieve a specific user by ID
+    Retrieve a specific user by ID.
+
+    Send the `ETag` of a previous response in `If-None-Match` to get 304 when the user is unchanged.
     """
-    return user_service.get_user(user_id)
+    if if_none_match:
+        etag = user_service.get_user_etag(user_id)
+        if etag is not None and etag_matches(if_none_match, etag):
+            return not_modified(etag)
+    user = user_service.get_user(user_id)
+    response.headers["ETag"] = user_etag(user.id, user.version)
+    return user
 
 @app.put(
     "/users/{user_id}", 
@@ -185,4 +572,11 @@ def delete_user(
     Delete a user by ID
     """
     user_service.delete_user(user_id)
-    return {"message": "Пользователь успешно удален"}
\ No newline at end of file
+    return {"message": "Пользователь успешно удален"}
+
+# В режиме DB_MODE=async CRUD-эндпоинты работают через AsyncSession
+if config.DB_MODE == "async":
+    from app.async_endpoints import use_async_endpoints
+    from app.database import dispose_async_engine
+    use_async_endpoints(app)
+    app.add_event_handler("shutdown", dispose_async_engine)
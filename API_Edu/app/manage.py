@@ -0,0 +1,79 @@
+"""
+Служебные команды для базы приложения. Запуск из каталога API_Edu:
+    python -m app.manage status    — текущая и последняя версии схемы
+    python -m app.manage migrate   — применить недостающие миграции
+    python -m app.manage recount   — сверить счётчик пользователей с COUNT(*) и исправить его
+    python -m app.manage restats   — пересчитать статистику по возрастам (GET /users/stats) и исправить её
+"""
+import argparse
+
+from app.database import engine, SessionLocal
+from app.migrations import LATEST_VERSION, current_version, migrate
+from app.repositories import UserRepository
+from app.sharding import sharded_store, ShardedUserRepository
+
+
+def status():
+    with engine.connect() as conn:
+        version = current_version(conn)
+    print(f"schema version {version}, latest {LATEST_VERSION}")
+
+
+def apply_migrations():
+    applied = migrate(engine)
+    print(f"applied migrations: {', '.join(map(str, applied))}" if applied else "schema is up to date")
+    if sharded_store is not None:
+        sharded_store.migrate()
+        print(f"shards migrated: {len(sharded_store.shards)}")
+
+
+def recount():
+    if sharded_store is not None:
+        stored, actual = ShardedUserRepository(sharded_store).rebuild_user_count()
+    else:
+        db = SessionLocal()
+        try:
+            stored, actual = UserRepository(db).rebuild_user_count()
+        finally:
+            db.close()
+    if stored == actual:
+        print(f"users counter is consistent: {actual}")
+    else:
+        print(f"users counter was {stored}, rebuilt to {actual}")
+
+
+def restats():
+    if sharded_store is not None:
+        stored, actual = ShardedUserRepository(sharded_store).rebuild_age_counts()
+    else:
+        db = SessionLocal()
+        try:
+            stored, actual = UserRepository(db).rebuild_age_counts()
+        finally:
+            db.close()
+    mismatched = sorted(age for age in stored.keys() | actual.keys() if stored.get(age, 0) != actual.get(age, 0))
+    if not mismatched:
+        print(f"age statistics are consistent: {sum(actual.values())} users, {len(actual)} distinct ages")
+        return
+    print(f"age statistics rebuilt, {len(mismatched)} ages differed:")
+    for age in mismatched:
+        print(f"  age {age}: {stored.get(age, 0)} -> {actual.get(age, 0)}")
+
+
+COMMANDS = {
+    "status": status,
+    "migrate": apply_migrations,
+    "recount": recount,
+    "restats": restats,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    parser.add_argument("command", choices=list(COMMANDS))
+    args = parser.parse_args()
+    COMMANDS[args.command]()
+
+
+if __name__ == "__main__":
+    main()
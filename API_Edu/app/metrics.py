@@ -0,0 +1,245 @@
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from starlette.routing import Match
+
+from app import config
+from app.query_log import log_slow_query, check_statement_budget, report_statement_budget
+
+# Отдельный реестр: в /metrics попадают только метрики приложения
+registry = CollectorRegistry()
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки запроса, включая сериализацию ответа",
+    ["method", "route"],
+    registry=registry,
+)
+REQUESTS = Counter(
+    "http_requests_total",
+    "Число обработанных запросов",
+    ["method", "route", "status"],
+    registry=registry,
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Число запросов, обрабатываемых в данный момент",
+    ["method", "route"],
+    registry=registry,
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements",
+    "Число SQL-запросов на один HTTP-запрос",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 5, 10, 20, 50, 100),
+    registry=registry,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_duration_seconds",
+    "Суммарное время SQL-запросов на один HTTP-запрос",
+    ["method", "route"],
+    registry=registry,
+)
+DB_STATEMENTS = Counter(
+    "db_statements_total",
+    "Число SQL-запросов по движкам",
+    ["engine"],
+    registry=registry,
+)
+
+# Маршрут для запросов, которые не совпали ни с одним шаблоном (404),
+# чтобы произвольные пути не раздували число рядов метрик
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+@dataclass
+class QueryStats:
+    """SQL-запросы одного HTTP-запроса"""
+    statements: int = 0
+    duration: float = 0.0
+    # (текст, параметры, время) каждого запроса при SQL_RECORD_STATEMENTS=true
+    queries: list = field(default_factory=list)
+
+
+# Статистика текущего запроса. Потоки пула Starlette и greenlet-ы async-движка
+# получают копию контекста, поэтому хуки движка видят объект своего запроса
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+
+def track_statements(engine, name: str):
+    """
+    Считает запросы движка и их время в статистике текущего HTTP-запроса,
+    логирует медленные запросы и следит за бюджетом запросов (app.query_log).
+    Хуки ставятся всегда; счётчик Prometheus обновляется только при METRICS_ENABLED
+    """
+    statements = DB_STATEMENTS.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        stats = current_query_stats.get()
+        if stats is not None:
+            check_statement_budget(stats)
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        if config.METRICS_ENABLED:
+            statements.inc()
+        log_slow_query(conn, statement, parameters, elapsed)
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.duration += elapsed
+            if config.SQL_RECORD_STATEMENTS:
+                stats.queries.append((statement, parameters, elapsed))
+
+
+def route_template(scope) -> str:
+    """Шаблон пути маршрута (/users/{user_id}) вместо фактического пути запроса"""
+    partial = None
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path
+    return partial or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: задержка, число запросов в работе и SQL-статистика по шаблону маршрута.
+    Время запроса считается до отправки последнего фрагмента тела, то есть вместе с сериализацией;
+    разница с временем SQL показывает, упирается ли маршрут в базу или в кодирование ответа
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        in_flight = IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.labels(method, route).observe(time.perf_counter() - started)
+            in_flight.dec()
+            current_query_stats.reset(token)
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            REQUEST_DB_STATEMENTS.labels(method, route).observe(stats.statements)
+            REQUEST_DB_TIME.labels(method, route).observe(stats.duration)
+            report_statement_budget(method, route, stats)
+
+
+class QueryStatsMiddleware:
+    """
+    Статистика SQL-запросов HTTP-запроса без метрик Prometheus (METRICS_ENABLED=false):
+    нужна бюджету запросов SQL_STATEMENT_BUDGET и записи запросов SQL_RECORD_STATEMENTS
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = current_query_stats.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_stats.reset(token)
+            if config.SQL_STATEMENT_BUDGET > 0:
+                report_statement_budget(scope["method"], route_template(scope), stats)
+
+
+class CacheCollector:
+    """Счётчики кэша пользователей в формате Prometheus (значения берутся из cache.stats() при сборе)"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def collect(self):
+        stats = self.cache.stats()
+        backend = stats["backend"]
+        for name in ("hits", "misses", "evictions"):
+            counter = CounterMetricFamily(f"user_cache_{name}", f"User cache {name}", labels=["backend"])
+            counter.add_metric([backend], stats[name])
+            yield counter
+        size = GaugeMetricFamily("user_cache_size", "User cache entries", labels=["backend"])
+        size.add_metric([backend], stats["size"])
+        yield size
+
+
+class SingleFlightCollector:
+    """Сколько запросов пользователя объединено в уже выполняющиеся (app.singleflight)"""
+
+    def __init__(self, *flights):
+        self.flights = [flight for flight in flights if flight is not None]
+
+    def collect(self):
+        calls = CounterMetricFamily("user_lookups", "GET /users/{id} lookups through single-flight")
+        shared = CounterMetricFamily("user_lookups_shared", "Lookups that reused an in-flight query")
+        calls.add_metric([], sum(flight.calls for flight in self.flights))
+        shared.add_metric([], sum(flight.shared for flight in self.flights))
+        yield calls
+        yield shared
+
+
+class EmailFilterCollector:
+    """Фильтр Блума по email (app.email_filter): сколько SELECT сэкономлено и доля ложных срабатываний"""
+
+    def __init__(self, email_filter):
+        self.email_filter = email_filter
+
+    def collect(self):
+        stats = self.email_filter.stats()
+        checks = CounterMetricFamily("email_filter_checks", "Email uniqueness checks by filter answer", labels=["result"])
+        checks.add_metric(["absent"], stats["absent"])
+        checks.add_metric(["maybe"], stats["maybe"])
+        yield checks
+        false_positives = CounterMetricFamily("email_filter_false_positives", "Filter said maybe, SELECT found nothing")
+        false_positives.add_metric([], stats["false_positives"])
+        yield false_positives
+        for name, description in (
+            ("false_positive_rate", "Observed share of new emails that still needed a SELECT"),
+            ("estimated_false_positive_rate", "Expected false-positive rate at the current fill"),
+            ("items", "Emails in the filter"),
+            ("memory_bytes", "Filter counters size"),
+        ):
+            gauge = GaugeMetricFamily(f"email_filter_{name}", description)
+            gauge.add_metric([], stats[name])
+            yield gauge
+        if stats["rebuild_seconds"] is not None:
+            rebuild = GaugeMetricFamily("email_filter_rebuild_seconds", "Duration of the last filter rebuild")
+            rebuild.add_metric([], stats["rebuild_seconds"])
+            yield rebuild
+
+
+def render_metrics() -> tuple:
+    """Тело и Content-Type ответа /metrics"""
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,201 @@
+"""
+Версионированные миграции схемы.
+
+Применённые версии хранятся в таблице schema_migrations. При старте проверяется только
+максимальная версия (один запрос), поэтому перезапуск на заполненной базе занимает миллисекунды.
+Каждая миграция идемпотентна: базы, созданные до появления миграций через create_all,
+доводятся до текущей схемы без потери данных.
+"""
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import inspect, text
+
+from app.models import (
+    UserDB, CounterDB, UserChangeDB, AgeCountDB,
+    USERS_FTS_DDL, USERS_COUNT_DDL, USERS_COUNTER, USER_CHANGES_DDL, CHANGE_UPSERT, AGE_COUNTS_DDL,
+)
+
+# Триггеры на users, которые поддерживают производные таблицы (кроме полнотекстового индекса:
+# его триггеры создаются вместе с таблицей users)
+USERS_TRIGGERS_DDL = USERS_COUNT_DDL + USER_CHANGES_DDL + AGE_COUNTS_DDL
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_MIGRATIONS_DDL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR NOT NULL,
+    applied_at VARCHAR NOT NULL
+)
+"""
+
+
+def sqlite_object_exists(conn, name: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": name}
+    ).first() is not None
+
+
+def create_users_table(conn):
+    # checkfirst: в базах до миграций таблица уже есть, и с ней ничего не происходит
+    UserDB.__table__.create(conn, checkfirst=True)
+
+
+def add_users_version(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "version" not in columns:
+        conn.execute(text("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_id_version ON users (id, version)"))
+
+
+def create_users_fts(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    existed = sqlite_object_exists(conn, "users_fts")
+    for statement in USERS_FTS_DDL:
+        conn.execute(text(statement))
+    if not existed:
+        # Индекс для уже существующих строк; дальше его поддерживают триггеры
+        conn.execute(text("INSERT INTO users_fts(users_fts) VALUES ('rebuild')"))
+
+
+def create_users_counter(conn):
+    CounterDB.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == "sqlite":
+        for statement in USERS_COUNT_DDL:
+            conn.execute(text(statement))
+    # Начальное значение считается один раз, в той же транзакции, что и создание триггеров
+    conn.execute(text("DELETE FROM counters WHERE name = :name"), {"name": USERS_COUNTER})
+    conn.execute(
+        text("INSERT INTO counters (name, value) SELECT :name, COUNT(*) FROM users"), {"name": USERS_COUNTER}
+    )
+
+
+def create_user_changes(conn):
+    UserChangeDB.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == "sqlite":
+        for statement in USER_CHANGES_DDL:
+            conn.execute(text(statement))
+    # Уже существующие пользователи попадают в ленту, чтобы клиент с since=0 получил всё состояние
+    conn.execute(
+        text("INSERT OR IGNORE INTO user_changes (user_id, op) SELECT id, :op FROM users ORDER BY id"),
+        {"op": CHANGE_UPSERT},
+    )
+
+
+def create_age_counts(conn):
+    AgeCountDB.__table__.create(conn, checkfirst=True)
+    if conn.dialect.name == "sqlite":
+        for statement in AGE_COUNTS_DDL:
+            conn.execute(text(statement))
+    conn.execute(text("DELETE FROM age_counts"))
+    conn.execute(text(
+        "INSERT INTO age_counts (age, users) SELECT age, COUNT(*) FROM users WHERE age IS NOT NULL GROUP BY age"
+    ))
+
+
+def rebuild_users_autoincrement(conn):
+    """
+    Базы, созданные до AUTOINCREMENT в модели (create_all или миграция 1 на старой таблице),
+    выдают id удалённого последнего пользователя заново, и новый пользователь получал бы
+    тот же ETag "id-version". Таблица пересоздаётся с AUTOINCREMENT с сохранением id и данных
+    """
+    if conn.dialect.name != "sqlite":
+        return
+    sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'users'")).scalar()
+    if sql is None or "AUTOINCREMENT" in sql.upper():
+        return
+    triggers = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'users'")
+    ).scalars().all()
+    for trigger in triggers:
+        conn.execute(text(f'DROP TRIGGER "{trigger}"'))
+    indexes = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'users' AND sql IS NOT NULL")
+    ).scalars().all()
+    conn.execute(text("ALTER TABLE users RENAME TO users_old"))
+    for index in indexes:
+        conn.execute(text(f'DROP INDEX "{index}"'))
+    # Создаёт таблицу, индексы, users_fts (если её не было) и триггеры полнотекстового индекса
+    UserDB.__table__.create(conn)
+    conn.execute(text(
+        "INSERT INTO users (id, name, email, age, version) SELECT id, name, email, age, version FROM users_old"
+    ))
+    conn.execute(text("DROP TABLE users_old"))
+    # Счётчик id продолжается и после уже удалённых пользователей, известных по ленте изменений
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'users'"))
+    conn.execute(text("""
+        INSERT INTO sqlite_sequence (name, seq) SELECT 'users', MAX(
+            COALESCE((SELECT MAX(id) FROM users), 0), COALESCE((SELECT MAX(user_id) FROM user_changes), 0)
+        )
+    """))
+    # При копировании триггеры индекса добавили строки повторно: индекс строится заново
+    conn.execute(text("INSERT INTO users_fts(users_fts) VALUES ('rebuild')"))
+    for statement in USERS_TRIGGERS_DDL:
+        conn.execute(text(statement))
+
+
+# (версия, имя, функция). Новые миграции добавляются только в конец списка
+MIGRATIONS = [
+    (1, "create users table", create_users_table),
+    (2, "users.version column and ix_users_id_version", add_users_version),
+    (3, "users_fts full-text index", create_users_fts),
+    (4, "users counter maintained by triggers", create_users_counter),
+    (5, "user_changes feed maintained by triggers", create_user_changes),
+    (6, "age_counts aggregates maintained by triggers", create_age_counts),
+    (7, "rebuild users with AUTOINCREMENT so ids are never reused", rebuild_users_autoincrement),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Движки, схема которых уже проверена в этом процессе
+_verified_engines = set()
+
+
+def current_version(conn) -> int:
+    if not inspect(conn).has_table("schema_migrations"):
+        return 0
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")).scalar()
+
+
+def migrate(engine) -> list:
+    """Применяет недостающие миграции и возвращает их версии"""
+    with engine.connect() as conn:
+        conn.begin()
+        if conn.dialect.name == "sqlite" and not conn.connection.dbapi_connection.in_transaction:
+            # Блокировка записи до чтения версии: параллельно стартующие процессы
+            # не применят одну миграцию дважды. DDL в SQLite транзакционен.
+            # Движок писателя (app.write_lock) уже открыл транзакцию как BEGIN IMMEDIATE
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        conn.execute(text(SCHEMA_MIGRATIONS_DDL))
+        version = current_version(conn)
+        applied = []
+        for number, name, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            started = time.perf_counter()
+            apply(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :at)"),
+                {"version": number, "name": name, "at": datetime.now(timezone.utc).isoformat()},
+            )
+            logger.info(f"Applied migration {number} ({name}) in {time.perf_counter() - started:.3f}s")
+            applied.append(number)
+        conn.commit()
+    return applied
+
+
+def ensure_schema(engine) -> list:
+    """
+    Проверяет версию схемы и применяет недостающие миграции. Результат кэшируется на процесс:
+    повторные вызовы для того же движка ничего не делают
+    """
+    if engine in _verified_engines:
+        return []
+    with engine.connect() as conn:
+        up_to_date = current_version(conn) >= LATEST_VERSION
+    applied = [] if up_to_date else migrate(engine)
+    _verified_engines.add(engine)
+    return applied
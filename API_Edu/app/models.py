@@ -1,12 +1,156 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import DDL, Column, Index, Integer, String, event
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
 
 class UserDB(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # Покрывающий индекс: ETag списка считается без чтения самих строк
+        Index("ix_users_id_version", "id", "version"),
+        # AUTOINCREMENT: id удалённых пользователей не переиспользуются, иначе новая запись
+        # могла бы получить тот же ETag, что и удалённая
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     email = Column(String, unique=True, index=True)
-    age = Column(Integer)
\ No newline at end of file
+    age = Column(Integer)
+    # Версия строки: SQLAlchemy увеличивает её при каждом UPDATE
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class CounterDB(Base):
+    """Счётчики, которые поддерживаются триггерами вместо COUNT(*) по всей таблице"""
+    __tablename__ = "counters"
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+USERS_COUNTER = "users"
+
+
+class AgeCountDB(Base):
+    """Число пользователей каждого возраста для GET /users/stats; поддерживается триггерами"""
+    __tablename__ = "age_counts"
+
+    age = Column(Integer, primary_key=True, autoincrement=False)
+    users = Column(Integer, nullable=False, default=0)
+
+
+# Возраст ограничен схемой (1..120), поэтому строк не больше 120, и статистика читается
+# за постоянное время независимо от числа пользователей
+AGE_COUNTS_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS age_counts_insert AFTER INSERT ON users WHEN new.age IS NOT NULL BEGIN
+        INSERT OR IGNORE INTO age_counts (age, users) VALUES (new.age, 0);
+        UPDATE age_counts SET users = users + 1 WHERE age = new.age;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS age_counts_delete AFTER DELETE ON users WHEN old.age IS NOT NULL BEGIN
+        UPDATE age_counts SET users = users - 1 WHERE age = old.age;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS age_counts_update AFTER UPDATE OF age ON users
+    WHEN old.age IS NOT new.age BEGIN
+        UPDATE age_counts SET users = users - 1 WHERE age = old.age;
+        INSERT OR IGNORE INTO age_counts (age, users) SELECT new.age, 0 WHERE new.age IS NOT NULL;
+        UPDATE age_counts SET users = users + 1 WHERE age = new.age;
+    END
+    """,
+]
+
+
+class UserChangeDB(Base):
+    """
+    Лента изменений для GET /users/changes: по одной строке на пользователя с номером его
+    последнего изменения. Номер seq выдаёт AUTOINCREMENT, он только растёт и не переиспользуется
+    """
+    __tablename__ = "user_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, unique=True)
+    op = Column(String, nullable=False)
+
+
+CHANGE_UPSERT = "upsert"
+CHANGE_DELETE = "delete"
+
+# Запись в ленту идёт в той же транзакции, что и изменение пользователя (в том числе из
+# POST /users/bulk). INSERT OR REPLACE удаляет прежнюю строку пользователя и выдаёт новый seq,
+# поэтому лента не растёт с числом изменений, а клиент получает только последнее состояние.
+# Писатель в SQLite один, и номера выдаются в порядке commit: клиент, дочитавший до seq,
+# уже не увидит позже изменение с меньшим номером
+USER_CHANGES_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS user_changes_insert AFTER INSERT ON users BEGIN
+        INSERT OR REPLACE INTO user_changes (user_id, op) VALUES (new.id, '{CHANGE_UPSERT}');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS user_changes_update AFTER UPDATE ON users BEGIN
+        INSERT OR REPLACE INTO user_changes (user_id, op) VALUES (new.id, '{CHANGE_UPSERT}');
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS user_changes_delete AFTER DELETE ON users BEGIN
+        INSERT OR REPLACE INTO user_changes (user_id, op) VALUES (old.id, '{CHANGE_DELETE}');
+    END
+    """,
+]
+
+# Число пользователей меняется в той же транзакции, что и вставка/удаление строки,
+# поэтому счётчик верен и для POST /users/bulk, и при откате транзакции
+USERS_COUNT_DDL = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_count_insert AFTER INSERT ON users BEGIN
+        UPDATE counters SET value = value + 1 WHERE name = '{USERS_COUNTER}';
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS users_count_delete AFTER DELETE ON users BEGIN
+        UPDATE counters SET value = value - 1 WHERE name = '{USERS_COUNTER}';
+    END
+    """,
+]
+
+
+# Полнотекстовый индекс для GET /users/search (только SQLite, модуль FTS5).
+# Таблица внешнего содержимого: тексты хранятся только в users, а триггеры
+# поддерживают индекс в той же транзакции, что и изменение пользователя
+USERS_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+        name, email, content='users', content_rowid='id', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+        INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, email ON users BEGIN
+        INSERT INTO users_fts(users_fts, rowid, name, email) VALUES ('delete', old.id, old.name, old.email);
+        INSERT INTO users_fts(rowid, name, email) VALUES (new.id, new.name, new.email);
+    END
+    """,
+]
+
+for statement in USERS_FTS_DDL:
+    event.listen(UserDB.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(
+    UserDB.__table__, "before_drop", DDL("DROP TABLE IF EXISTS users_fts").execute_if(dialect="sqlite")
+)
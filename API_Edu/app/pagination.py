@@ -0,0 +1,38 @@
+import base64
+
+from fastapi.exceptions import RequestValidationError
+
+from app import config
+from app.exceptions import InvalidCursorException
+
+# Курсор непрозрачен для клиента: внутри лежит id последней записи страницы
+CURSOR_PREFIX = "id:"
+
+
+def encode_cursor(last_id: int) -> str:
+    raw = f"{CURSOR_PREFIX}{last_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        if not raw.startswith(CURSOR_PREFIX):
+            raise ValueError(raw)
+        return int(raw[len(CURSOR_PREFIX):])
+    except ValueError:
+        raise InvalidCursorException(cursor)
+
+
+def parse_user_ids(ids: str) -> list[int]:
+    """Список id из параметра ids=3,1,2 (формат уже проверен шаблоном Query)"""
+    user_ids = [int(user_id) for user_id in ids.split(",")]
+    if len(user_ids) > config.BATCH_GET_MAX_IDS:
+        raise RequestValidationError([{
+            "type": "too_long",
+            "loc": ("query", "ids"),
+            "msg": f"Не больше {config.BATCH_GET_MAX_IDS} id в одном запросе",
+            "input": ids
+        }])
+    return user_ids
@@ -0,0 +1,68 @@
+from app import config
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Запросы, для которых SQLite умеет строить план (DDL и PRAGMA пропускаются)
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class StatementBudgetExceeded(Exception):
+    """Запрос выполнил больше SQL-запросов, чем разрешает SQL_STATEMENT_BUDGET (режим raise)"""
+
+    def __init__(self, budget: int, queries: list):
+        self.budget = budget
+        self.queries = queries
+        super().__init__(f"Превышен бюджет SQL-запросов на HTTP-запрос: {budget}\n{format_queries(queries)}")
+
+
+def format_queries(queries: list) -> str:
+    return "\n".join(
+        f"  {number}. {duration * 1000:.2f} ms  {statement}  {parameters!r}"
+        for number, (statement, parameters, duration) in enumerate(queries, start=1)
+    )
+
+
+def query_plan(conn, statement: str, parameters) -> str:
+    """EXPLAIN QUERY PLAN на отдельном курсоре, чтобы не сбить результат исходного запроса"""
+    if conn.dialect.name != "sqlite":
+        return "недоступен для диалекта " + conn.dialect.name
+    if not statement.lstrip().upper().startswith(EXPLAINABLE):
+        return "-"
+    if isinstance(parameters, list):
+        # executemany: план одинаков для всех наборов параметров
+        parameters = parameters[0] if parameters else ()
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return "; ".join(str(row[-1]) for row in cursor.fetchall())
+    except Exception as e:
+        return f"недоступен: {e}"
+    finally:
+        cursor.close()
+
+
+def log_slow_query(conn, statement: str, parameters, duration: float):
+    if config.SQL_SLOW_QUERY_MS <= 0 or duration * 1000 < config.SQL_SLOW_QUERY_MS:
+        return
+    logger.warning(
+        f"Slow query {duration * 1000:.2f} ms: {statement} params={parameters!r} "
+        f"plan={query_plan(conn, statement, parameters)}"
+    )
+
+
+def check_statement_budget(stats):
+    """Вызывается перед каждым запросом: в режиме raise лишний запрос не выполняется"""
+    budget = config.SQL_STATEMENT_BUDGET
+    if budget > 0 and config.SQL_BUDGET_MODE == "raise" and stats.statements >= budget:
+        raise StatementBudgetExceeded(budget, stats.queries)
+
+
+def report_statement_budget(method: str, route: str, stats):
+    """Вызывается по завершении HTTP-запроса: в режиме warn превышение только логируется"""
+    budget = config.SQL_STATEMENT_BUDGET
+    if budget > 0 and stats.statements > budget:
+        logger.warning(
+            f"{method} {route} executed {stats.statements} SQL statements (budget {budget})"
+            + (f":\n{format_queries(stats.queries)}" if stats.queries else "")
+        )
@@ -1,14 +1,62 @@
+from sqlalchemy import func, insert, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models import UserDB
+from app.cache import CacheBackend
+from app.email_filter import EmailFilter
+from app.models import UserDB, CounterDB, UserChangeDB, AgeCountDB, USERS_COUNTER
 from app.exceptions import UserNotFoundException, EmailAlreadyExistsException, DatabaseException
-from app.schemas import UserCreate
+from app.query_log import StatementBudgetExceeded
+from app.schemas import UserCreate, UserResponse, UserRecord, UserBulkItemResult
+from app.responses import USER_FIELDS
+from typing import Optional
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# Столбцы для быстрых списков: поля UserResponse и версия строки для ETag
+USER_ROW_COLUMNS = [getattr(UserDB, field) for field in USER_FIELDS] + [UserDB.version]
+
+# Число пользователей по возрастам для статистики (строки с нулём остаются после удалений)
+AGE_COUNTS_QUERY = select(AgeCountDB.age, AgeCountDB.users).where(AgeCountDB.users > 0).order_by(AgeCountDB.age)
+ACTUAL_AGE_COUNTS_QUERY = (
+    select(UserDB.age, func.count()).where(UserDB.age.is_not(None)).group_by(UserDB.age).order_by(UserDB.age)
+)
+
+# Лента изменений: номер, операция и текущие данные пользователя (NULL для удалённых)
+CHANGES_QUERY = (
+    select(UserChangeDB.seq, UserChangeDB.op, UserChangeDB.user_id, UserDB.name, UserDB.email, UserDB.age)
+    .outerjoin(UserDB, UserDB.id == UserChangeDB.user_id)
+    .order_by(UserChangeDB.seq)
+)
+
+SEARCH_USERS_SQL = text("""
+    SELECT users.* FROM users_fts
+    JOIN users ON users.id = users_fts.rowid
+    WHERE users_fts MATCH :match
+    ORDER BY users_fts.rank
+    LIMIT :limit
+""")
+
+
+def fts_prefix_query(query: str) -> str:
+    """Превращает пользовательскую строку в запрос FTS5: каждое слово ищется как префикс"""
+    return " ".join(f'"{token}"*' for token in re.findall(r"\w+", query.lower()))
+
 class UserRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, email_filter: Optional[EmailFilter] = None):
         self.db = db
+        self.email_filter = email_filter
+    
+    def _email_exists(self, email: str) -> bool:
+        # Ответ фильтра "точно нет" заменяет SELECT; "возможно" проверяется запросом
+        if self.email_filter is not None and not self.email_filter.might_exist(email):
+            return False
+        exists = self.db.scalar(select(UserDB.id).where(UserDB.email == email).limit(1)) is not None
+        if not exists and self.email_filter is not None:
+            self.email_filter.record_false_positive()
+        return exists
     
     def get_user(self, user_id: int) -> UserDB:
         try:
@@ -18,69 +66,698 @@ class UserRepository:
             return user
         except UserNotFoundException:
             raise
+        except StatementBudgetExceeded:
+            raise
         except Exception as e:
             logger.error(f"Database error in get_user: {e}")
             raise DatabaseException("Ошибка при получении пользователя")
     
     def get_all_users(self, skip: int = 0, limit: int = 100) -> list[UserDB]:
         try:
-            return self.db.query(UserDB).offset(skip).limit(limit).all()
+            return self.db.query(UserDB).order_by(UserDB.id).offset(skip).limit(limit).all()
+        except StatementBudgetExceeded:
+            raise
         except Exception as e:
             logger.error(f"Database error in get_all_users: {e}")
             raise DatabaseException("Ошибка при получении списка пользователей")
     
+    def get_users_after(self, after_id: int, limit: int = 100) -> list[UserDB]:
+        # Keyset-пагинация: поиск по индексу первичного ключа вместо OFFSET
+        try:
+            return (
+                self.db.query(UserDB)
+                .filter(UserDB.id > after_id)
+                .order_by(UserDB.id)
+                .limit(limit)
+                .all()
+            )
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_users_after: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    # Списки без загрузки ORM-объектов: строки-кортежи (id, name, email, age, version)
+    def get_user_rows(self, skip: int = 0, limit: int = 100) -> list[tuple]:
+        try:
+            return self.db.execute(
+                select(*USER_ROW_COLUMNS).order_by(UserDB.id).offset(skip).limit(limit)
+            ).all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_rows: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    def get_user_rows_after(self, after_id: int, limit: int = 100) -> list[tuple]:
+        try:
+            return self.db.execute(
+                select(*USER_ROW_COLUMNS).where(UserDB.id > after_id).order_by(UserDB.id).limit(limit)
+            ).all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_rows_after: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    def search_users(self, query: str, limit: int = 20) -> list[UserDB]:
+        match = fts_prefix_query(query)
+        if not match:
+            return []
+        try:
+            if self.db.get_bind().dialect.name == "sqlite":
+                # Ранжирование bm25 встроено в FTS5 (столбец rank)
+                return (
+                    self.db.query(UserDB)
+                    .from_statement(SEARCH_USERS_SQL)
+                    .params(match=match, limit=limit)
+                    .all()
+                )
+            return (
+                self.db.query(UserDB)
+                .filter(or_(UserDB.name.ilike(f"%{query}%"), UserDB.email.ilike(f"{query}%")))
+                .order_by(UserDB.id)
+                .limit(limit)
+                .all()
+            )
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in search_users: {e}")
+            raise DatabaseException("Ошибка при поиске пользователей")
+    
+    def get_users_by_ids(self, user_ids: list[int]) -> list[UserDB]:
+        """Найденные пользователи одним запросом IN, в порядке id; отсутствующие просто не возвращаются"""
+        try:
+            return self.db.query(UserDB).filter(UserDB.id.in_(user_ids)).order_by(UserDB.id).all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_users_by_ids: {e}")
+            raise DatabaseException("Ошибка при получении пользователей")
+    
+    def count_users(self) -> int:
+        """Число пользователей из счётчика, который поддерживают триггеры (без COUNT(*))"""
+        try:
+            return self.db.scalar(select(CounterDB.value).where(CounterDB.name == USERS_COUNTER)) or 0
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in count_users: {e}")
+            raise DatabaseException("Ошибка при подсчёте пользователей")
+    
+    def get_changes(self, since: int, limit: int = 100) -> list[tuple]:
+        """Изменения с номером больше since по возрастанию номера"""
+        try:
+            return self.db.execute(CHANGES_QUERY.where(UserChangeDB.seq > since).limit(limit)).all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_changes: {e}")
+            raise DatabaseException("Ошибка при получении ленты изменений")
+    
+    def get_age_counts(self) -> list[tuple[int, int]]:
+        """(возраст, число пользователей) из таблицы, которую поддерживают триггеры: не больше 120 строк"""
+        try:
+            return self.db.execute(AGE_COUNTS_QUERY).all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_age_counts: {e}")
+            raise DatabaseException("Ошибка при получении статистики пользователей")
+    
+    def rebuild_age_counts(self) -> tuple[dict, dict]:
+        """
+        Пересчитывает число пользователей по возрастам через GROUP BY и записывает его.
+        Возвращает (сохранённые значения до проверки, фактические) как словари возраст -> число
+        """
+        try:
+            stored = dict(self.db.execute(AGE_COUNTS_QUERY).all())
+            actual = dict(self.db.execute(ACTUAL_AGE_COUNTS_QUERY).all())
+            self.db.query(AgeCountDB).delete()
+            self.db.add_all(AgeCountDB(age=age, users=users) for age, users in actual.items())
+            self.db.commit()
+            return stored, actual
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Database error in rebuild_age_counts: {e}")
+            raise DatabaseException("Ошибка при пересчёте статистики пользователей")
+    
+    def rebuild_user_count(self) -> tuple[int, int]:
+        """
+        Сверяет счётчик с COUNT(*) и записывает точное значение.
+        Возвращает (значение счётчика до проверки, фактическое число пользователей)
+        """
+        try:
+            stored = self.db.scalar(select(CounterDB.value).where(CounterDB.name == USERS_COUNTER))
+            actual = self.db.scalar(select(func.count()).select_from(UserDB))
+            counter = self.db.get(CounterDB, USERS_COUNTER)
+            if counter is None:
+                self.db.add(CounterDB(name=USERS_COUNTER, value=actual))
+            else:
+                counter.value = actual
+            self.db.commit()
+            return stored, actual
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Database error in rebuild_user_count: {e}")
+            raise DatabaseException("Ошибка при пересчёте пользователей")
+    
+    def iter_emails(self, batch_size: int = 10000):
+        """Все email потоком из курсора (для построения фильтра email)"""
+        try:
+            yield from self.db.scalars(select(UserDB.email).execution_options(yield_per=batch_size))
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in iter_emails: {e}")
+            raise DatabaseException("Ошибка при чтении email пользователей")
+    
+    def iter_user_rows(self, batch_size: int = 1000):
+        """Все пользователи кортежами (id, name, email, age) потоком из курсора, пачками по batch_size"""
+        try:
+            result = self.db.execute(
+                select(UserDB.id, UserDB.name, UserDB.email, UserDB.age)
+                .order_by(UserDB.id)
+                .execution_options(yield_per=batch_size)
+            )
+            yield from result.partitions()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in iter_user_rows: {e}")
+            raise DatabaseException("Ошибка при выгрузке пользователей")
+    
+    # Версии строк для ETag: читаются только (id, version) из индекса, без загрузки ORM-объектов
+    def get_user_version(self, user_id: int) -> Optional[int]:
+        try:
+            return self.db.scalar(select(UserDB.version).where(UserDB.id == user_id))
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_version: {e}")
+            raise DatabaseException("Ошибка при получении пользователя")
+    
+    def get_user_versions(self, skip: int = 0, limit: int = 100) -> list[tuple]:
+        try:
+            return self.db.execute(
+                select(UserDB.id, UserDB.version).order_by(UserDB.id).offset(skip).limit(limit)
+            ).all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_versions: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    def get_user_versions_after(self, after_id: int, limit: int = 100) -> list[tuple]:
+        try:
+            return self.db.execute(
+                select(UserDB.id, UserDB.version)
+                .where(UserDB.id > after_id)
+                .order_by(UserDB.id)
+                .limit(limit)
+            ).all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_versions_after: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    # stage_*: изменение до flush без commit. Через них работают create_user/update_user
+    # и групповой коммит (app.group_commit), где каждая операция выполняется в своём SAVEPOINT
+    def stage_create_user(self, user: UserCreate) -> UserDB:
+        # Проверяем, существует ли пользователь с таким email
+        if self._email_exists(user.email):
+            raise EmailAlreadyExistsException(user.email)
+        
+        # Создаем нового пользователя
+        db_user = UserDB(**user.model_dump())
+        self.db.add(db_user)
+        self._flush(user.email)
+        return db_user
+    
+    def stage_update_user(self, user_id: int, user: UserCreate) -> tuple[UserDB, str]:
+        """Возвращает пользователя и его прежний email"""
+        db_user = self.get_user(user_id)
+        
+        # Проверяем, не занят ли email другим пользователем
+        old_email = db_user.email
+        if user.email != old_email and self._email_exists(user.email):
+            raise EmailAlreadyExistsException(user.email)
+        
+        # Обновляем данные пользователя
+        for field, value in user.model_dump().items():
+            setattr(db_user, field, value)
+        self._flush(user.email)
+        return db_user, old_email
+    
+    def _flush(self, email: str) -> None:
+        try:
+            self.db.flush()
+        except IntegrityError:
+            # Уникальный индекс: email заняли после проверки (или в другом процессе)
+            self.remember_email(email)
+            raise EmailAlreadyExistsException(email)
+    
     def create_user(self, user: UserCreate) -> UserDB:
         try:
-            # Проверяем, существует ли пользователь с таким email
-            existing_user = self.db.query(UserDB).filter(UserDB.email == user.email).first()
-            if existing_user:
-                raise EmailAlreadyExistsException(user.email)
-            
-            # Создаем нового пользователя
-            db_user = UserDB(**user.model_dump())
-            self.db.add(db_user)
+            db_user = self.stage_create_user(user)
             self.db.commit()
-            self.db.refresh(db_user)
+            self.remember_email(user.email)
             return db_user
         except EmailAlreadyExistsException:
+            self.db.rollback()
+            raise
+        except StatementBudgetExceeded:
             raise
         except Exception as e:
             self.db.rollback()
             logger.error(f"Database error in create_user: {e}")
             raise DatabaseException("Ошибка при создании пользователя")
     
+    def remember_email(self, email: str) -> None:
+        if self.email_filter is not None:
+            self.email_filter.add(email)
+    
+    def create_users_bulk(self, users: list[UserCreate]) -> list[UserBulkItemResult]:
+        try:
+            try:
+                return self._create_users_bulk(users)
+            except IntegrityError:
+                # Email заняли параллельно между проверкой и вставкой: повторяем с новой проверкой,
+                # уже без фильтра email (он мог не знать об адресе из другого процесса)
+                self.db.rollback()
+                return self._create_users_bulk(users, use_filter=False)
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Database error in create_users_bulk: {e}")
+            raise DatabaseException("Ошибка при массовом создании пользователей")
+    
+    def _create_users_bulk(self, users: list[UserCreate], use_filter: bool = True) -> list[UserBulkItemResult]:
+        # Один запрос на все email вместо SELECT на каждого пользователя;
+        # адреса, которых точно нет по фильтру email, в запрос не попадают
+        emails = {user.email for user in users}
+        email_filter = self.email_filter if use_filter else None
+        if email_filter is not None:
+            emails = {email for email in emails if email_filter.might_exist(email)}
+        taken = set(self.db.scalars(select(UserDB.email).where(UserDB.email.in_(emails)))) if emails else set()
+        if email_filter is not None:
+            email_filter.record_false_positive(len(emails) - len(taken))
+        
+        results = []
+        rows = []
+        for index, user in enumerate(users):
+            if user.email in taken:
+                results.append(UserBulkItemResult(
+                    index=index,
+                    status="conflict",
+                    detail=f"Пользователь с email {user.email} уже существует"
+                ))
+                continue
+            taken.add(user.email)
+            rows.append(user.model_dump())
+            results.append(UserBulkItemResult(index=index, status="created"))
+        
+        if rows:
+            # executemany пачками с RETURNING: id получаем без refresh на каждую строку
+            inserted = self.db.execute(insert(UserDB).returning(UserDB.id, UserDB.email), rows)
+            ids = {email: user_id for user_id, email in inserted}
+            self.db.commit()
+            for email in ids:
+                self.remember_email(email)
+            for result in results:
+                if result.status == "created":
+                    data = users[result.index].model_dump()
+                    result.user = UserResponse(id=ids[data["email"]], **data)
+        return results
+    
     def update_user(self, user_id: int, user: UserCreate) -> UserDB:
         try:
-            db_user = self.get_user(user_id)
-            
-            # Проверяем, не занят ли email другим пользователем
-            if user.email != db_user.email:
-                existing_user = self.db.query(UserDB).filter(UserDB.email == user.email).first()
-                if existing_user:
-                    raise EmailAlreadyExistsException(user.email)
-            
-            # Обновляем данные пользователя
-            for field, value in user.model_dump().items():
-                setattr(db_user, field, value)
-            
+            db_user, old_email = self.stage_update_user(user_id, user)
             self.db.commit()
-            self.db.refresh(db_user)
+            self.replace_email(old_email, user.email)
             return db_user
         except (UserNotFoundException, EmailAlreadyExistsException):
+            self.db.rollback()
+            raise
+        except StatementBudgetExceeded:
             raise
         except Exception as e:
             self.db.rollback()
             logger.error(f"Database error in update_user: {e}")
             raise DatabaseException("Ошибка при обновлении пользователя")
     
+    def replace_email(self, old_email: str, new_email: str) -> None:
+        if self.email_filter is not None and old_email != new_email:
+            self.email_filter.remove(old_email)
+            self.email_filter.add(new_email)
+    
     def delete_user(self, user_id: int) -> None:
         try:
             db_user = self.get_user(user_id)
             self.db.delete(db_user)
             self.db.commit()
+            if self.email_filter is not None:
+                self.email_filter.remove(db_user.email)
         except UserNotFoundException:
             raise
+        except StatementBudgetExceeded:
+            raise
         except Exception as e:
             self.db.rollback()
             logger.error(f"Database error in delete_user: {e}")
-            raise DatabaseException("Ошибка при удалении пользователя")
\ No newline at end of file
+            raise DatabaseException("Ошибка при удалении пользователя")
+
+
+def user_cache_key(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+class CachedUserRepository:
+    """
+    Read-through кэш поверх UserRepository: get_user сначала смотрит в кэш,
+    update_user и delete_user сбрасывают запись. Остальные методы делегируются как есть.
+    """
+
+    def __init__(self, repository: UserRepository, cache: CacheBackend):
+        self.repository = repository
+        self.cache = cache
+    
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+    
+    def get_user(self, user_id: int) -> UserRecord:
+        key = user_cache_key(user_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return UserRecord(**cached)
+        user = UserRecord.model_validate(self.repository.get_user(user_id))
+        self.cache.set(key, user.model_dump())
+        return user
+    
+    def get_users_by_ids(self, user_ids: list[int]) -> list[UserRecord]:
+        cached = self.cache.get_many([user_cache_key(user_id) for user_id in user_ids])
+        users = [UserRecord(**value) for value in cached.values()]
+        missing = [user_id for user_id in user_ids if user_cache_key(user_id) not in cached]
+        if missing:
+            loaded = [UserRecord.model_validate(user) for user in self.repository.get_users_by_ids(missing)]
+            self.cache.set_many({user_cache_key(user.id): user.model_dump() for user in loaded})
+            users.extend(loaded)
+        return users
+    
+    def get_user_version(self, user_id: int) -> Optional[int]:
+        cached = self.cache.get(user_cache_key(user_id))
+        if cached is not None:
+            return cached["version"]
+        return self.repository.get_user_version(user_id)
+    
+    def update_user(self, user_id: int, user: UserCreate) -> UserDB:
+        try:
+            return self.repository.update_user(user_id, user)
+        finally:
+            self.cache.delete(user_cache_key(user_id))
+    
+    def delete_user(self, user_id: int) -> None:
+        try:
+            self.repository.delete_user(user_id)
+        finally:
+            self.cache.delete(user_cache_key(user_id))
+
+class AsyncUserRepository:
+    """Асинхронный вариант UserRepository поверх AsyncSession (режим DB_MODE=async)"""
+
+    def __init__(self, db: AsyncSession, email_filter: Optional[EmailFilter] = None):
+        self.db = db
+        self.email_filter = email_filter
+    
+    async def get_user(self, user_id: int) -> UserDB:
+        try:
+            user = await self.db.get(UserDB, user_id)
+            if not user:
+                raise UserNotFoundException(user_id)
+            return user
+        except UserNotFoundException:
+            raise
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user: {e}")
+            raise DatabaseException("Ошибка при получении пользователя")
+    
+    async def get_all_users(self, skip: int = 0, limit: int = 100) -> list[UserDB]:
+        try:
+            result = await self.db.scalars(select(UserDB).order_by(UserDB.id).offset(skip).limit(limit))
+            return list(result)
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_all_users: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    async def get_users_after(self, after_id: int, limit: int = 100) -> list[UserDB]:
+        try:
+            result = await self.db.scalars(
+                select(UserDB).where(UserDB.id > after_id).order_by(UserDB.id).limit(limit)
+            )
+            return list(result)
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_users_after: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    async def get_users_by_ids(self, user_ids: list[int]) -> list[UserDB]:
+        try:
+            result = await self.db.scalars(select(UserDB).where(UserDB.id.in_(user_ids)).order_by(UserDB.id))
+            return list(result)
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_users_by_ids: {e}")
+            raise DatabaseException("Ошибка при получении пользователей")
+    
+    async def count_users(self) -> int:
+        try:
+            return await self.db.scalar(select(CounterDB.value).where(CounterDB.name == USERS_COUNTER)) or 0
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in count_users: {e}")
+            raise DatabaseException("Ошибка при подсчёте пользователей")
+    
+    async def get_age_counts(self) -> list[tuple[int, int]]:
+        try:
+            result = await self.db.execute(AGE_COUNTS_QUERY)
+            return result.all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_age_counts: {e}")
+            raise DatabaseException("Ошибка при получении статистики пользователей")
+    
+    async def get_changes(self, since: int, limit: int = 100) -> list[tuple]:
+        try:
+            result = await self.db.execute(CHANGES_QUERY.where(UserChangeDB.seq > since).limit(limit))
+            return result.all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_changes: {e}")
+            raise DatabaseException("Ошибка при получении ленты изменений")
+    
+    async def get_user_rows(self, skip: int = 0, limit: int = 100) -> list[tuple]:
+        try:
+            result = await self.db.execute(
+                select(*USER_ROW_COLUMNS).order_by(UserDB.id).offset(skip).limit(limit)
+            )
+            return result.all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_rows: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    async def get_user_rows_after(self, after_id: int, limit: int = 100) -> list[tuple]:
+        try:
+            result = await self.db.execute(
+                select(*USER_ROW_COLUMNS).where(UserDB.id > after_id).order_by(UserDB.id).limit(limit)
+            )
+            return result.all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_rows_after: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    async def get_user_version(self, user_id: int) -> Optional[int]:
+        try:
+            return await self.db.scalar(select(UserDB.version).where(UserDB.id == user_id))
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_version: {e}")
+            raise DatabaseException("Ошибка при получении пользователя")
+    
+    async def get_user_versions(self, skip: int = 0, limit: int = 100) -> list[tuple]:
+        try:
+            result = await self.db.execute(
+                select(UserDB.id, UserDB.version).order_by(UserDB.id).offset(skip).limit(limit)
+            )
+            return result.all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_versions: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    async def get_user_versions_after(self, after_id: int, limit: int = 100) -> list[tuple]:
+        try:
+            result = await self.db.execute(
+                select(UserDB.id, UserDB.version)
+                .where(UserDB.id > after_id)
+                .order_by(UserDB.id)
+                .limit(limit)
+            )
+            return result.all()
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in get_user_versions_after: {e}")
+            raise DatabaseException("Ошибка при получении списка пользователей")
+    
+    async def _email_exists(self, email: str) -> bool:
+        if self.email_filter is not None and not self.email_filter.might_exist(email):
+            return False
+        result = await self.db.scalar(select(UserDB.id).where(UserDB.email == email).limit(1))
+        if result is None and self.email_filter is not None:
+            self.email_filter.record_false_positive()
+        return result is not None
+    
+    async def create_user(self, user: UserCreate) -> UserDB:
+        try:
+            if await self._email_exists(user.email):
+                raise EmailAlreadyExistsException(user.email)
+            
+            db_user = UserDB(**user.model_dump())
+            self.db.add(db_user)
+            try:
+                await self.db.commit()
+            except IntegrityError:
+                await self.db.rollback()
+                if self.email_filter is not None:
+                    self.email_filter.add(user.email)
+                raise EmailAlreadyExistsException(user.email)
+            if self.email_filter is not None:
+                self.email_filter.add(user.email)
+            await self.db.refresh(db_user)
+            return db_user
+        except EmailAlreadyExistsException:
+            raise
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Database error in create_user: {e}")
+            raise DatabaseException("Ошибка при создании пользователя")
+    
+    async def update_user(self, user_id: int, user: UserCreate) -> UserDB:
+        try:
+            db_user = await self.get_user(user_id)
+            
+            old_email = db_user.email
+            if user.email != old_email and await self._email_exists(user.email):
+                raise EmailAlreadyExistsException(user.email)
+            
+            for field, value in user.model_dump().items():
+                setattr(db_user, field, value)
+            
+            try:
+                await self.db.commit()
+            except IntegrityError:
+                await self.db.rollback()
+                if self.email_filter is not None:
+                    self.email_filter.add(user.email)
+                raise EmailAlreadyExistsException(user.email)
+            if self.email_filter is not None and user.email != old_email:
+                self.email_filter.remove(old_email)
+                self.email_filter.add(user.email)
+            await self.db.refresh(db_user)
+            return db_user
+        except (UserNotFoundException, EmailAlreadyExistsException):
+            raise
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Database error in update_user: {e}")
+            raise DatabaseException("Ошибка при обновлении пользователя")
+    
+    async def delete_user(self, user_id: int) -> None:
+        try:
+            db_user = await self.get_user(user_id)
+            await self.db.delete(db_user)
+            await self.db.commit()
+            if self.email_filter is not None:
+                self.email_filter.remove(db_user.email)
+        except UserNotFoundException:
+            raise
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            logger.error(f"Database error in delete_user: {e}")
+            raise DatabaseException("Ошибка при удалении пользователя")
+
+
+class AsyncCachedUserRepository:
+    """Тот же read-through кэш для AsyncUserRepository"""
+
+    def __init__(self, repository: AsyncUserRepository, cache: CacheBackend):
+        self.repository = repository
+        self.cache = cache
+    
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+    
+    async def get_user(self, user_id: int) -> UserRecord:
+        key = user_cache_key(user_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return UserRecord(**cached)
+        user = UserRecord.model_validate(await self.repository.get_user(user_id))
+        self.cache.set(key, user.model_dump())
+        return user
+    
+    async def get_users_by_ids(self, user_ids: list[int]) -> list[UserRecord]:
+        cached = self.cache.get_many([user_cache_key(user_id) for user_id in user_ids])
+        users = [UserRecord(**value) for value in cached.values()]
+        missing = [user_id for user_id in user_ids if user_cache_key(user_id) not in cached]
+        if missing:
+            loaded = [UserRecord.model_validate(user) for user in await self.repository.get_users_by_ids(missing)]
+            self.cache.set_many({user_cache_key(user.id): user.model_dump() for user in loaded})
+            users.extend(loaded)
+        return users
+    
+    async def get_user_version(self, user_id: int) -> Optional[int]:
+        cached = self.cache.get(user_cache_key(user_id))
+        if cached is not None:
+            return cached["version"]
+        return await self.repository.get_user_version(user_id)
+    
+    async def update_user(self, user_id: int, user: UserCreate) -> UserDB:
+        try:
+            return await self.repository.update_user(user_id, user)
+        finally:
+            self.cache.delete(user_cache_key(user_id))
+    
+    async def delete_user(self, user_id: int) -> None:
+        try:
+            await self.repository.delete_user(user_id)
+        finally:
+            self.cache.delete(user_cache_key(user_id))
@@ -0,0 +1,20 @@
+from fastapi.responses import JSONResponse
+
+from app.schemas import UserResponse
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+# Поля ответа в порядке UserResponse: по ним же выбираются столбцы в UserRepository.get_user_rows
+USER_FIELDS = tuple(UserResponse.model_fields)
+
+
+def users_json_response(rows, headers: dict = None) -> JSONResponse:
+    """
+    Ответ со списком пользователей прямо из кортежей столбцов: без ORM-объектов
+    и без валидации каждого элемента через UserResponse. Схема ответа та же
+    """
+    return FastJSONResponse([dict(zip(USER_FIELDS, row)) for row in rows], headers=headers)
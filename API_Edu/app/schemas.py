@@ -1,5 +1,6 @@
+from enum import Enum
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class UserCreate(BaseModel):
     name: str = Field(..., min_length=2, max_length=50, example="John Doe")
@@ -22,6 +23,52 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UserRecord(UserResponse):
+    """Пользователь вместе с версией строки: так он хранится в кэше, версия нужна для ETag"""
+    version: int
+
+class UserBulkItemResult(BaseModel):
+    index: int
+    status: Literal["created", "conflict"]
+    user: Optional[UserResponse] = None
+    detail: Optional[str] = None
+
+class UserBulkResponse(BaseModel):
+    created: int
+    conflicts: int
+    results: List[UserBulkItemResult]
+
+class UserBatchResponse(BaseModel):
+    users: List[UserResponse]
+    missing: List[int]
+
+class UserChange(BaseModel):
+    seq: int
+    op: Literal["upsert", "delete"]
+    id: int
+    user: Optional[UserResponse] = None
+
+class UserChangesResponse(BaseModel):
+    changes: List[UserChange]
+    next_since: int
+    has_more: bool
+
+class AgeBucket(BaseModel):
+    start: int
+    end: int
+    count: int
+
+class UserStatsResponse(BaseModel):
+    count: int
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    mean_age: Optional[float] = None
+    histogram: List[AgeBucket]
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
 class ErrorResponse(BaseModel):
     detail: str
     error_type: str
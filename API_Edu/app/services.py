@@ -1,25 +1,205 @@
-from app.repositories import UserRepository
-from app.schemas import UserCreate
+from app import config
+from app.repositories import UserRepository, AsyncUserRepository, user_cache_key
+from app.schemas import UserCreate, UserRecord
 from app.exceptions import DatabaseException
+from app.models import CHANGE_UPSERT
+from app.etag import user_etag, list_etag
+from app.pagination import encode_cursor
+from app.singleflight import SingleFlight, AsyncSingleFlight
 import logging
 
 logger = logging.getLogger(__name__)
 
+def order_by_request(user_ids: list[int], users: list) -> tuple[list, list[int]]:
+    """Пользователи в порядке запрошенных id и список id, которых нет в базе"""
+    by_id = {user.id: user for user in users}
+    return [by_id[user_id] for user_id in user_ids if user_id in by_id], [
+        user_id for user_id in user_ids if user_id not in by_id
+    ]
+
+def changes_page(rows: list, since: int, limit: int) -> dict:
+    """Страница ленты изменений из limit + 1 строк: upsert с данными пользователя, delete только с id"""
+    changes = []
+    for seq, op, user_id, name, email, age in rows[:limit]:
+        change = {"seq": seq, "op": op, "id": user_id}
+        if op == CHANGE_UPSERT:
+            change["user"] = {"id": user_id, "name": name, "email": email, "age": age}
+        changes.append(change)
+    return {
+        "changes": changes,
+        "next_since": changes[-1]["seq"] if changes else since,
+        "has_more": len(rows) > limit,
+    }
+
+def user_stats(age_counts: list, bucket_size: int) -> dict:
+    """Число пользователей, min/max/среднее возраста и гистограмма по интервалам bucket_size лет"""
+    total = sum(users for _, users in age_counts)
+    if not total:
+        return {"count": 0, "min_age": None, "max_age": None, "mean_age": None, "histogram": []}
+    buckets = {}
+    for age, users in age_counts:
+        start = age // bucket_size * bucket_size
+        buckets[start] = buckets.get(start, 0) + users
+    first, last = min(buckets), max(buckets)
+    return {
+        "count": total,
+        "min_age": age_counts[0][0],
+        "max_age": age_counts[-1][0],
+        "mean_age": round(sum(age * users for age, users in age_counts) / total, 2),
+        # Пустые интервалы между крайними тоже выводятся, чтобы гистограмму можно было рисовать как есть
+        "histogram": [
+            {"start": start, "end": start + bucket_size - 1, "count": buckets.get(start, 0)}
+            for start in range(first, last + 1, bucket_size)
+        ],
+    }
+
+# Общие на процесс: одновременные промахи кэша по одному пользователю выполняют один запрос к базе
+user_lookups = SingleFlight(config.SINGLE_FLIGHT_TIMEOUT) if config.SINGLE_FLIGHT_ENABLED else None
+async_user_lookups = AsyncSingleFlight(config.SINGLE_FLIGHT_TIMEOUT) if config.SINGLE_FLIGHT_ENABLED else None
+
 class UserService:
-    def __init__(self, user_repository: UserRepository):
+    def __init__(self, user_repository: UserRepository, lookups: SingleFlight = None):
         self.user_repository = user_repository
+        self.lookups = lookups
     
     def get_user(self, user_id: int):
-        return self.user_repository.get_user(user_id)
+        if self.lookups is None:
+            return self.user_repository.get_user(user_id)
+        return self.lookups.do(user_cache_key(user_id), lambda: self._get_user_shared(user_id))
+    
+    def _get_user_shared(self, user_id: int) -> UserRecord:
+        # Результат получат потоки других запросов, а ORM-объект привязан к сессии первого запроса,
+        # которая закрывается вместе с ним: отдаём снимок, как и в асинхронном пути
+        return UserRecord.model_validate(self.user_repository.get_user(user_id))
     
-    def get_all_users(self, skip: int = 0, limit: int = 100):
+    def get_users_by_ids(self, user_ids: list[int]):
+        # Повторы id не дают повторных записей: порядок по первому упоминанию
+        user_ids = list(dict.fromkeys(user_ids))
+        return order_by_request(user_ids, self.user_repository.get_users_by_ids(user_ids))
+    
+    # as_rows=True: кортежи столбцов вместо ORM-объектов (см. app.responses.users_json_response)
+    def get_all_users(self, skip: int = 0, limit: int = 100, as_rows: bool = False):
+        if as_rows:
+            return self.user_repository.get_user_rows(skip, limit)
         return self.user_repository.get_all_users(skip, limit)
     
+    def get_users_after(self, after_id: int, limit: int = 100, as_rows: bool = False):
+        # Запрашиваем на одну запись больше, чтобы понять, есть ли следующая страница
+        if as_rows:
+            users = self.user_repository.get_user_rows_after(after_id, limit + 1)
+        else:
+            users = self.user_repository.get_users_after(after_id, limit + 1)
+        next_cursor = encode_cursor(users[limit - 1].id) if len(users) > limit else None
+        return users[:limit], next_cursor
+    
+    def count_users(self) -> int:
+        return self.user_repository.count_users()
+    
+    def rebuild_user_count(self) -> tuple[int, int]:
+        return self.user_repository.rebuild_user_count()
+    
+    def get_user_stats(self, bucket_size: int = 10) -> dict:
+        return user_stats(self.user_repository.get_age_counts(), bucket_size)
+    
+    def rebuild_age_counts(self) -> tuple[dict, dict]:
+        return self.user_repository.rebuild_age_counts()
+    
+    def get_changes(self, since: int, limit: int = 100) -> dict:
+        return changes_page(self.user_repository.get_changes(since, limit + 1), since, limit)
+    
+    def search_users(self, query: str, limit: int = 20):
+        return self.user_repository.search_users(query, limit)
+    
+    def get_user_etag(self, user_id: int):
+        version = self.user_repository.get_user_version(user_id)
+        return user_etag(user_id, version) if version is not None else None
+    
+    def get_all_users_etag(self, skip: int = 0, limit: int = 100):
+        return list_etag(self.user_repository.get_user_versions(skip, limit))
+    
+    def get_users_after_etag(self, after_id: int, limit: int = 100):
+        rows = self.user_repository.get_user_versions_after(after_id, limit + 1)
+        next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+        return list_etag(rows[:limit]), next_cursor
+    
     def create_user(self, user: UserCreate):
         return self.user_repository.create_user(user)
     
+    def create_users_bulk(self, users: list[UserCreate]):
+        return self.user_repository.create_users_bulk(users)
+    
     def update_user(self, user_id: int, user: UserCreate):
         return self.user_repository.update_user(user_id, user)
     
     def delete_user(self, user_id: int):
-        return self.user_repository.delete_user(user_id)
\ No newline at end of file
+        return self.user_repository.delete_user(user_id)
+
+
+class AsyncUserService:
+    """
+    open_repository — асинхронный контекстный менеджер, который открывает репозиторий на отдельной
+    сессии: на нём выполняется общий для нескольких запросов поиск пользователя (single-flight)
+    """
+
+    def __init__(self, user_repository: AsyncUserRepository, lookups: AsyncSingleFlight = None, open_repository=None):
+        self.user_repository = user_repository
+        self.lookups = lookups
+        self.open_repository = open_repository
+    
+    async def get_user(self, user_id: int):
+        if self.lookups is None or self.open_repository is None:
+            return await self.user_repository.get_user(user_id)
+        return await self.lookups.do(user_cache_key(user_id), lambda: self._get_user_shared(user_id))
+    
+    async def _get_user_shared(self, user_id: int) -> UserRecord:
+        # Общая задача переживает первого вызывающего (таймаут 504, разрыв соединения), поэтому
+        # работает в своей сессии: сессию запроса FastAPI закрывает, не дожидаясь задачи
+        async with self.open_repository() as repository:
+            return UserRecord.model_validate(await repository.get_user(user_id))
+    
+    async def get_users_by_ids(self, user_ids: list[int]):
+        user_ids = list(dict.fromkeys(user_ids))
+        return order_by_request(user_ids, await self.user_repository.get_users_by_ids(user_ids))
+    
+    async def get_all_users(self, skip: int = 0, limit: int = 100, as_rows: bool = False):
+        if as_rows:
+            return await self.user_repository.get_user_rows(skip, limit)
+        return await self.user_repository.get_all_users(skip, limit)
+    
+    async def get_users_after(self, after_id: int, limit: int = 100, as_rows: bool = False):
+        if as_rows:
+            users = await self.user_repository.get_user_rows_after(after_id, limit + 1)
+        else:
+            users = await self.user_repository.get_users_after(after_id, limit + 1)
+        next_cursor = encode_cursor(users[limit - 1].id) if len(users) > limit else None
+        return users[:limit], next_cursor
+    
+    async def count_users(self) -> int:
+        return await self.user_repository.count_users()
+    
+    async def get_user_stats(self, bucket_size: int = 10) -> dict:
+        return user_stats(await self.user_repository.get_age_counts(), bucket_size)
+    
+    async def get_changes(self, since: int, limit: int = 100) -> dict:
+        return changes_page(await self.user_repository.get_changes(since, limit + 1), since, limit)
+    
+    async def get_user_etag(self, user_id: int):
+        version = await self.user_repository.get_user_version(user_id)
+        return user_etag(user_id, version) if version is not None else None
+    
+    async def get_all_users_etag(self, skip: int = 0, limit: int = 100):
+        return list_etag(await self.user_repository.get_user_versions(skip, limit))
+    
+    async def get_users_after_etag(self, after_id: int, limit: int = 100):
+        rows = await self.user_repository.get_user_versions_after(after_id, limit + 1)
+        next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+        return list_etag(rows[:limit]), next_cursor
+    
+    async def create_user(self, user: UserCreate):
+        return await self.user_repository.create_user(user)
+    
+    async def update_user(self, user_id: int, user: UserCreate):
+        return await self.user_repository.update_user(user_id, user)
+    
+    async def delete_user(self, user_id: int):
+        return await self.user_repository.delete_user(user_id)
@@ -0,0 +1,417 @@
+"""
+Шардирование пользователей по нескольким файлам SQLite (DB_SHARDS > 0).
+
+Пользователь хранится в шарде, номер которого вычисляется по хешу id; у каждого шарда свой
+писатель (и своя блокировка записи), поэтому записи в разные шарды не ждут друг друга,
+а каждый файл можно копировать отдельно. Схема шарда та же, что у основной базы (все миграции).
+
+Общий справочник (user_directory) хранит только пары id–email: он выдаёт id новым пользователям
+(AUTOINCREMENT) и отвечает за уникальность email через уникальный индекс. Изменения затрагивают
+две базы без общей транзакции: справочник меняется первым, и при ошибке в шарде изменение
+в справочнике откатывается отдельно. Если процесс упадёт между ними, в справочнике останется
+занятый email без пользователя — это безопаснее, чем два пользователя с одним email.
+
+Списки собираются со всех шардов (scatter-gather) и сливаются по id.
+"""
+import heapq
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import chain, islice, zip_longest
+from typing import Callable, Optional
+
+from sqlalchemy import Column, Integer, String, create_engine, delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from app import config
+from app.database import READ_PRAGMAS, WRITE_PRAGMAS, set_sqlite_pragmas
+from app.exceptions import (
+    DatabaseException,
+    EmailAlreadyExistsException,
+    FeatureUnavailableException,
+    PageTooDeepException,
+    UserNotFoundException,
+)
+from app.metrics import track_statements
+from app.migrations import ensure_schema
+from app.models import UserDB
+from app.query_log import StatementBudgetExceeded
+from app.repositories import UserRepository
+from app.schemas import UserBulkItemResult, UserCreate, UserResponse
+from app.write_lock import coordinate_writes
+
+logger = logging.getLogger(__name__)
+
+DirectoryBase = declarative_base()
+
+
+class UserDirectoryDB(DirectoryBase):
+    """Справочник email: выдаёт id и гарантирует уникальность email во всех шардах"""
+    __tablename__ = "user_directory"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String, unique=True, nullable=False)
+
+
+def derived_url(url: str, suffix: str) -> str:
+    """sqlite:///./test.db + shard0 -> sqlite:///./test.shard0.db"""
+    base, extension = os.path.splitext(url)
+    return f"{base}.{suffix}{extension or '.db'}"
+
+
+def shard_of(user_id: int, shards: int) -> int:
+    # Мультипликативный хеш (старшие биты произведения): номер шарда не повторяет остаток id,
+    # поэтому закономерности в id (например, чётные у одного типа клиентов) не перекашивают шарды
+    return (((user_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> 32) % shards
+
+
+class ShardDatabase:
+    """Один файл SQLite: писатель с одним соединением и пул читателей, как у основной базы"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.engine = create_engine(
+            url, connect_args={"check_same_thread": False},
+            pool_size=1, max_overflow=0, pool_timeout=config.DB_WRITE_TIMEOUT,
+        )
+        set_sqlite_pragmas(self.engine, WRITE_PRAGMAS)
+        coordinate_writes(self.engine, config.SQLITE_WRITE_LOCK)
+        self.read_engine = create_engine(
+            url, connect_args={"check_same_thread": False},
+            pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW,
+        )
+        set_sqlite_pragmas(self.read_engine, READ_PRAGMAS)
+        track_statements(self.engine, f"{name}-write")
+        track_statements(self.read_engine, f"{name}-read")
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine)
+        self.ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.read_engine)
+
+    def dispose(self):
+        self.engine.dispose()
+        self.read_engine.dispose()
+
+
+class ShardedStore:
+    """Шарды и справочник email одного процесса"""
+
+    def __init__(self, shard_urls: list[str], directory_url: str):
+        self.shards = [ShardDatabase(f"shard{number}", url) for number, url in enumerate(shard_urls)]
+        self.directory = ShardDatabase("directory", directory_url)
+        self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard")
+
+    def shard_for(self, user_id: int) -> ShardDatabase:
+        return self.shards[shard_of(user_id, len(self.shards))]
+
+    def migrate(self) -> None:
+        DirectoryBase.metadata.create_all(self.directory.engine)
+        for shard in self.shards:
+            applied = ensure_schema(shard.engine)
+            if applied:
+                logger.info(f"Shard {shard.name} migrated to version {applied[-1]}")
+
+    def scatter(self, fn: Callable) -> list:
+        """fn(shard) для всех шардов параллельно; результаты в порядке шардов"""
+        if len(self.shards) == 1:
+            return [fn(self.shards[0])]
+        return list(self._executor.map(fn, self.shards))
+
+    def dispose(self):
+        for database in [*self.shards, self.directory]:
+            database.dispose()
+
+
+def merge_by_id(results: list[list], limit: Optional[int] = None) -> list:
+    """Слияние отсортированных по id списков с разных шардов"""
+    return list(islice(heapq.merge(*results, key=lambda row: row.id), limit))
+
+
+class ShardedUserRepository:
+    """UserRepository поверх шардов: запросы к одному пользователю идут в его шард, списки — во все"""
+
+    def __init__(self, store: ShardedStore):
+        self.store = store
+
+    # Чтение из шарда через UserRepository на сессии читателя
+    def _read(self, user_id: int, fn: Callable):
+        with self.store.shard_for(user_id).ReadSessionLocal() as db:
+            return fn(UserRepository(db))
+
+    def _gather(self, fn: Callable) -> list:
+        def run(shard: ShardDatabase):
+            with shard.ReadSessionLocal() as db:
+                return fn(UserRepository(db))
+        return self.store.scatter(run)
+
+    def get_user(self, user_id: int) -> UserDB:
+        return self._read(user_id, lambda repository: repository.get_user(user_id))
+
+    def get_user_version(self, user_id: int) -> Optional[int]:
+        return self._read(user_id, lambda repository: repository.get_user_version(user_id))
+
+    def get_users_by_ids(self, user_ids: list[int]) -> list[UserDB]:
+        by_shard = {}
+        for user_id in user_ids:
+            by_shard.setdefault(self.store.shard_for(user_id).name, []).append(user_id)
+
+        def run(shard: ShardDatabase):
+            if shard.name not in by_shard:
+                return []
+            with shard.ReadSessionLocal() as db:
+                return UserRepository(db).get_users_by_ids(by_shard[shard.name])
+        return merge_by_id(self.store.scatter(run))
+
+    # OFFSET по шардам: каждый шард отдаёт первые skip + limit строк, и лишние отбрасываются
+    # после слияния, то есть страница стоит skip * DB_SHARDS строк. Поэтому skip ограничен
+    # DB_SHARD_MAX_SKIP, а для глубоких страниц есть курсор (after_id): шард отдаёт только limit строк
+    def _page(self, method: str, skip: int, limit: int) -> list:
+        if skip > config.DB_SHARD_MAX_SKIP:
+            raise PageTooDeepException(skip, config.DB_SHARD_MAX_SKIP)
+        pages = self._gather(lambda repository: getattr(repository, method)(0, skip + limit))
+        return merge_by_id(pages, skip + limit)[skip:]
+
+    def _after(self, method: str, after_id: int, limit: int) -> list:
+        return merge_by_id(self._gather(lambda repository: getattr(repository, method)(after_id, limit)), limit)
+
+    def get_all_users(self, skip: int = 0, limit: int = 100) -> list[UserDB]:
+        return self._page("get_all_users", skip, limit)
+
+    def get_users_after(self, after_id: int, limit: int = 100) -> list[UserDB]:
+        return self._after("get_users_after", after_id, limit)
+
+    def get_user_rows(self, skip: int = 0, limit: int = 100) -> list[tuple]:
+        return self._page("get_user_rows", skip, limit)
+
+    def get_user_rows_after(self, after_id: int, limit: int = 100) -> list[tuple]:
+        return self._after("get_user_rows_after", after_id, limit)
+
+    def get_user_versions(self, skip: int = 0, limit: int = 100) -> list[tuple]:
+        return self._page("get_user_versions", skip, limit)
+
+    def get_user_versions_after(self, after_id: int, limit: int = 100) -> list[tuple]:
+        return self._after("get_user_versions_after", after_id, limit)
+
+    def search_users(self, query: str, limit: int = 20) -> list[UserDB]:
+        # Ранг bm25 считается по словарю своего шарда, поэтому результаты чередуются по шардам
+        # в порядке ранга внутри каждого, а не сортируются по рангу между шардами
+        results = self._gather(lambda repository: repository.search_users(query, limit))
+        interleaved = (user for group in zip_longest(*results) for user in group if user is not None)
+        return list(islice(interleaved, limit))
+
+    def count_users(self) -> int:
+        return sum(self._gather(lambda repository: repository.count_users()))
+
+    def get_changes(self, since: int, limit: int = 100) -> list[tuple]:
+        # Номера изменений у каждого шарда свои, общего порядка между шардами нет, и один since
+        # не может описать позицию во всех лентах. Это не сбой базы, поэтому 501, а не 500
+        raise FeatureUnavailableException("Лента изменений /users/changes недоступна при DB_SHARDS > 0")
+
+    def rebuild_user_count(self) -> tuple[int, int]:
+        def run(shard: ShardDatabase):
+            with shard.SessionLocal() as db:
+                return UserRepository(db).rebuild_user_count()
+        counts = self.store.scatter(run)
+        return sum(stored or 0 for stored, _ in counts), sum(actual for _, actual in counts)
+
+    def get_age_counts(self) -> list[tuple[int, int]]:
+        totals = {}
+        for age_counts in self._gather(lambda repository: repository.get_age_counts()):
+            for age, users in age_counts:
+                totals[age] = totals.get(age, 0) + users
+        return sorted(totals.items())
+
+    def rebuild_age_counts(self) -> tuple[dict, dict]:
+        def run(shard: ShardDatabase):
+            with shard.SessionLocal() as db:
+                return UserRepository(db).rebuild_age_counts()
+        stored, actual = {}, {}
+        for shard_stored, shard_actual in self.store.scatter(run):
+            for totals, counts in ((stored, shard_stored), (actual, shard_actual)):
+                for age, users in counts.items():
+                    totals[age] = totals.get(age, 0) + users
+        return stored, actual
+
+    def iter_user_rows(self, batch_size: int = 1000):
+        """Все пользователи по возрастанию id: потоки шардов сливаются, пачки собираются заново"""
+        with ExitStack() as stack:
+            streams = []
+            for shard in self.store.shards:
+                db = stack.enter_context(shard.ReadSessionLocal())
+                streams.append(chain.from_iterable(UserRepository(db).iter_user_rows(batch_size)))
+            merged = heapq.merge(*streams, key=lambda row: row[0])
+            while batch := list(islice(merged, batch_size)):
+                yield batch
+
+    def iter_emails(self, batch_size: int = 10000):
+        with self.store.directory.ReadSessionLocal() as db:
+            yield from db.scalars(select(UserDirectoryDB.email).execution_options(yield_per=batch_size))
+
+    # Справочник email
+    def _reserve_email(self, email: str) -> int:
+        with self.store.directory.SessionLocal() as db:
+            entry = UserDirectoryDB(email=email)
+            db.add(entry)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                raise EmailAlreadyExistsException(email)
+            return entry.id
+
+    def _set_email(self, user_id: int, email: str) -> None:
+        with self.store.directory.SessionLocal() as db:
+            try:
+                db.execute(update(UserDirectoryDB).where(UserDirectoryDB.id == user_id).values(email=email))
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                raise EmailAlreadyExistsException(email)
+
+    def _release_ids(self, user_ids: list[int]) -> None:
+        with self.store.directory.SessionLocal() as db:
+            db.execute(delete(UserDirectoryDB).where(UserDirectoryDB.id.in_(user_ids)))
+            db.commit()
+
+    def create_user(self, user: UserCreate) -> UserDB:
+        try:
+            user_id = self._reserve_email(user.email)
+            try:
+                with self.store.shard_for(user_id).SessionLocal() as db:
+                    db_user = UserDB(id=user_id, **user.model_dump())
+                    db.add(db_user)
+                    db.commit()
+                    return db_user
+            except Exception:
+                self._release_ids([user_id])
+                raise
+        except EmailAlreadyExistsException:
+            raise
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in create_user: {e}")
+            raise DatabaseException("Ошибка при создании пользователя")
+
+    def create_users_bulk(self, users: list[UserCreate]) -> list[UserBulkItemResult]:
+        try:
+            try:
+                results, ids = self._reserve_emails(users)
+            except IntegrityError:
+                # Email заняли параллельно между проверкой и вставкой: повторяем с новой проверкой
+                results, ids = self._reserve_emails(users)
+            if not ids:
+                return results
+
+            by_shard = {}
+            for result in results:
+                if result.status == "created":
+                    data = users[result.index].model_dump()
+                    row = {"id": ids[data["email"]], **data}
+                    by_shard.setdefault(self.store.shard_for(row["id"]).name, []).append(row)
+                    result.user = UserResponse(**row)
+
+            def run(shard: ShardDatabase):
+                if shard.name in by_shard:
+                    with shard.SessionLocal() as db:
+                        db.execute(insert(UserDB), by_shard[shard.name])
+                        db.commit()
+            try:
+                self.store.scatter(run)
+            except Exception:
+                # Шарды, где вставка прошла, уже зафиксированы: удаляем и их строки, и записи справочника
+                self._delete_rows(list(ids.values()))
+                self._release_ids(list(ids.values()))
+                raise
+            return results
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in create_users_bulk: {e}")
+            raise DatabaseException("Ошибка при массовом создании пользователей")
+
+    def _reserve_emails(self, users: list[UserCreate]) -> tuple[list[UserBulkItemResult], dict]:
+        """Результаты по элементам и id, выданные новым email, одной транзакцией справочника"""
+        with self.store.directory.SessionLocal() as db:
+            emails = {user.email for user in users}
+            taken = set(db.scalars(select(UserDirectoryDB.email).where(UserDirectoryDB.email.in_(emails))))
+            results = []
+            new_emails = []
+            for index, user in enumerate(users):
+                if user.email in taken:
+                    results.append(UserBulkItemResult(
+                        index=index,
+                        status="conflict",
+                        detail=f"Пользователь с email {user.email} уже существует"
+                    ))
+                    continue
+                taken.add(user.email)
+                new_emails.append({"email": user.email})
+                results.append(UserBulkItemResult(index=index, status="created"))
+            ids = {}
+            if new_emails:
+                inserted = db.execute(
+                    insert(UserDirectoryDB).returning(UserDirectoryDB.id, UserDirectoryDB.email), new_emails
+                )
+                ids = {email: user_id for user_id, email in inserted}
+                db.commit()
+            return results, ids
+
+    def _delete_rows(self, user_ids: list[int]) -> None:
+        def run(shard: ShardDatabase):
+            with shard.SessionLocal() as db:
+                db.execute(delete(UserDB).where(UserDB.id.in_(user_ids)))
+                db.commit()
+        self.store.scatter(run)
+
+    def update_user(self, user_id: int, user: UserCreate) -> UserDB:
+        try:
+            with self.store.shard_for(user_id).SessionLocal() as db:
+                db_user = UserRepository(db).get_user(user_id)
+                old_email = db_user.email
+                moved = user.email != old_email
+                if moved:
+                    self._set_email(user_id, user.email)
+                try:
+                    for field, value in user.model_dump().items():
+                        setattr(db_user, field, value)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    if moved:
+                        self._set_email(user_id, old_email)
+                    raise
+                return db_user
+        except (UserNotFoundException, EmailAlreadyExistsException):
+            raise
+        except StatementBudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Database error in update_user: {e}")
+            raise DatabaseException("Ошибка при обновлении пользователя")
+
+    def delete_user(self, user_id: int) -> None:
+        with self.store.shard_for(user_id).SessionLocal() as db:
+            UserRepository(db).delete_user(user_id)
+        try:
+            self._release_ids([user_id])
+        except Exception as e:
+            # Пользователь уже удалён, но email в справочнике останется занятым
+            logger.error(f"Database error releasing email of user {user_id}: {e}")
+
+
+def build_sharded_store() -> Optional[ShardedStore]:
+    if config.DB_SHARDS <= 0:
+        return None
+    if config.DB_MODE == "async":
+        raise ValueError("DB_SHARDS поддерживается только в режиме DB_MODE=sync")
+    template = config.DB_SHARD_URL_TEMPLATE or derived_url(config.DATABASE_URL, "shard{shard}")
+    directory_url = config.DB_SHARD_DIRECTORY_URL or derived_url(config.DATABASE_URL, "directory")
+    return ShardedStore([template.format(shard=number) for number in range(config.DB_SHARDS)], directory_url)
+
+
+# Шарды процесса (None, если шардирование выключено)
+sharded_store = build_sharded_store()
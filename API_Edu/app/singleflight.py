@@ -0,0 +1,92 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable
+
+from app.exceptions import LookupTimeoutException
+
+
+class _Call:
+    """Выполняющийся запрос по ключу: результат или исключение получают все ожидающие"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Объединение одновременных запросов по ключу для синхронного кода (потоки пула Starlette).
+    Первый вызов выполняет fn, остальные ждут его результата не дольше timeout секунд.
+    Результат получают другие запросы, поэтому fn возвращает снимок, а не объект сессии первого
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.calls = 0
+        self.shared = 0
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            else:
+                self.shared += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                call.done.set()
+        elif not call.done.wait(self.timeout):
+            raise LookupTimeoutException(self.timeout)
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
+
+
+class AsyncSingleFlight:
+    """
+    То же для asyncio. Запрос выполняется в отдельной задаче, поэтому отмена первого
+    вызывающего (клиент закрыл соединение) не отменяет его для остальных
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.calls = 0
+        self.shared = 0
+        self._inflight = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.shared += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except asyncio.TimeoutError:
+            raise LookupTimeoutException(self.timeout)
+
+    def _forget(self, key: str, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(self._inflight)}
@@ -0,0 +1,76 @@
+"""
+Один писатель на базу SQLite для нескольких процессов (run.py --workers N).
+
+Внутри процесса писатель и так один (пул из одного соединения). Между процессами
+транзакции писателя начинаются с BEGIN IMMEDIATE: блокировка записи берётся сразу,
+а не при первом INSERT/UPDATE, поэтому транзакция, уже прочитавшая данные, не получает
+"database is locked" при попытке начать запись. Сам порядок писателей задаёт файловая
+блокировка: процессы ждут её в ядре по очереди, а не опрашивают базу через busy_timeout.
+"""
+import os
+import threading
+
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows: остаётся только BEGIN IMMEDIATE и busy_timeout
+    fcntl = None
+
+
+class ProcessWriteLock:
+    """Файловая блокировка (flock). Файл открывается заново после fork, иначе процессы делили бы одну блокировку"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pid = None
+        self._fd = None
+        self._guard = threading.Lock()
+
+    def _descriptor(self) -> int:
+        with self._guard:
+            if self._pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            return self._fd
+
+    def acquire(self):
+        fcntl.flock(self._descriptor(), fcntl.LOCK_EX)
+
+    def release(self):
+        fcntl.flock(self._descriptor(), fcntl.LOCK_UN)
+
+
+def sqlite_database_path(engine):
+    """Путь к файлу базы или None для базы в памяти"""
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        return None
+    return os.path.abspath(database)
+
+
+def coordinate_writes(engine, use_file_lock: bool = True):
+    """Транзакции движка писателя: файловая блокировка на время транзакции и BEGIN IMMEDIATE"""
+    database_path = sqlite_database_path(engine)
+    if database_path is None:
+        return
+    lock = ProcessWriteLock(database_path + ".write-lock") if use_file_lock and fcntl is not None else None
+
+    @event.listens_for(engine, "connect")
+    def _manual_transactions(dbapi_connection, connection_record):
+        # pysqlite сам открывает транзакцию (BEGIN DEFERRED) перед первым изменением;
+        # отключаем это, чтобы начинать транзакцию явно
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        if lock is not None:
+            lock.acquire()
+            conn.info["write_lock_held"] = True
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    # Блокировка отпускается, когда соединение вернулось в пул, то есть уже после COMMIT/ROLLBACK
+    @event.listens_for(engine, "checkin")
+    def _release_lock(dbapi_connection, connection_record):
+        if connection_record is not None and connection_record.info.pop("write_lock_held", False):
+            lock.release()
@@ -0,0 +1,100 @@
+"""
+Нагрузочный прогон API_Edu по всем маршрутам.
+
+Запуск из каталога API_Edu (нужен httpx, см. benchmarks/requirements.txt):
+    python -m benchmarks seed --dataset 10k 100k 1m
+    python -m benchmarks run --dataset 100k --concurrency 50 --requests 1000 --save-baseline
+    python -m benchmarks check --dataset 100k --threshold 0.25
+
+check завершается с кодом 1, если какой-либо маршрут деградировал относительно базовых значений.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from benchmarks.common import remove_database
+from benchmarks.datasets import DATASETS, ensure_dataset, working_copy
+from benchmarks.report import format_table, save_baseline, load_baseline, find_regressions
+
+
+def run_suite(args) -> dict:
+    path = working_copy(args.dataset)
+    # Настройки приложения читаются при импорте, поэтому база задаётся до импорта app.main
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    logging.basicConfig(level=logging.WARNING)
+    from app.main import app
+    from benchmarks.driver import default_scenarios, run_load, uncovered_routes
+
+    logging.getLogger().setLevel(logging.WARNING)
+    scenarios = default_scenarios()
+    for route in uncovered_routes(app, scenarios):
+        print(f"WARNING: no benchmark scenario for {route}")
+    try:
+        results = asyncio.run(run_load(
+            app, DATASETS[args.dataset], args.requests, args.concurrency, scenarios, args.route
+        ))
+    finally:
+        remove_database(path)
+
+    summaries = {result.route: result.summary() for result in results}
+    print(format_table(summaries))
+    return {
+        "dataset": args.dataset,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "routes": summaries,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="API_Edu load benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="create seeded datasets")
+    seed.add_argument("--dataset", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+
+    for name in ("run", "check"):
+        command = commands.add_parser(name, help="run the suite" if name == "run" else "run and compare with baseline")
+        command.add_argument("--dataset", choices=list(DATASETS), default="10k")
+        command.add_argument("--concurrency", type=int, default=50)
+        command.add_argument("--requests", type=int, default=1000, help="requests per route")
+        command.add_argument("--route", action="append", help="limit the run to this route (repeatable)")
+        if name == "run":
+            command.add_argument("--save-baseline", action="store_true")
+        else:
+            command.add_argument("--threshold", type=float, default=0.25,
+                                 help="allowed relative regression of p95 and throughput")
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        for dataset in args.dataset:
+            print(ensure_dataset(dataset))
+        return
+
+    if args.command == "check":
+        try:
+            baseline = load_baseline(args.dataset)
+        except FileNotFoundError:
+            print(f"No baseline for {args.dataset}, run with --save-baseline first")
+            sys.exit(2)
+        run = run_suite(args)
+        regressions = find_regressions(baseline, run["routes"], args.threshold)
+        if regressions:
+            print("REGRESSIONS:")
+            print("\n".join(f"  {line}" for line in regressions))
+            sys.exit(1)
+        print(f"OK: no route regressed by more than {args.threshold:.0%}")
+        return
+
+    run = run_suite(args)
+    if args.save_baseline:
+        print(f"Baseline saved to {save_baseline(args.dataset, run)}")
+
+
+if __name__ == "__main__":
+    main()
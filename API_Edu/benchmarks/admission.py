@@ -0,0 +1,107 @@
+"""
+Всплеск нагрузки с контролем допуска и без него (ADMISSION_ENABLED).
+
+Клиенты одновременно шлют смесь чтений GET /users/{id} и записей PUT /users/{id}.
+Для допущенных запросов выводятся p50/p99 по классам, для отклонённых — число 503/429.
+С контролем допуска хвост задержки допущенных чтений должен оставаться ограниченным.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.admission --clients 400 --requests 10 --writes 0.2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.common import make_database, remove_database
+from benchmarks.concurrency import percentile
+
+
+async def drive(clients: int, requests_per_client: int, rows: int, writes: float) -> dict:
+    import httpx
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    latencies = {"read": [], "write": []}
+    rejected = {"read": 0, "write": 0}
+    errors = 0
+
+    async def client_loop(client: httpx.AsyncClient, number: int):
+        nonlocal errors
+        for n in range(requests_per_client):
+            user_id = random.randint(1, rows)
+            kind = "write" if random.random() < writes else "read"
+            started = time.perf_counter()
+            if kind == "write":
+                response = await client.put(f"/users/{user_id}", json={
+                    "name": "Burst User", "email": f"burst.{number}.{n}.{random.getrandbits(32)}@example.com", "age": 30
+                })
+            else:
+                response = await client.get(f"/users/{user_id}")
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code in (429, 503):
+                rejected[kind] += 1
+            elif response.status_code == 200:
+                latencies[kind].append(elapsed)
+            else:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, number) for number in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        kind: {
+            "admitted": len(samples),
+            "rejected": rejected[kind],
+            "p50": percentile(samples, 0.5) if samples else 0.0,
+            "p99": percentile(samples, 0.99) if samples else 0.0,
+        }
+        for kind, samples in latencies.items()
+    } | {"elapsed": elapsed, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Burst load with and without admission control")
+    parser.add_argument("--clients", type=int, default=400)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--writes", type=float, default=0.2, help="share of PUT requests")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(drive(args.clients, args.requests, args.rows, args.writes))
+        print(json.dumps(result))
+        return
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    try:
+        print(f"{'admission':>9} {'class':>6} {'admitted':>9} {'rejected':>9} {'p50, ms':>9} {'p99, ms':>9}")
+        for enabled in ("false", "true"):
+            env = dict(os.environ, ADMISSION_ENABLED=enabled, DATABASE_URL=f"sqlite:///{path}")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.admission", "--child", "--clients", str(args.clients),
+                 "--requests", str(args.requests), "--writes", str(args.writes), "--rows", str(args.rows)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            for kind in ("read", "write"):
+                r = result[kind]
+                print(f"{'on' if enabled == 'true' else 'off':>9} {kind:>6} {r['admitted']:>9} {r['rejected']:>9} "
+                      f"{r['p50']:>9.2f} {r['p99']:>9.2f}")
+            print(f"{'':>9} total {result['elapsed']:.2f} s, errors {result['errors']}")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Разрешение списка id: N запросов GET /users/{id} против одного GET /users?ids=...
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.batch_get --rows 100000 --ids 200
+
+Кэш выключен, чтобы сравнивались обращения к базе, а не к кэшу.
+Требуется httpx (см. benchmarks/requirements.txt).
+"""
+import argparse
+import logging
+import os
+import random
+
+from benchmarks.common import make_database, measure, remove_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-ID lookups vs batch GET /users?ids=")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--ids", type=int, nargs="+", default=[10, 50, 200, 500])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["USER_CACHE_ENABLED"] = "false"
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    client = TestClient(app)
+    try:
+        print(f"{'ids':>5} {'one by one, ms':>15} {'batch, ms':>10} {'speedup':>8}")
+        for count in args.ids:
+            user_ids = random.sample(range(1, args.rows + 1), count)
+            url = "/users?ids=" + ",".join(map(str, user_ids))
+            assert len(client.get(url).json()["users"]) == count
+            one_by_one = measure(lambda: [client.get(f"/users/{user_id}") for user_id in user_ids], args.repeat)
+            batch = measure(lambda: client.get(url), args.repeat)
+            print(f"{count:>5} {one_by_one:>15.2f} {batch:>10.2f} {one_by_one / batch:>7.1f}x")
+    finally:
+        client.close()
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
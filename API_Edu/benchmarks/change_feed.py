@@ -0,0 +1,121 @@
+"""
+Проверка ленты изменений GET /users/changes под одновременной записью.
+
+Несколько клиентов создают, изменяют и удаляют пользователей, а потребитель всё это время
+читает ленту страницами с since=next_since и применяет изменения к своей копии.
+Проверяется, что номера внутри и между страницами строго растут, и что после остановки
+записи копия потребителя совпадает с полной выгрузкой GET /users/export — то есть ни одно
+изменение не пропущено. При расхождении код возврата 1.
+
+Запуск из каталога API_Edu (режим и прочие настройки — через переменные окружения, например DB_MODE=async):
+    python -m benchmarks.change_feed --writers 16 --operations 100 --rows 1000
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+
+from benchmarks.common import make_database, remove_database
+
+
+async def write_loop(client, number: int, operations: int, known_ids: list):
+    for n in range(operations):
+        action = random.random()
+        payload = {"name": "Feed User", "email": f"feed.{number}.{n}.{random.getrandbits(32)}@example.com", "age": 30}
+        if action < 0.4 or not known_ids:
+            response = await client.post("/users/", json=payload)
+            if response.status_code == 201:
+                known_ids.append(response.json()["id"])
+        elif action < 0.8:
+            await client.put(f"/users/{random.choice(known_ids)}", json=payload)
+        else:
+            await client.delete(f"/users/{random.choice(known_ids)}")
+
+
+class Consumer:
+    def __init__(self, client, limit: int):
+        self.client = client
+        self.limit = limit
+        self.since = 0
+        self.replica = {}
+        self.pages = 0
+        self.violations = []
+
+    async def poll(self) -> bool:
+        """Читает одну страницу; True, если есть ещё изменения"""
+        response = await self.client.get("/users/changes", params={"since": self.since, "limit": self.limit})
+        page = response.json()
+        self.pages += 1
+        last = self.since
+        for change in page["changes"]:
+            if change["seq"] <= last:
+                self.violations.append(f"seq {change['seq']} after {last}")
+            last = change["seq"]
+            if change["op"] == "upsert":
+                self.replica[change["id"]] = change["user"]
+            else:
+                self.replica.pop(change["id"], None)
+        self.since = page["next_since"]
+        return page["has_more"]
+
+    async def follow(self, writing: asyncio.Event):
+        while not writing.is_set():
+            if not await self.poll():
+                await asyncio.sleep(0.005)
+        while await self.poll():
+            pass
+
+
+async def run(args) -> bool:
+    import httpx
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://feed", timeout=None) as client:
+        consumer = Consumer(client, args.limit)
+        done = asyncio.Event()
+        follower = asyncio.create_task(consumer.follow(done))
+        known_ids = list(range(1, args.rows + 1))
+        await asyncio.gather(*(write_loop(client, number, args.operations, known_ids) for number in range(args.writers)))
+        done.set()
+        await follower
+
+        export = await client.get("/users/export")
+        expected = {user["id"]: user for user in map(json.loads, export.text.splitlines())}
+
+    missing = expected.keys() - consumer.replica.keys()
+    extra = consumer.replica.keys() - expected.keys()
+    stale = [user_id for user_id in expected.keys() & consumer.replica.keys() if expected[user_id] != consumer.replica[user_id]]
+    print(f"pages read: {consumer.pages}, last seq: {consumer.since}, users: {len(expected)}")
+    print(f"order violations: {len(consumer.violations)}, missing: {len(missing)}, "
+          f"not deleted: {len(extra)}, stale: {len(stale)}")
+    for violation in consumer.violations[:10]:
+        print(f"  {violation}")
+    return not (consumer.violations or missing or extra or stale)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ordering and gap-free delivery of GET /users/changes under concurrent writes")
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=100, help="operations per writer")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=50, help="page size of the consumer")
+    args = parser.parse_args()
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    try:
+        ok = asyncio.run(run(args))
+    finally:
+        remove_database(path)
+    print("OK" if ok else "FAILED")
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
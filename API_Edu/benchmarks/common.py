@@ -0,0 +1,71 @@
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.migrations import migrate
+
+SEED_CHUNK = 50_000
+
+FIRST_NAMES = (
+    "Anna", "Boris", "Clara", "Dmitry", "Elena", "Fedor", "Galina", "Igor", "John", "Kira",
+    "Leonid", "Maria", "Nikolay", "Olga", "Pavel", "Roman", "Sofia", "Timur", "Vera", "Yuri",
+)
+LAST_NAMES = (
+    "Ivanov", "Petrov", "Sidorov", "Smirnov", "Kuznetsov", "Popov", "Volkov", "Sokolov",
+    "Lebedev", "Kozlov", "Novikov", "Morozov", "Orlov", "Pavlov", "Zaitsev", "Belov",
+    "Doe", "Smith", "Brown", "Taylor", "Wilson", "Clark", "Walker", "Hall", "Young",
+)
+
+
+def seed_row(i: int) -> tuple:
+    first = FIRST_NAMES[i % len(FIRST_NAMES)]
+    last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    return i, f"{first} {last}", f"{first.lower()}.{last.lower()}{i}@example.com", 18 + i % 80
+
+
+def make_database(rows: int, path: str = None):
+    """Создаёт SQLite-файл со схемой приложения (все миграции) и заполняет его rows записями"""
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="api_edu_bench_", suffix=".db")
+        os.close(fd)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    migrate(engine)
+    seed_users(engine, rows)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine), path
+
+
+def remove_database(path: str):
+    """Удаляет файл базы вместе с журналами WAL и файлом блокировки писателя"""
+    for suffix in ("", "-wal", "-shm", ".write-lock"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def seed_users(engine, rows: int, start: int = 1):
+    # Вставляем сырыми пачками через DBAPI: ORM здесь только мешает
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for offset in range(start, start + rows, SEED_CHUNK):
+            stop = min(offset + SEED_CHUNK, start + rows)
+            cursor.executemany(
+                "INSERT INTO users (id, name, email, age) VALUES (?, ?, ?, ?)",
+                (seed_row(i) for i in range(offset, stop)),
+            )
+        raw.commit()
+    finally:
+        raw.close()
+
+
+def measure(func, repeat: int = 5) -> float:
+    """Медиана времени выполнения func в миллисекундах"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
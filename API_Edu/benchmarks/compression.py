@@ -0,0 +1,113 @@
+"""
+Сжатие ответов GET /users/ (CompressionMiddleware): байты по сети и процессорное время на запрос.
+
+Для каждого размера страницы (limit) и кодировки (identity, gzip и br, если установлен brotli)
+выполняется --requests запросов через httpx.ASGITransport. Выводятся байты тела по сети,
+время передачи по каналу --link-mbps, процессорное время процесса на запрос (приложение и
+клиент вместе: разница между кодировками — цена сжатия и распаковки) и отдельно время
+одного только сжатия тела. Страницы меньше COMPRESSION_MIN_SIZE отдаются без сжатия.
+
+Вторая таблица — размер и время сжатия страницы наибольшего размера на разных уровнях,
+по ней выбраны COMPRESSION_GZIP_LEVEL и COMPRESSION_BROTLI_QUALITY.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.compression --pages 1 10 100 1000 --requests 200
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import time
+
+from benchmarks.common import make_database, remove_database
+
+GZIP_LEVELS = (1, 5, 6, 9)
+BROTLI_QUALITIES = (1, 4, 6, 11)
+
+
+def compress_time(compress, body: bytes, repeat: int) -> tuple[int, float]:
+    started = time.process_time()
+    for _ in range(repeat):
+        size = len(compress(body))
+    return size, (time.process_time() - started) / repeat * 1000
+
+
+async def measure(client, path: str, encoding: str, requests: int) -> tuple[int, float]:
+    """(байт тела по сети, мс процессорного времени на запрос вместе с распаковкой на клиенте)"""
+    headers = {"Accept-Encoding": encoding}
+    wire = 0
+    started = time.process_time()
+    for _ in range(requests):
+        response = await client.get(path, headers=headers)
+        wire = response.num_bytes_downloaded
+    return wire, (time.process_time() - started) / requests * 1000
+
+
+async def run(args):
+    import httpx
+    from app import compression, config
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    encodings = ["identity"] + list(reversed(compression.supported_encodings()))
+    if compression.brotli is None:
+        print("brotli is not installed: only gzip is measured")
+    print(f"threshold COMPRESSION_MIN_SIZE={config.COMPRESSION_MIN_SIZE}, gzip level {config.COMPRESSION_GZIP_LEVEL}, "
+          f"brotli quality {config.COMPRESSION_BROTLI_QUALITY}, link {args.link_mbps} Mbit/s")
+    print(f"{'page':>6} {'encoding':>9} {'body, B':>9} {'wire, B':>9} {'ratio':>6} {'link, ms':>9} "
+          f"{'CPU/req, ms':>12} {'compress, ms':>13}")
+
+    largest = b""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for page in args.pages:
+            path = f"/users/?limit={page}"
+            body = (await client.get(path, headers={"Accept-Encoding": "identity"})).content
+            largest = max(largest, body, key=len)
+            for encoding in encodings:
+                wire, cpu = await measure(client, path, encoding, args.requests)
+                compressed = encoding != "identity" and len(body) >= config.COMPRESSION_MIN_SIZE
+                if compressed:
+                    _, compress_ms = compress_time(
+                        lambda data: compression.compress_body(encoding, data), body, args.requests)
+                    compress_column = f"{compress_ms:>13.3f}"
+                else:
+                    compress_column = f"{'-':>13}"
+                link_ms = wire * 8 / (args.link_mbps * 1000)
+                print(f"{page:>6} {encoding:>9} {len(body):>9} {wire:>9} {len(body) / wire:>6.1f} {link_ms:>9.1f} "
+                      f"{cpu:>12.3f} {compress_column}")
+
+    print(f"\nlevels for a {len(largest)}-byte page:")
+    print(f"{'codec':>10} {'size, B':>9} {'ratio':>6} {'compress, ms':>13}")
+    for level in GZIP_LEVELS:
+        size, ms = compress_time(lambda data: gzip.compress(data, level, mtime=0), largest, args.requests)
+        print(f"{f'gzip {level}':>10} {size:>9} {len(largest) / size:>6.1f} {ms:>13.3f}")
+    if compression.brotli is not None:
+        for quality in BROTLI_QUALITIES:
+            repeat = max(1, args.requests // 20) if quality > 9 else args.requests
+            size, ms = compress_time(lambda data: compression.brotli.compress(data, quality=quality), largest, repeat)
+            print(f"{f'br {quality}':>10} {size:>9} {len(largest) / size:>6.1f} {ms:>13.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes on the wire and CPU per request of GET /users/ by page size and encoding")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000], help="values of limit")
+    parser.add_argument("--requests", type=int, default=200, help="requests per page size and encoding")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--link-mbps", type=float, default=2.0, help="link speed for the transfer time column")
+    args = parser.parse_args()
+
+    engine, _, path = make_database(max(args.rows, max(args.pages)))
+    engine.dispose()
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    os.environ.setdefault("USER_CACHE_ENABLED", "false")
+    try:
+        asyncio.run(run(args))
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Сравнение синхронного (Session в пуле потоков) и асинхронного (AsyncSession) режимов
+под большим числом одновременных клиентов на локальном SQLite-файле.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.concurrency --clients 500 --requests 20
+
+Каждый режим запускается в отдельном процессе, потому что DB_MODE читается при импорте app.main.
+Требуется httpx (см. benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks.common import make_database, remove_database
+
+MODES = ("sync", "async")
+
+
+def percentile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def drive(clients: int, requests_per_client: int, rows: int) -> dict:
+    import httpx
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    latencies = []
+    errors = 0
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal errors
+        for _ in range(requests_per_client):
+            started = time.perf_counter()
+            response = await client.get(f"/users/{random.randint(1, rows)}")
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def run_child(args):
+    result = asyncio.run(drive(args.clients, args.requests, args.rows))
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sync vs async DB mode under concurrency")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    try:
+        print(f"{'mode':>6} {'req/s':>10} {'p50, ms':>10} {'p99, ms':>10} {'errors':>8}")
+        for mode in MODES:
+            env = dict(os.environ, DB_MODE=mode, DATABASE_URL=f"sqlite:///{path}")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.concurrency", "--child",
+                 "--clients", str(args.clients), "--requests", str(args.requests), "--rows", str(args.rows)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>6} {result['throughput']:>10.0f} {result['p50']:>10.2f} "
+                  f"{result['p99']:>10.2f} {result['errors']:>8}")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Заранее заполненные базы для нагрузочных прогонов: создаются один раз и переиспользуются"""
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import create_engine
+
+from app.migrations import migrate
+from benchmarks.common import make_database
+
+DATASETS = {
+    "10k": 10_000,
+    "100k": 100_000,
+    "1m": 1_000_000,
+}
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def dataset_path(name: str) -> str:
+    return os.path.join(DATA_DIR, f"users_{name}.db")
+
+
+def ensure_dataset(name: str) -> str:
+    """
+    Путь к базе набора name; при первом обращении база создаётся и заполняется,
+    а созданная раньше доводится до текущей версии схемы
+    """
+    if name not in DATASETS:
+        raise ValueError(f"Неизвестный набор данных {name}. Доступные: {', '.join(DATASETS)}")
+    path = dataset_path(name)
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"Seeding dataset {name} ({DATASETS[name]} users) into {path}")
+        engine, _, _ = make_database(DATASETS[name], path)
+    else:
+        engine = create_engine(f"sqlite:///{path}")
+        migrate(engine)
+    engine.dispose()
+    return path
+
+
+def working_copy(name: str) -> str:
+    """Копия набора во временном файле: прогон с записью не портит исходную базу"""
+    fd, path = tempfile.mkstemp(prefix=f"api_edu_{name}_", suffix=".db")
+    os.close(fd)
+    shutil.copyfile(ensure_dataset(name), path)
+    return path
@@ -0,0 +1,131 @@
+"""
+Нагрузочный драйвер: гоняет эндпоинты приложения в процессе через httpx.ASGITransport.
+
+Каждый маршрут нагружается отдельной фазой с заданной конкурентностью, поэтому задержки
+и пропускная способность считаются по маршруту, а не по смеси запросов.
+"""
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+
+@dataclass
+class Scenario:
+    # Шаблон маршрута в виде "METHOD /path/{param}", как в отчёте и в базовых значениях
+    route: str
+    # Функция (номер запроса, число пользователей в наборе) -> (метод, url, json)
+    request: Callable[[int, int], tuple]
+    expected: tuple = (200,)
+    # Доля от --requests для тяжёлых маршрутов (выгрузка всей таблицы и т. п.)
+    share: float = 1.0
+
+
+@dataclass
+class RouteResult:
+    route: str
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return len(self.latencies) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+    def summary(self) -> dict:
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput": round(self.throughput, 1),
+            "p50": round(self.percentile(0.50), 3),
+            "p95": round(self.percentile(0.95), 3),
+            "p99": round(self.percentile(0.99), 3),
+        }
+
+
+def user_payload(n: int) -> dict:
+    return {"name": "Bench User", "email": f"bench.{n}.{random.getrandbits(32)}@example.com", "age": 30}
+
+
+def default_scenarios() -> list:
+    """Сценарии по всем маршрутам app.main. Чтения идут первыми, удаления последними"""
+    delete_ids = itertools.count()
+    return [
+        Scenario("GET /users/{user_id}", lambda n, rows: ("GET", f"/users/{random.randint(1, rows)}", None)),
+        Scenario("GET /users/", lambda n, rows: (
+            "GET", f"/users/?skip={random.randint(0, max(rows - 100, 0))}&limit=100", None)),
+        Scenario("GET /users/?after_id", lambda n, rows: (
+            "GET", f"/users/?after_id={random.randint(0, max(rows - 100, 0))}&limit=100", None)),
+        Scenario("GET /users", lambda n, rows: (
+            "GET", "/users?ids=" + ",".join(str(random.randint(1, rows)) for _ in range(200)), None)),
+        Scenario("GET /users/count", lambda n, rows: ("GET", "/users/count", None)),
+        Scenario("GET /users/stats", lambda n, rows: ("GET", "/users/stats", None)),
+        Scenario("GET /users/changes", lambda n, rows: (
+            "GET", f"/users/changes?since={random.randint(0, rows)}&limit=100", None)),
+        Scenario("GET /users/search", lambda n, rows: (
+            "GET", f"/users/search?q={random.choice(['anna', 'pet', 'smith', 'olga.or', 'walker'])}", None)),
+        Scenario("GET /users/export", lambda n, rows: ("GET", "/users/export?format=ndjson", None), share=0.01),
+        Scenario("GET /cache/stats", lambda n, rows: ("GET", "/cache/stats", None)),
+        Scenario("GET /metrics", lambda n, rows: ("GET", "/metrics", None), share=0.1),
+        Scenario("POST /users/", lambda n, rows: ("POST", "/users/", user_payload(n)), expected=(201,)),
+        Scenario("POST /users/bulk", lambda n, rows: (
+            "POST", "/users/bulk", [user_payload(n * 100 + i) for i in range(100)]), share=0.1),
+        Scenario("PUT /users/{user_id}", lambda n, rows: (
+            "PUT", f"/users/{random.randint(1, rows)}", user_payload(n))),
+        Scenario("DELETE /users/{user_id}", lambda n, rows: (
+            "DELETE", f"/users/{rows - next(delete_ids)}", None)),
+    ]
+
+
+def uncovered_routes(app, scenarios: list) -> list:
+    """Маршруты приложения, для которых нет сценария (новый эндпоинт без нагрузки)"""
+    covered = {scenario.route.split("?")[0] for scenario in scenarios}
+    missing = []
+    for route in app.routes:
+        for method in sorted(getattr(route, "methods", None) or ()):
+            name = f"{method} {route.path}"
+            if method != "HEAD" and name not in covered and route.include_in_schema:
+                missing.append(name)
+    return missing
+
+
+async def run_scenario(client, scenario: Scenario, rows: int, requests: int, concurrency: int) -> RouteResult:
+    result = RouteResult(scenario.route)
+    counter = itertools.count()
+    total = max(1, int(requests * scenario.share))
+
+    async def worker():
+        while (n := next(counter)) < total:
+            method, url, payload = scenario.request(n, rows)
+            started = time.perf_counter()
+            response = await client.request(method, url, json=payload)
+            await response.aread()
+            result.latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code not in scenario.expected:
+                result.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def run_load(app, rows: int, requests: int, concurrency: int,
+                   scenarios: Optional[list] = None, routes: Optional[list] = None) -> list:
+    import httpx
+
+    scenarios = scenarios or default_scenarios()
+    if routes:
+        scenarios = [scenario for scenario in scenarios if scenario.route in routes]
+    transport = httpx.ASGITransport(app=app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in scenarios:
+            results.append(await run_scenario(client, scenario, rows, requests, concurrency))
+    return results
@@ -0,0 +1,117 @@
+"""
+Регистрация пользователей с фильтром Блума по email и без него (POST /users/).
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.email_filter --rows 100000 --signups 2000 --duplicates 0.01
+
+Сначала фильтр строится по всей базе (выводится время построения), затем одинаковые
+порции регистраций идут без фильтра (SELECT по email на каждую) и с ним. Доля --duplicates
+регистраций повторяет существующий email: такие запросы должны получить 400 в обоих режимах.
+Требуется httpx (см. benchmarks/requirements.txt).
+"""
+import argparse
+import logging
+import os
+import random
+import time
+
+from benchmarks.common import make_database, remove_database, seed_row
+
+
+def signup_payloads(prefix: str, count: int, rows: int, duplicates: float) -> list[tuple[dict, int]]:
+    """Тела запросов с ожидаемым кодом ответа: 201 для нового email, 400 для занятого"""
+    payloads = []
+    for i in range(count):
+        if random.random() < duplicates:
+            _, name, email, age = seed_row(random.randint(1, rows))
+            expected = 400
+        else:
+            name, email, age = "Signup User", f"{prefix}.{i}.{random.getrandbits(32)}@example.com", 30
+            expected = 201
+        payloads.append(({"name": name, "email": email, "age": age}, expected))
+    return payloads
+
+
+def run_signups(client, payloads: list[tuple[dict, int]]) -> tuple[float, int]:
+    """Запросов в секунду и число ответов с неожиданным кодом"""
+    errors = 0
+    started = time.perf_counter()
+    for payload, expected in payloads:
+        errors += client.post("/users/", json=payload).status_code != expected
+    return len(payloads) / (time.perf_counter() - started), errors
+
+
+def measure_checks(repository, emails: list[str]) -> float:
+    """Среднее время проверки одного email в микросекундах"""
+    started = time.perf_counter()
+    for email in emails:
+        repository._email_exists(email)
+    return (time.perf_counter() - started) / len(emails) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark signup throughput with and without the email Bloom filter")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--signups", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.01, help="share of signups with a taken email")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["ADMISSION_ENABLED"] = "false"
+    os.environ["EMAIL_FILTER_ENABLED"] = "true"
+    from fastapi import Depends
+    from fastapi.testclient import TestClient
+    from sqlalchemy.orm import Session
+    from app.database import ReadSessionLocal, get_db
+    from app.email_filter import email_filter, warm_email_filter
+    from app.main import app, get_user_repository
+    from app.repositories import UserRepository
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    warm_email_filter(ReadSessionLocal)
+    print(f"filter rebuild: {email_filter.rebuild_seconds * 1000:.0f} ms for {args.rows} emails, "
+          f"{email_filter.stats()['memory_bytes'] / 2 ** 20:.1f} MiB")
+
+    # Стоимость самой проверки уникальности для нового адреса: SELECT по индексу против фильтра
+    with ReadSessionLocal() as db:
+        emails = [f"check.{i}.{random.getrandbits(32)}@example.com" for i in range(args.signups)]
+        plain_check = measure_checks(UserRepository(db), emails)
+        filter_check = measure_checks(UserRepository(db, email_filter), emails)
+    print(f"uniqueness check: SELECT {plain_check:.1f} us, filter {filter_check:.1f} us")
+
+    # Без фильтра: тот же репозиторий писателя, но с SELECT по email на каждую регистрацию
+    def without_filter(db: Session = Depends(get_db)) -> UserRepository:
+        return UserRepository(db)
+
+    client = TestClient(app)
+    failed = False
+    try:
+        print(f"{'round':>5} {'no filter, req/s':>17} {'filter, req/s':>14} {'speedup':>8}")
+        for number in range(args.rounds):
+            app.dependency_overrides[get_user_repository] = without_filter
+            plain, plain_errors = run_signups(
+                client, signup_payloads(f"plain{number}", args.signups, args.rows, args.duplicates)
+            )
+            app.dependency_overrides.clear()
+            filtered, filtered_errors = run_signups(
+                client, signup_payloads(f"bloom{number}", args.signups, args.rows, args.duplicates)
+            )
+            print(f"{number + 1:>5} {plain:>17.0f} {filtered:>14.0f} {filtered / plain:>7.2f}x")
+            failed = failed or plain_errors > 0 or filtered_errors > 0
+        stats = email_filter.stats()
+        print(f"false-positive rate: observed {stats['false_positive_rate']:.4f}, "
+              f"estimated {stats['estimated_false_positive_rate']:.4f}; "
+              f"SELECTs skipped: {stats['absent']} of {stats['absent'] + stats['maybe']} checks")
+        if failed:
+            print("FAILED: unexpected status codes")
+    finally:
+        client.close()
+        remove_database(path)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Проверка ETag при удалении и повторном создании пользователя.
+
+Клиент запоминает ETag последнего пользователя, пользователь удаляется, и создаётся новый.
+Условный GET по старому id с If-None-Match старого ETag не должен давать 304: иначе клиент
+продолжит показывать удалённого пользователя вместо нового. Проверяются две базы: созданная
+миграциями и база со старой таблицей users без AUTOINCREMENT (до миграции 7).
+Каждая — в отдельном процессе, потому что настройки читаются при импорте приложения.
+При ошибке код возврата 1.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.etag_reuse
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import remove_database
+
+# Схема users из первоначальной версии приложения (create_all без AUTOINCREMENT и версии строки)
+LEGACY_USERS_DDL = """
+CREATE TABLE users (id INTEGER NOT NULL, name VARCHAR, email VARCHAR, age INTEGER, PRIMARY KEY (id));
+CREATE INDEX ix_users_id ON users (id);
+CREATE INDEX ix_users_name ON users (name);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+"""
+
+
+def check() -> dict:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        for n in range(3):
+            client.post("/users/", json={"name": "Etag User", "email": f"etag.{n}@example.com", "age": 30})
+        last = max(user["id"] for user in client.get("/users/").json())
+        etag = client.get(f"/users/{last}").headers["etag"]
+        client.delete(f"/users/{last}")
+        created = client.post("/users/", json={"name": "Other User", "email": "other@example.com", "age": 40}).json()
+        conditional = client.get(f"/users/{last}", headers={"If-None-Match": etag})
+    return {"deleted_id": last, "new_id": created["id"], "old_etag": etag, "status": conditional.status_code}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A deleted user's ETag must not match a user created after it")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(check()))
+        return
+
+    failed = False
+    for legacy in (False, True):
+        fd, path = tempfile.mkstemp(prefix="api_edu_etag_", suffix=".db")
+        os.close(fd)
+        try:
+            if legacy:
+                with sqlite3.connect(path) as conn:
+                    conn.executescript(LEGACY_USERS_DDL)
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}", ADMISSION_ENABLED="false")
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.etag_reuse", "--child"],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        finally:
+            remove_database(path)
+        result = json.loads(output.strip().splitlines()[-1])
+        ok = result["new_id"] != result["deleted_id"] and result["status"] != 304
+        failed = failed or not ok
+        print(f"{'legacy users table' if legacy else 'migrated database':>20}: deleted id {result['deleted_id']}, "
+              f"new id {result['new_id']}, GET with old ETag {result['old_etag']} -> {result['status']}"
+              f"  {'OK' if ok else 'FAILED'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
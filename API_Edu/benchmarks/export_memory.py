@@ -0,0 +1,59 @@
+"""
+Проверка, что потоковая выгрузка GET /users/export расходует память независимо от размера таблицы.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.export_memory --rows 100000 1000000
+
+Пиковая память Python (tracemalloc) считается только на время выгрузки, без заполнения базы.
+Завершается с кодом 1, если пик на самой большой таблице больше пика на самой маленькой
+более чем в --tolerance раз.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+
+from app.export import stream_users
+from app.schemas import ExportFormat
+from benchmarks.common import make_database, remove_database
+
+
+def measure_export(rows: int, format: ExportFormat) -> tuple:
+    engine, SessionLocal, path = make_database(rows)
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        size = 0
+        for chunk in stream_users(format, session_factory=SessionLocal):
+            size += len(chunk)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak, size, elapsed
+    finally:
+        engine.dispose()
+        remove_database(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that /users/export memory stays flat")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--format", choices=[f.value for f in ExportFormat], default="ndjson")
+    parser.add_argument("--tolerance", type=float, default=1.5)
+    args = parser.parse_args()
+
+    peaks = []
+    print(f"{'rows':>10} {'output, MB':>12} {'peak, KB':>10} {'time, s':>8}")
+    for rows in sorted(args.rows):
+        peak, size, elapsed = measure_export(rows, ExportFormat(args.format))
+        peaks.append(peak)
+        print(f"{rows:>10} {size / 2**20:>12.1f} {peak / 1024:>10.0f} {elapsed:>8.1f}")
+
+    if peaks[-1] > peaks[0] * args.tolerance:
+        print("FAIL: peak memory grows with table size")
+        sys.exit(1)
+    print("OK: peak memory does not depend on table size")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Пропускная способность записи: commit на каждый запрос против группового коммита (GROUP_COMMIT_ENABLED).
+
+Клиенты одновременно шлют POST /users/ (и долю --updates запросов PUT /users/{id}); каждый режим
+запускается в отдельном процессе, потому что настройки читаются при импорте приложения.
+Для каждого режима выводятся записи в секунду, p50/p99 и средний размер пачки.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.group_commit --clients 64 --requests 50 --synchronous FULL
+
+При SQLITE_SYNCHRONOUS=NORMAL (по умолчанию в WAL) commit не ждёт fsync, и выигрыш меньше,
+чем при FULL, где каждый commit — запись на диск.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.common import make_database, remove_database
+from benchmarks.concurrency import percentile
+
+
+async def drive(clients: int, requests_per_client: int, rows: int, updates: float) -> dict:
+    import httpx
+    from app.group_commit import group_committer
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    latencies = []
+    errors = 0
+
+    async def client_loop(client: httpx.AsyncClient, number: int):
+        nonlocal errors
+        for n in range(requests_per_client):
+            payload = {
+                "name": "Commit User", "email": f"commit.{number}.{n}.{random.getrandbits(32)}@example.com", "age": 30
+            }
+            started = time.perf_counter()
+            if random.random() < updates:
+                response = await client.put(f"/users/{random.randint(1, rows)}", json=payload)
+                expected = 200
+            else:
+                response = await client.post("/users/", json=payload)
+                expected = 201
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code != expected
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, number) for number in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+        "average_batch": group_committer.stats()["average_batch"] if group_committer else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write throughput: per-request commit vs group commit")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--updates", type=float, default=0.2, help="share of PUT requests")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--synchronous", default="FULL", help="SQLITE_SYNCHRONOUS for both runs")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-ops", type=int, default=64)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        result = asyncio.run(drive(args.clients, args.requests, args.rows, args.updates))
+        print(json.dumps(result))
+        return
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    failed = False
+    try:
+        print(f"{'mode':>12} {'writes/s':>9} {'p50, ms':>9} {'p99, ms':>9} {'batch':>6} {'errors':>7}")
+        baseline = None
+        for enabled in ("false", "true"):
+            env = dict(
+                os.environ, DATABASE_URL=f"sqlite:///{path}", GROUP_COMMIT_ENABLED=enabled,
+                GROUP_COMMIT_WINDOW_MS=str(args.window_ms), GROUP_COMMIT_MAX_OPS=str(args.max_ops),
+                SQLITE_SYNCHRONOUS=args.synchronous, ADMISSION_ENABLED="false",
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.group_commit", "--child", "--clients", str(args.clients),
+                 "--requests", str(args.requests), "--updates", str(args.updates), "--rows", str(args.rows)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            baseline = baseline or result["throughput"]
+            mode = "group commit" if enabled == "true" else "per request"
+            print(f"{mode:>12} {result['throughput']:>9.0f} {result['p50']:>9.2f} {result['p99']:>9.2f} "
+                  f"{result['average_batch']:>6.1f} {result['errors']:>7}")
+            failed = failed or result["errors"] > 0
+        print(f"speedup: {result['throughput'] / baseline:.2f}x")
+    finally:
+        remove_database(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Микробенчмарк GET /users/: ORM + UserResponse против быстрого пути (кортежи столбцов + orjson).
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.list_serialization --rows 100000 --limit 1000
+
+Оба пути вызываются через одно и то же приложение, переключается только config.FAST_LIST_RESPONSES.
+Требуется httpx (см. benchmarks/requirements.txt).
+"""
+import argparse
+import logging
+import os
+
+from benchmarks.common import make_database, measure, remove_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ORM vs zero-hydration list responses")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    # Приложение должно подключиться к заполненной базе, поэтому импортируем его после создания файла
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from fastapi.testclient import TestClient
+    from app import config
+    from app.main import app
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    # Без with: startup-обработчики (init_db) не запускаются и данные не трогают
+    client = TestClient(app)
+    try:
+        print(f"{'limit':>6} {'orm, ms':>10} {'fast, ms':>10} {'speedup':>8}")
+        for limit in args.limit:
+            url = f"/users/?after_id=0&limit={limit}"
+            timings = {}
+            for fast in (False, True):
+                config.FAST_LIST_RESPONSES = fast
+                assert client.get(url).status_code == 200
+                timings[fast] = measure(lambda: client.get(url), args.repeat)
+            print(f"{limit:>6} {timings[False]:>10.2f} {timings[True]:>10.2f} "
+                  f"{timings[False] / timings[True]:>7.1f}x")
+    finally:
+        client.close()
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
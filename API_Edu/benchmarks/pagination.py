@@ -0,0 +1,41 @@
+"""
+Сравнение OFFSET- и keyset-пагинации на глубоких страницах.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.pagination --rows 1000000
+"""
+import argparse
+
+from app.repositories import UserRepository
+from benchmarks.common import make_database, measure, remove_database
+
+DEPTHS = (1, 10, 100, 1000, 5000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offset vs keyset pagination")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, SessionLocal, path = make_database(args.rows)
+    try:
+        db = SessionLocal()
+        repository = UserRepository(db)
+        print(f"{'page':>8} {'offset, ms':>12} {'keyset, ms':>12}")
+        for page in DEPTHS:
+            position = (page - 1) * args.page_size
+            if position >= args.rows:
+                break
+            offset_ms = measure(lambda: repository.get_all_users(position, args.page_size), args.repeat)
+            keyset_ms = measure(lambda: repository.get_users_after(position, args.page_size), args.repeat)
+            print(f"{page:>8} {offset_ms:>12.2f} {keyset_ms:>12.2f}")
+        db.close()
+    finally:
+        engine.dispose()
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Смешанная нагрузка чтение/запись: задержка чтений, пока параллельно идут commit.
+
+Сравниваются две схемы на одном SQLite-файле:
+- single: один движок без PRAGMA (журнал DELETE), чтения и запись через общий пул;
+- split: писатель с WAL и одним соединением + пул читателей с PRAGMA из app.database.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.read_write --rows 100000 --readers 4 --writers 1 --batch 500 --seconds 10
+
+--batch задаёт число пользователей в одной транзакции записи (через create_users_bulk):
+чем длиннее commit, тем заметнее, как читатели в режиме single ждут блокировку базы.
+Писатели работают в отдельных процессах, чтобы задержку чтений не искажал GIL.
+"""
+import argparse
+import multiprocessing
+import random
+import statistics
+import threading
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import set_sqlite_pragmas, READ_PRAGMAS, WRITE_PRAGMAS
+from app.repositories import UserRepository
+from app.schemas import UserCreate
+from benchmarks.common import make_database, remove_database
+
+
+def build_sessions(path: str, split: bool):
+    url = f"sqlite:///{path}"
+    connect_args = {"check_same_thread": False}
+    if not split:
+        engine = create_engine(url, connect_args=connect_args, pool_size=20, max_overflow=-1)
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=DELETE")
+        factory = sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
+        return factory, factory, [engine]
+
+    write_engine = create_engine(url, connect_args=connect_args, pool_size=1, max_overflow=0)
+    set_sqlite_pragmas(write_engine, WRITE_PRAGMAS)
+    read_engine = create_engine(url, connect_args=connect_args, pool_size=20, max_overflow=-1)
+    set_sqlite_pragmas(read_engine, READ_PRAGMAS)
+    return (
+        sessionmaker(autoflush=False, bind=read_engine),
+        sessionmaker(autoflush=False, expire_on_commit=False, bind=write_engine),
+        [write_engine, read_engine],
+    )
+
+
+def writer_process(path: str, split: bool, number: int, batch: int, stop, written, failed):
+    _, WriteSession, engines = build_sessions(path, split)
+    sequence = 0
+    while not stop.is_set():
+        sequence += 1
+        users = [
+            UserCreate(
+                name="Bench Writer",
+                email=f"writer{number}.{sequence}.{item}.{'split' if split else 'single'}@example.com",
+                age=30,
+            )
+            for item in range(batch)
+        ]
+        db = WriteSession()
+        try:
+            if batch == 1:
+                UserRepository(db).create_user(users[0])
+            else:
+                UserRepository(db).create_users_bulk(users)
+            with written.get_lock():
+                written.value += batch
+        except Exception:
+            with failed.get_lock():
+                failed.value += 1
+        finally:
+            db.close()
+    for engine in engines:
+        engine.dispose()
+
+
+def run(path: str, rows: int, split: bool, readers: int, writers: int, batch: int, seconds: float) -> dict:
+    ReadSession, _, engines = build_sessions(path, split)
+    stop = threading.Event()
+    read_latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def reader():
+        samples = []
+        while not stop.is_set():
+            db = ReadSession()
+            started = time.perf_counter()
+            try:
+                UserRepository(db).get_user(random.randint(1, rows))
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            finally:
+                db.close()
+            samples.append((time.perf_counter() - started) * 1000)
+        with lock:
+            read_latencies.extend(samples)
+
+    process_stop = multiprocessing.Event()
+    written = multiprocessing.Value("l", 0)
+    failed = multiprocessing.Value("l", 0)
+    processes = [
+        multiprocessing.Process(
+            target=writer_process, args=(path, split, number, batch, process_stop, written, failed)
+        )
+        for number in range(writers)
+    ]
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for worker in processes + threads:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    process_stop.set()
+    for worker in processes + threads:
+        worker.join()
+    for engine in engines:
+        engine.dispose()
+
+    ordered = sorted(read_latencies)
+    return {
+        "reads": len(ordered) / seconds,
+        "writes": written.value / seconds,
+        "p50": statistics.median(ordered),
+        "p99": ordered[int(len(ordered) * 0.99)],
+        "max": ordered[-1],
+        "errors": errors[0] + failed.value,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write benchmark: single engine vs WAL reader pool")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--writers", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=500, help="users per write transaction")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    try:
+        print(f"{'mode':>7} {'reads/s':>9} {'rows/s':>9} {'read p50':>9} {'read p99':>9} {'read max':>9} {'errors':>7}")
+        for split in (False, True):
+            result = run(path, args.rows, split, args.readers, args.writers, args.batch, args.seconds)
+            print(f"{'split' if split else 'single':>7} {result['reads']:>9.0f} {result['writes']:>9.0f} "
+                  f"{result['p50']:>9.2f} {result['p99']:>9.2f} {result['max']:>9.2f} {result['errors']:>7}")
+    finally:
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
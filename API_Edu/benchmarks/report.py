@@ -0,0 +1,51 @@
+"""Отчёт по маршрутам и сравнение с сохранёнными базовыми значениями"""
+import json
+import os
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+
+def baseline_path(dataset: str) -> str:
+    return os.path.join(BASELINE_DIR, f"{dataset}.json")
+
+
+def format_table(summaries: dict) -> str:
+    lines = [f"{'route':<28} {'req':>6} {'err':>5} {'req/s':>9} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}"]
+    for route, s in summaries.items():
+        lines.append(
+            f"{route:<28} {s['requests']:>6} {s['errors']:>5} {s['throughput']:>9.1f} "
+            f"{s['p50']:>9.2f} {s['p95']:>9.2f} {s['p99']:>9.2f}"
+        )
+    return "\n".join(lines)
+
+
+def save_baseline(dataset: str, run: dict) -> str:
+    os.makedirs(BASELINE_DIR, exist_ok=True)
+    path = baseline_path(dataset)
+    with open(path, "w") as f:
+        json.dump(run, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_baseline(dataset: str) -> dict:
+    with open(baseline_path(dataset)) as f:
+        return json.load(f)
+
+
+def find_regressions(baseline: dict, summaries: dict, threshold: float) -> list:
+    """
+    Маршруты, где p95 вырос или пропускная способность упала больше чем на threshold (доля),
+    а также маршруты с ошибками, которых не было в базовом прогоне
+    """
+    regressions = []
+    for route, base in baseline["routes"].items():
+        current = summaries.get(route)
+        if current is None:
+            continue
+        if current["p95"] > base["p95"] * (1 + threshold):
+            regressions.append(f"{route}: p95 {base['p95']:.2f} -> {current['p95']:.2f} ms")
+        if current["throughput"] < base["throughput"] * (1 - threshold):
+            regressions.append(f"{route}: throughput {base['throughput']:.1f} -> {current['throughput']:.1f} req/s")
+        if current["errors"] > base["errors"]:
+            regressions.append(f"{route}: errors {base['errors']} -> {current['errors']}")
+    return regressions
@@ -0,0 +1,135 @@
+"""
+Масштабирование по процессам: пропускная способность run.py --workers N для N = 1..--max-workers.
+
+Сервер запускается как в эксплуатации (python run.py --workers N) на заполненной базе,
+клиенты в отдельных процессах шлют по HTTP смесь чтений и записей. Для каждого N выводятся
+запросы в секунду, p99 и число ошибок; ошибка записи от SQLite ("database is locked")
+пришла бы как 500, поэтому при любой ошибке код возврата 1.
+
+Запуск из каталога API_Edu (нужны gunicorn и httpx):
+    python -m benchmarks.scaling --max-workers 4 --duration 10 --writes 0.1
+
+Ускорение ограничено числом ядер машины: клиенты занимают часть из них.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.common import make_database, remove_database
+from benchmarks.concurrency import percentile
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def wait_for_port(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+
+async def client_process_main(port: int, concurrency: int, duration: float, rows: int, writes: float, number: int):
+    import httpx
+
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def loop(client, worker: int):
+        nonlocal errors
+        n = 0
+        while time.monotonic() < deadline:
+            n += 1
+            started = time.perf_counter()
+            if random.random() < writes:
+                response = await client.put(f"/users/{random.randint(1, rows)}", json={
+                    "name": "Scale User", "email": f"scale.{number}.{worker}.{n}.{random.getrandbits(32)}@example.com",
+                    "age": 30,
+                })
+            else:
+                response = await client.get(f"/users/{random.randint(1, rows)}")
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        await asyncio.gather(*(loop(client, worker) for worker in range(concurrency)))
+    return latencies, errors
+
+
+def client_process(args: tuple):
+    return asyncio.run(client_process_main(*args))
+
+
+def measure_workers(path: str, workers: int, args) -> dict:
+    port = args.port + workers
+    env = dict(
+        os.environ, DATABASE_URL=f"sqlite:///{path}", WEB_WORKERS=str(workers), WEB_PORT=str(port),
+        WEB_HOST="127.0.0.1", ADMISSION_ENABLED="false",
+        # Кэш в памяти с несколькими воркерами run.py не допускает; все варианты сравниваются без кэша
+        USER_CACHE_ENABLED=os.environ.get("USER_CACHE_ENABLED", "false"), DB_MODE="sync",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "run.py"], cwd=API_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+        time.sleep(1)
+        per_process = max(1, args.concurrency // args.client_processes)
+        jobs = [(port, per_process, args.duration, args.rows, args.writes, number)
+                for number in range(args.client_processes)]
+        with multiprocessing.Pool(args.client_processes) as pool:
+            results = pool.map(client_process, jobs)
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    latencies = [latency for samples, _ in results for latency in samples]
+    return {
+        "throughput": len(latencies) / args.duration,
+        "p99": percentile(latencies, 0.99) if latencies else 0.0,
+        "errors": sum(errors for _, errors in results),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput scaling of run.py --workers N")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--writes", type=float, default=0.1, help="share of PUT requests")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--port", type=int, default=18000)
+    args = parser.parse_args()
+
+    engine, _, path = make_database(args.rows)
+    engine.dispose()
+    counts = sorted({1, *(n for n in (2, 4, 8, 16, 32) if n <= args.max_workers), args.max_workers})
+    failed = False
+    try:
+        print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p99, ms':>9} {'errors':>7}")
+        single = None
+        for workers in counts:
+            result = measure_workers(path, workers, args)
+            single = single or result["throughput"]
+            print(f"{workers:>7} {result['throughput']:>9.0f} {result['throughput'] / single:>7.2f}x "
+                  f"{result['p99']:>9.2f} {result['errors']:>7}")
+            failed = failed or result["errors"] > 0
+    finally:
+        remove_database(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
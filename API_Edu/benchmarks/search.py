@@ -0,0 +1,52 @@
+"""
+Поиск пользователей: FTS5 (GET /users/search) против сканирования LIKE '%x%'.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.search --rows 1000000
+"""
+import argparse
+
+from sqlalchemy import or_
+
+from app.models import UserDB
+from app.repositories import UserRepository
+from benchmarks.common import make_database, measure, remove_database
+
+# Частые слова (LIKE с LIMIT быстро набирает 20 строк, FTS ранжирует все совпадения),
+# редкие префиксы и отсутствующие значения (LIKE вынужден просмотреть всю таблицу)
+QUERIES = ("ol", "smith", "nikolay orlov", "kira.pav", "john.doe1234", "walker9999", "zzz")
+
+
+def like_search(db, query: str, limit: int):
+    return (
+        db.query(UserDB)
+        .filter(or_(UserDB.name.ilike(f"%{query}%"), UserDB.email.ilike(f"%{query}%")))
+        .limit(limit)
+        .all()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FTS5 search vs LIKE scan")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine, SessionLocal, path = make_database(args.rows)
+    try:
+        db = SessionLocal()
+        repository = UserRepository(db)
+        print(f"{'query':>16} {'fts, ms':>10} {'like, ms':>10}")
+        for query in QUERIES:
+            fts_ms = measure(lambda: repository.search_users(query, args.limit), args.repeat)
+            like_ms = measure(lambda: like_search(db, query, args.limit), args.repeat)
+            print(f"{query:>16} {fts_ms:>10.2f} {like_ms:>10.2f}")
+        db.close()
+    finally:
+        engine.dispose()
+        remove_database(path)
+
+
+if __name__ == "__main__":
+    main()
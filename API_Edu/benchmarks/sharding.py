@@ -0,0 +1,108 @@
+"""
+Пропускная способность записи при шардировании (DB_SHARDS): одна база против 1, 4 и 8 шардов.
+
+Клиенты одновременно шлют POST /users/; каждый вариант запускается в отдельном процессе
+на пустых файлах во временном каталоге (настройки читаются при импорте приложения).
+Вариант 0 — обычная база DATABASE_URL без шардов. Для каждого выводятся записи в секунду,
+p50/p99 и распределение пользователей по шардам.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.sharding --shards 0 1 4 8 --clients 64 --requests 30
+
+Каждая запись с шардами — два commit (справочник email и шард), поэтому на одном ядре
+и при быстром диске шарды выигрывают только там, где узкое место — ожидание fsync писателя.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.concurrency import percentile
+
+
+async def drive(clients: int, requests_per_client: int) -> dict:
+    import httpx
+    from app.main import app, on_startup
+    from app.sharding import sharded_store
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    on_startup()
+    latencies = []
+    errors = 0
+
+    async def client_loop(client: httpx.AsyncClient, number: int):
+        nonlocal errors
+        for n in range(requests_per_client):
+            started = time.perf_counter()
+            response = await client.post("/users/", json={
+                "name": "Shard User", "email": f"shard.{number}.{n}.{random.getrandbits(32)}@example.com", "age": 30
+            })
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code != 201
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, number) for number in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    distribution = []
+    if sharded_store is not None:
+        from app.repositories import UserRepository
+        for shard in sharded_store.shards:
+            with shard.ReadSessionLocal() as db:
+                distribution.append(UserRepository(db).count_users())
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+        "distribution": distribution,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write throughput with 0 (no sharding), 1, 4 and 8 shards")
+    parser.add_argument("--shards", type=int, nargs="+", default=[0, 1, 4, 8])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=30, help="requests per client")
+    parser.add_argument("--synchronous", default="FULL", help="SQLITE_SYNCHRONOUS for all runs")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(drive(args.clients, args.requests))))
+        return
+
+    failed = False
+    print(f"{'shards':>6} {'writes/s':>9} {'p50, ms':>9} {'p99, ms':>9} {'errors':>7}  per shard")
+    for shards in args.shards:
+        directory = tempfile.mkdtemp(prefix="api_edu_shards_")
+        try:
+            env = dict(
+                os.environ, DATABASE_URL=f"sqlite:///{directory}/users.db", DB_SHARDS=str(shards),
+                SQLITE_SYNCHRONOUS=args.synchronous, ADMISSION_ENABLED="false", GROUP_COMMIT_ENABLED="false",
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.sharding", "--child",
+                 "--clients", str(args.clients), "--requests", str(args.requests)],
+                env=env, capture_output=True, text=True, check=True,
+            ).stdout
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{shards or 'off':>6} {result['throughput']:>9.0f} {result['p50']:>9.2f} {result['p99']:>9.2f} "
+              f"{result['errors']:>7}  {' '.join(map(str, result['distribution']))}")
+        failed = failed or result["errors"] > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
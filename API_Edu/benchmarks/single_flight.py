@@ -0,0 +1,147 @@
+"""
+Нагрузка «толпой» на одного пользователя: проверяет, что одновременные промахи GET /users/{id}
+по одному ключу выполняют ровно один SQL-запрос (app.singleflight).
+
+SQL-запросы искусственно замедляются на --query-ms, чтобы все запросы толпы успели
+прийти, пока первый ещё выполняется, как при сбросе кэша популярной записи.
+Проверяются синхронный (потоки) и асинхронный варианты, общее исключение для
+несуществующего пользователя и тайм-аут ожидающих. Код возврата 1 при нарушении.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.single_flight --herd 200 --keys 5
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.exceptions import LookupTimeoutException, UserNotFoundException
+from app.repositories import UserRepository, AsyncUserRepository
+from app.services import UserService, AsyncUserService
+from app.singleflight import SingleFlight, AsyncSingleFlight
+from benchmarks.common import make_database, remove_database
+
+
+class StatementCounter:
+    """Считает SELECT по users и замедляет каждый на delay секунд"""
+
+    def __init__(self, engine, delay: float):
+        self.count = 0
+        self.delay = delay
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._before)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT"):
+            with self._lock:
+                self.count += 1
+            time.sleep(self.delay)
+
+
+def outcome(call) -> str:
+    try:
+        call()
+        return "ok"
+    except UserNotFoundException:
+        return "not_found"
+    except LookupTimeoutException:
+        return "timeout"
+
+
+def run_threads(session_factory, counter, lookups, user_ids: list, herd: int) -> tuple:
+    barrier = threading.Barrier(herd * len(user_ids))
+
+    def request(user_id):
+        db = session_factory()
+        try:
+            barrier.wait()
+            return outcome(lambda: UserService(UserRepository(db), lookups).get_user(user_id))
+        finally:
+            db.close()
+
+    counter.count = 0
+    with ThreadPoolExecutor(max_workers=herd * len(user_ids)) as pool:
+        results = list(pool.map(request, [user_id for user_id in user_ids for _ in range(herd)]))
+    return counter.count, results
+
+
+async def run_tasks(session_factory, counter, lookups, user_ids: list, herd: int) -> tuple:
+    async def request(user_id):
+        async with session_factory() as db:
+            service = AsyncUserService(AsyncUserRepository(db), lookups)
+            try:
+                await service.get_user(user_id)
+                return "ok"
+            except UserNotFoundException:
+                return "not_found"
+            except LookupTimeoutException:
+                return "timeout"
+
+    counter.count = 0
+    results = await asyncio.gather(*(request(user_id) for user_id in user_ids for _ in range(herd)))
+    return counter.count, list(results)
+
+
+def check(name: str, queries: int, expected_queries: int, results: list, expected: dict) -> bool:
+    counts = {status: results.count(status) for status in set(results)}
+    ok = queries == expected_queries and counts == expected
+    print(f"{'OK ' if ok else 'FAIL'} {name:<42} queries {queries:>4} (expected {expected_queries}), results {counts}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--herd", type=int, default=200, help="concurrent requests per key")
+    parser.add_argument("--keys", type=int, default=5)
+    parser.add_argument("--query-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    engine, session_factory, path = make_database(1000)
+    delay = args.query_ms / 1000
+    sync_counter = StatementCounter(engine, delay)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async_counter = StatementCounter(async_engine.sync_engine, delay)
+    async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    user_ids = list(range(1, args.keys + 1))
+    total = args.herd * args.keys
+    # Ожидающим хватает времени на один запрос, но не на очередь из запросов
+    timeout = delay * 20
+    passed = []
+
+    try:
+        queries, results = run_threads(session_factory, sync_counter, None, user_ids, args.herd)
+        print(f"     {'threads, no coalescing':<42} queries {queries:>4}, results {results.count('ok')} ok")
+        queries, results = run_threads(session_factory, sync_counter, SingleFlight(timeout), user_ids, args.herd)
+        passed.append(check("threads, single-flight", queries, args.keys, results, {"ok": total}))
+        queries, results = run_threads(session_factory, sync_counter, SingleFlight(timeout), [10**9], args.herd)
+        passed.append(check("threads, missing user shares the error", queries, 1, results, {"not_found": args.herd}))
+        queries, results = run_threads(session_factory, sync_counter, SingleFlight(delay / 5), [1], args.herd)
+        passed.append(check("threads, waiters time out", queries, 1, results, {"ok": 1, "timeout": args.herd - 1}))
+
+        async def run_async():
+            queries, results = await run_tasks(async_session_factory, async_counter, None, user_ids, args.herd)
+            print(f"     {'asyncio, no coalescing':<42} queries {queries:>4}, results {results.count('ok')} ok")
+            queries, results = await run_tasks(
+                async_session_factory, async_counter, AsyncSingleFlight(timeout), user_ids, args.herd
+            )
+            passed.append(check("asyncio, single-flight", queries, args.keys, results, {"ok": total}))
+            queries, results = await run_tasks(
+                async_session_factory, async_counter, AsyncSingleFlight(timeout), [10**9], args.herd
+            )
+            passed.append(check("asyncio, missing user shares the error", queries, 1, results, {"not_found": args.herd}))
+            await async_engine.dispose()
+
+        asyncio.run(run_async())
+    finally:
+        engine.dispose()
+        remove_database(path)
+
+    raise SystemExit(0 if all(passed) else 1)
+
+
+if __name__ == "__main__":
+    main()
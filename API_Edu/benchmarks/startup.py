@@ -0,0 +1,79 @@
+"""
+Время старта приложения на заполненной базе (по умолчанию 1M пользователей).
+
+Каждый старт выполняется в отдельном процессе, как перезапуск сервиса: первый доводит схему
+набора данных до текущей версии, последующие должны только сверить версию.
+Завершается с кодом 1, если повторный старт дольше --max-ms или потерял данные.
+
+Запуск из каталога API_Edu:
+    python -m benchmarks.startup --dataset 1m --restarts 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import remove_database
+from benchmarks.datasets import DATASETS, working_copy
+
+
+def child():
+    # Настройки читаются при импорте app, поэтому DATABASE_URL уже задан родителем
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+    from app.database import engine, init_db
+    from app.main import app
+
+    started = time.perf_counter()
+    init_db()
+    init_ms = (time.perf_counter() - started) * 1000
+    with TestClient(app) as client:
+        status_code = client.get("/users/1").status_code
+    with engine.connect() as conn:
+        users = conn.execute(text("SELECT COUNT(*) FROM users")).scalar()
+    print(json.dumps({"init_ms": init_ms, "users": users, "status": status_code}))
+
+
+def restart(path: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child"],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dataset", choices=list(DATASETS), default="1m")
+    parser.add_argument("--restarts", type=int, default=3)
+    parser.add_argument("--max-ms", type=float, default=100.0, help="allowed schema check time on restart")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    path = working_copy(args.dataset)
+    failed = False
+    try:
+        for number in range(args.restarts + 1):
+            result = restart(path)
+            label = "first start" if number == 0 else f"restart {number}"
+            print(f"{label:<12} init_db {result['init_ms']:9.2f} ms, users {result['users']}")
+            if result["users"] != DATASETS[args.dataset] or result["status"] != 200:
+                print("FAIL: data lost or unreadable after startup")
+                failed = True
+            if number > 0 and result["init_ms"] > args.max_ms:
+                print(f"FAIL: restart took longer than {args.max_ms} ms")
+                failed = True
+    finally:
+        remove_database(path)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
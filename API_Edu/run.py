@@ -1,5 +1,107 @@
+"""
+Запуск API.
+
+    python run.py                 — один процесс uvicorn (разработка)
+    python run.py --workers 4     — несколько процессов: gunicorn с воркерами uvicorn
+
+В режиме нескольких процессов приложение загружается один раз в главном процессе (preload),
+миграции применяются до fork, а воркеры перезапускаются по очереди после --max-requests
+запросов, успевая завершить текущие запросы за --graceful-timeout секунд.
+"""
+import argparse
+
 import uvicorn
-from app.main import app
+
+from app import config
+
+
+def build_options(args) -> dict:
+    return {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests_jitter,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": args.graceful_timeout * 2,
+        "post_fork": post_fork,
+    }
+
+
+def worker_config_errors() -> list:
+    """Настройки, с которыми несколько процессов отдавали бы устаревшие данные или ловили database is locked"""
+    errors = []
+    if config.USER_CACHE_ENABLED and config.USER_CACHE_BACKEND == "memory":
+        # Кэш в памяти у каждого воркера свой: после PUT/DELETE в одном воркере другие отдавали бы
+        # старого пользователя и его ETag до USER_CACHE_TTL
+        errors.append("кэш пользователей в памяти не общий для воркеров: "
+                      "задайте USER_CACHE_BACKEND=redis или USER_CACHE_ENABLED=false")
+    if config.DB_MODE == "async":
+        # Единственный писатель (файловая блокировка и BEGIN IMMEDIATE) есть только у синхронного движка
+        errors.append("DB_MODE=async не согласует запись между процессами: используйте DB_MODE=sync")
+    return errors
+
+
+def post_fork(server, worker):
+    # Пулы соединений, созданные в главном процессе, не должны переходить в воркер:
+    # сокеты и файловые дескрипторы SQLite нельзя делить между процессами
+    from app.database import engine, read_engine
+    from app.sharding import sharded_store
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
+    if sharded_store is not None:
+        for database in [*sharded_store.shards, sharded_store.directory]:
+            database.engine.dispose(close=False)
+            database.read_engine.dispose(close=False)
+
+
+def serve_workers(args):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise RuntimeError("Для --workers больше 1 установите gunicorn (Linux/macOS)")
+
+    from app.database import init_db
+    from app.main import app
+
+    class Server(BaseApplication):
+        def __init__(self, application, options: dict):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    # Миграции один раз до fork: воркерам при старте остаётся только сверить версию
+    init_db()
+    Server(app, build_options(args)).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the User Management API")
+    parser.add_argument("--host", default=config.WEB_HOST)
+    parser.add_argument("--port", type=int, default=config.WEB_PORT)
+    parser.add_argument("--workers", type=int, default=config.WEB_WORKERS)
+    parser.add_argument("--max-requests", type=int, default=config.WEB_MAX_REQUESTS)
+    parser.add_argument("--max-requests-jitter", type=int, default=config.WEB_MAX_REQUESTS_JITTER)
+    parser.add_argument("--graceful-timeout", type=int, default=config.WEB_GRACEFUL_TIMEOUT)
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        errors = worker_config_errors()
+        if errors:
+            parser.error(f"--workers {args.workers}: " + "; ".join(errors))
+        serve_workers(args)
+    else:
+        from app.main import app
+        uvicorn.run(app, host=args.host, port=args.port)
+
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    main()
@@ -3,9 +3,13 @@ import logging
 from abc import ABC, abstractmethod
 from datetime import datetime
 
+from db_connector import DatabaseConnector
+
 class BaseReport(ABC):
     def __init__(self):
         self.report_type = self.__class__.__name__.replace('Report', '').lower()
+        # Общие подключения {префикс: подключение}, если отчет запущен вместе с другими (main.py --run-many)
+        self.connectors = None
         
     @abstractmethod
     def generate(self, report_date: datetime) -> tuple:
@@ -13,4 +17,10 @@ class BaseReport(ABC):
         pass
     
     def get_report_type(self) -> str:
-        return self.report_type
\ No newline at end of file
+        return self.report_type
+    
+    def get_connector(self, prefix: str) -> DatabaseConnector:
+        """Общее подключение к базе prefix, если оно передано, иначе новое"""
+        if self.connectors and prefix in self.connectors:
+            return self.connectors[prefix]
+        return DatabaseConnector(prefix)
\ No newline at end of file
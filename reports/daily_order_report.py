@@ -1,6 +1,5 @@
 import os
 from datetime import datetime, timedelta
-from db_connector import DatabaseConnector
 import csv
 from base_report import BaseReport
 
@@ -31,9 +30,9 @@ class DailyOrderReport(BaseReport):
         os.makedirs('reports', exist_ok=True)
         
         # Подключение к базам данных
-        db_connector = DatabaseConnector("ORDER")
-        payset_connector = DatabaseConnector("PAYSET")
-        delivery_connector = DatabaseConnector("DEL_ATOM")
+        db_connector = self.get_connector("ORDER")
+        payset_connector = self.get_connector("PAYSET")
+        delivery_connector = self.get_connector("DEL_ATOM")
         
         # Загрузка условий оплаты и доставки
         self.load_conditions(payset_connector, delivery_connector)
@@ -1,5 +1,7 @@
 import os
+import threading
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
 from typing import Dict, List, Tuple
 
 class DatabaseConnector:
@@ -77,4 +79,85 @@ class DatabaseConnector:
 
     def close(self):
         if self.connection:
-            self.connection.close()
\ No newline at end of file
+            self.connection.close()
+
+
+class SharedDatabaseConnector(DatabaseConnector):
+    """
+    Подключение к одной базе, общее для нескольких отчетов, которые выполняются одновременно.
+    Каждый запрос берет соединение из пула (не больше max_connections) и сразу возвращает его,
+    поэтому отчеты не ждут друг друга, а соединения не открываются заново для каждого отчета.
+    Справочники оплаты и доставки загружаются один раз на весь запуск.
+    """
+
+    def __init__(self, prefix: str, max_connections: int):
+        super().__init__(prefix)
+        self.max_connections = max_connections
+        self.pool = None
+        self._lock = threading.Lock()
+        self._types_lock = threading.Lock()
+        self._payment_types = None
+        self._delivery_types = None
+
+    def connect(self):
+        """Создает пул соединений (один раз на все отчеты)"""
+        with self._lock:
+            if self.pool is None:
+                try:
+                    self.pool = ThreadedConnectionPool(1, self.max_connections, **self.db_config)
+                except psycopg2.Error as e:
+                    raise Exception(f"Ошибка подключения к БД {self.prefix}: {str(e)}")
+        return True
+
+    def execute_query(self, query: str, params: Tuple = None) -> List[Tuple]:
+        """Выполняет SQL-запрос на свободном соединении пула и возвращает результаты"""
+        if self.pool is None:
+            self.connect()
+
+        connection = self.pool.getconn()
+        broken = False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                results = cursor.fetchall()
+            # Завершаем транзакцию, чтобы следующий отчет получил соединение в чистом состоянии
+            connection.rollback()
+            return results
+        except psycopg2.Error as e:
+            # Соединение после ошибки не возвращаем в пул: следующему отчету достанется новое
+            broken = True
+            raise Exception(f"Ошибка выполнения запроса: {str(e)}")
+        finally:
+            self.pool.putconn(connection, close=broken)
+
+    def load_payment_types(self) -> Dict[str, str]:
+        with self._types_lock:
+            if self._payment_types is None:
+                self._payment_types = super().load_payment_types()
+            return self._payment_types
+
+    def load_delivery_types(self) -> Dict[str, str]:
+        with self._types_lock:
+            if self._delivery_types is None:
+                self._delivery_types = super().load_delivery_types()
+            return self._delivery_types
+
+    def close(self):
+        # Отчеты закрывают свои подключения сами; общий пул закрывается в close_all
+        pass
+
+    def close_all(self):
+        with self._lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
+
+
+def open_shared_connectors(prefixes: List[str], max_connections: int) -> Dict[str, SharedDatabaseConnector]:
+    """Общие подключения для запуска нескольких отчетов (соединения открываются при первом запросе)"""
+    return {prefix: SharedDatabaseConnector(prefix, max_connections) for prefix in prefixes}
+
+
+def close_shared_connectors(connectors: Dict[str, SharedDatabaseConnector]):
+    for connector in connectors.values():
+        connector.close_all()
\ No newline at end of file
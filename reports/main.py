@@ -6,6 +6,8 @@ import re
 import sys
 import argparse
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from db_connector import open_shared_connectors, close_shared_connectors
 from report_factory import ReportFactory
 
 
@@ -38,6 +40,124 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Базы, подключения к которым общие для всех отчетов в режиме --run-many
+SHARED_DATABASES = ['ORDER', 'PAYSET', 'DEL_ATOM']
+
+
+# Повторные попытки отчета: сколько всего и пауза между ними (5 минут)
+MAX_RETRIES = 3
+RETRY_DELAY = 5 * 60
+
+
+def attempt_report(factory, report_type, report_date=None, connectors=None, attempt=1, max_retries=MAX_RETRIES):
+    """Одна попытка сгенерировать и отправить отчет. Возвращает True при успехе"""
+    try:
+        # Определяем дату отчета (вчера)
+        if report_date is None:
+            report_date = datetime.now() - timedelta(days=1)
+        logging.info(f"Начало генерации отчета {report_type} за {report_date.strftime('%Y-%m-%d')}")
+        
+        # Создаем и генерируем отчет
+        report = factory.get_report(report_type, connectors)
+        filename, has_data = report.generate(report_date)
+        logging.info(f"Отчет {report_type} сгенерирован: файл={filename}, есть_данные={has_data}")
+        
+        # Отправляем email с отчетом
+        logging.info(f"Отправка email по отчету {report_type}. Данные: {has_data}")
+        email_sent = send_email(has_data, filename, report_date)
+        
+        if email_sent:
+            logging.info(f"Email по отчету {report_type} успешно отправлен")
+        else:
+            logging.warning(f"Не удалось отправить email по отчету {report_type}")
+        
+        # Удаляем файл, если он создавался и мы его отправили
+        if has_data and os.path.exists(filename):  # Убрано f"reports/{filename}"
+            os.remove(filename)
+            logging.info(f"Файл {filename} удален")
+        
+        logging.info(f"Отчет {report_type} успешно сгенерирован и отправлен")
+        return True
+        
+    except Exception as e:
+        logging.error(f"Ошибка при выполнении отчета {report_type} (попытка {attempt}/{max_retries}): {str(e)}", exc_info=True)
+        if attempt >= max_retries:
+            logging.critical(f"Достигнуто максимальное количество попыток для отчета {report_type}.")
+        return False
+
+
+def run_report(factory, report_type, report_date=None, connectors=None, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
+    """Генерирует и отправляет один отчет с повторными попытками. Возвращает True при успехе"""
+    for attempt in range(1, max_retries + 1):
+        if attempt_report(factory, report_type, report_date, connectors, attempt, max_retries):
+            return True
+        if attempt < max_retries:
+            # Ждем перед повторной попыткой (по умолчанию 5 минут)
+            logging.info(f"Ожидание {retry_delay} секунд перед повторной попыткой отчета {report_type}")
+            time.sleep(retry_delay)
+    return False
+
+
+def run_many(factory, report_types, workers, max_retries=MAX_RETRIES, retry_delay=RETRY_DELAY):
+    """
+    Выполняет несколько отчетов одновременно, не больше workers сразу, с общими подключениями к базам.
+    Ошибка или повторные попытки одного отчета не влияют на остальные: поток пула выполняет только
+    одну попытку, а паузу перед повтором отчет ждет в очереди отложенных, не занимая места в пуле.
+    Возвращает True, если все отчеты сгенерированы и отправлены
+    """
+    # Дата одна на весь запуск, даже если отчет закончится после полуночи
+    report_date = datetime.now() - timedelta(days=1)
+    connectors = open_shared_connectors(SHARED_DATABASES, workers)
+    results = {}
+    started = time.monotonic()
+    report_started = {}
+    logging.info(f"Запуск отчетов {report_types} в {workers} потоках")
+    
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='report') as executor:
+            running = {}
+            # Отложенные повторы: (время запуска, тип отчета, номер попытки)
+            delayed = [(started, report_type, 1) for report_type in report_types]
+            
+            while running or delayed:
+                now = time.monotonic()
+                for ready_at, report_type, attempt in [item for item in delayed if item[0] <= now]:
+                    delayed.remove((ready_at, report_type, attempt))
+                    report_started.setdefault(report_type, now)
+                    future = executor.submit(attempt_report, factory, report_type, report_date, connectors,
+                                             attempt, max_retries)
+                    running[future] = (report_type, attempt)
+                
+                timeout = min(ready_at for ready_at, _, _ in delayed) - now if delayed else None
+                if not running:
+                    time.sleep(max(timeout, 0))
+                    continue
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    report_type, attempt = running.pop(future)
+                    try:
+                        success = future.result()
+                    except Exception as e:
+                        # attempt_report сам обрабатывает ошибки отчета, сюда попадают только непредвиденные
+                        logging.error(f"Непредвиденная ошибка отчета {report_type}: {str(e)}", exc_info=True)
+                        success = False
+                    if not success and attempt < max_retries:
+                        logging.info(f"Ожидание {retry_delay} секунд перед повторной попыткой отчета {report_type}")
+                        delayed.append((time.monotonic() + retry_delay, report_type, attempt + 1))
+                        continue
+                    results[report_type] = success
+                    elapsed = time.monotonic() - report_started[report_type]
+                    logging.info(f"Отчет {report_type} завершен за {elapsed:.1f} с: {'успешно' if success else 'с ошибкой'}")
+    finally:
+        close_shared_connectors(connectors)
+    
+    failed = [report_type for report_type, success in results.items() if not success]
+    logging.info(f"Все отчеты завершены за {time.monotonic() - started:.1f} с, "
+                 f"успешно: {len(results) - len(failed)}, с ошибкой: {failed or 'нет'}")
+    return not failed
+
+
 def main():
     # Загружаем переменные из .env файла
     load_env_file()
@@ -52,14 +172,30 @@ def main():
     
     # Парсим аргументы командной строки
     parser = argparse.ArgumentParser(description='Генератор отчетов по заказам')
+    mode = parser.add_mutually_exclusive_group()
     if available_reports:
-        parser.add_argument('--report-type', type=str, choices=available_reports,
-                           help='Тип отчета для генерации')
+        mode.add_argument('--report-type', type=str, choices=available_reports,
+                          help='Тип отчета для генерации')
     else:
-        parser.add_argument('--report-type', type=str, help='Тип отчета для генерации')
+        mode.add_argument('--report-type', type=str, help='Тип отчета для генерации')
+    mode.add_argument('--run-many', nargs='*', metavar='REPORT_TYPE',
+                      help='Сгенерировать несколько отчетов одновременно (без списка — все доступные)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('REPORT_WORKERS', '4')),
+                        help='Сколько отчетов выполняется одновременно в режиме --run-many')
     
     args = parser.parse_args()
     
+    if args.run_many is not None:
+        report_types = list(dict.fromkeys(args.run_many)) or available_reports
+        unknown = [report_type for report_type in report_types if report_type not in available_reports]
+        if unknown:
+            logging.error(f"Типы отчетов {unknown} недоступны. Доступные: {available_reports}")
+            return False
+        if not report_types:
+            logging.error("Нет доступных отчетов для генерации")
+            return False
+        return run_many(factory, report_types, max(1, min(args.workers, len(report_types))))
+    
     # Определяем тип отчета
     report_type = args.report_type
     
@@ -78,50 +214,7 @@ def main():
         logging.error(f"Тип отчета '{report_type}' недоступен. Доступные: {available_reports}")
         return False
     
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            # Определяем дату отчета (вчера)
-            report_date = datetime.now() - timedelta(days=1)
-            logging.info(f"Начало генерации отчета {report_type} за {report_date.strftime('%Y-%m-%d')}")
-            
-            # Создаем и генерируем отчет
-            report = factory.get_report(report_type)
-            filename, has_data = report.generate(report_date)
-            logging.info(f"Отчет {report_type} сгенерирован: файл={filename}, есть_данные={has_data}")
-            
-            # Отправляем email с отчетом
-            logging.info(f"Отправка email. Данные: {has_data}")
-            email_sent = send_email(has_data, filename, report_date)
-            
-            if email_sent:
-                logging.info("Email успешно отправлен")
-            else:
-                logging.warning("Не удалось отправить email")
-            
-            # Удаляем файл, если он создавался и мы его отправили
-            if has_data and os.path.exists(filename):  # Убрано f"reports/{filename}"
-                os.remove(filename)
-                logging.info(f"Файл {filename} удален")
-            
-            logging.info(f"Отчет {report_type} успешно сгенерирован и отправлен")
-            return True
-            
-        except Exception as e:
-            retry_count += 1
-            logging.error(f"Ошибка при выполнении отчета {report_type} (попытка {retry_count}/{max_retries}): {str(e)}", exc_info=True)
-            
-            if retry_count >= max_retries:
-                logging.critical("Достигнуто максимальное количество попыток. Завершение работы.")
-                return False
-            
-            # Ждем перед повторной попыткой (5 минут)
-            logging.info("Ожидание 5 минут перед повторной попыткой")
-            time.sleep(5 * 60)
-    
-    return False
+    return run_report(factory, report_type)
 
 if __name__ == "__main__":
     logging.info("Запуск сервиса генерации отчетов")
@@ -64,10 +64,12 @@ class ReportFactory:
         
         logging.info(f"Загружено классов отчетов: {len(self.report_classes)}")
     
-    def get_report(self, report_type):
-        """Возвращает экземпляр класса отчета по типу"""
+    def get_report(self, report_type, connectors=None):
+        """Возвращает экземпляр класса отчета по типу (connectors — общие подключения к базам)"""
         if report_type in self.report_classes:
-            return self.report_classes[report_type]()
+            report = self.report_classes[report_type]()
+            report.connectors = connectors
+            return report
         else:
             available = list(self.report_classes.keys())
             logging.error(f"Неизвестный тип отчета: {report_type}. Доступные: {available}")
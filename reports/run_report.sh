@@ -27,8 +27,12 @@ if ! python -c "import psycopg2" 2>/dev/null; then
 fi
 
 # Определяем тип отчета из аргументов
+# ./run_report.sh --run-many [тип ...] — несколько отчетов одновременно (без списка — все)
 REPORT_TYPE=""
-if [ $# -gt 0 ]; then
+if [ "$1" = "--run-many" ]; then
+    REPORT_TYPE="$*"
+    echo "$(date): Одновременный запуск отчетов: ${*:2}"
+elif [ $# -gt 0 ]; then
     REPORT_TYPE="--report-type $1"
     echo "$(date): Используется тип отчета: $1"
 fi